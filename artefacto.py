@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Artefacto precalculado con los datos del tablero
+
+preparar_artefacto.py lo escribe fuera del servidor web a partir de los CSV
+mensuales. Con IMSS_ARTEFACTO=<directorio>, el tablero lo abre al arrancar y
+no vuelve a leer, limpiar ni agregar los CSV. Cada construcción vive en su
+propio directorio, que no se modifica una vez publicado:
+
+    artefacto/
+      ACTUAL                      nombre de la construcción publicada
+      <version>-<construcción>-e<esquema>/
+        manifiesto.json           versión (datos y código), esquema, fecha, periodos, archivos, validación
+        pd_<mes>.arrow            filas limpias (entidades normalizadas, rangos de edad, independientes)
+        sbc_<mes>.arrow
+        entidad.arrow             agregado_entidad de cada mes
+        totales.arrow             agregado_periodo de cada mes y ámbito (nacional, cdmx, cada entidad)
+        edades.arrow
+        salarios.arrow
+        analitica.sqlite          tablas e índices de motor_sql, abiertos en sólo lectura
+
+Los .arrow son IPC de Arrow sin compresión: se mapean en memoria y las columnas
+numéricas se usan sin copiarse (arreglos de sólo lectura; los frames ya eran
+de sólo lectura por contrato, ver nucleo.py).
+"""
+
+import json
+import os
+import time
+
+import pandas as pd
+
+from ingesta import INGESTA, norm_txt
+
+ESQUEMA = 2
+ACTUAL = "ACTUAL"
+MANIFIESTO = "manifiesto.json"
+SQLITE = "analitica.sqlite"
+
+
+def nombre_version(version, construccion):
+    return f"{version}-{construccion}-e{ESQUEMA}"
+
+
+def archivo_mes(tabla, mes):
+    return f"{tabla}_{norm_txt(mes).replace(' ', '_')}.arrow"
+
+
+# --- Escritura ---
+def escribir_tabla(df, ruta):
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(ruta, "wb") as fh, ipc.new_file(fh, tabla.schema) as escritor:
+        escritor.write_table(tabla)
+
+
+def tablas_agregados(agregados):
+    """Agregados en memoria ({"entidad": {mes: df}, "periodo": {(mes, ámbito): {...}}}) como tablas largas."""
+    entidad = pd.concat([agg.assign(Mes=mes) for mes, agg in agregados["entidad"].items()], ignore_index=True)
+    totales, edades, salarios = [], [], []
+    for (mes, ambito), a in agregados["periodo"].items():
+        totales.append({"Mes": mes, "Ambito": ambito, **a["totales"].to_dict()})
+        e = a["edades"].reset_index()
+        e["Rango_edad_2"] = e["Rango_edad_2"].astype(str)
+        edades.append(e.assign(Mes=mes, Ambito=ambito))
+        salarios.append(a["salarios"].rename_axis("Sector").reset_index().assign(Mes=mes, Ambito=ambito))
+    return {
+        "entidad": entidad,
+        "totales": pd.DataFrame(totales),
+        "edades": pd.concat(edades, ignore_index=True),
+        "salarios": pd.concat(salarios, ignore_index=True),
+    }
+
+
+# --- Lectura ---
+def leer_tabla(ruta):
+    """Frame sobre el archivo mapeado en memoria (columnas numéricas sin copia)."""
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    return ipc.open_file(pa.memory_map(ruta)).read_all().to_pandas(split_blocks=True)
+
+
+def resolver(raiz):
+    """Directorio de la versión publicada en `raiz` (o `raiz` si ya es una versión)."""
+    if os.path.exists(os.path.join(raiz, MANIFIESTO)): return raiz
+    try:
+        with open(os.path.join(raiz, ACTUAL), encoding="utf-8") as fh: nombre = fh.read().strip()
+    except OSError:
+        raise RuntimeError(f"No hay artefacto publicado en {raiz!r}: ejecutar python preparar_artefacto.py") from None
+    return os.path.join(raiz, nombre)
+
+
+def _tramos(tabla):
+    """{(mes, ámbito): (inicio, fin)}: las filas de cada periodo y ámbito se escriben contiguas."""
+    claves = list(zip(tabla["Mes"], tabla["Ambito"]))
+    tramos, ini = {}, 0
+    for i in range(1, len(claves) + 1):
+        if i == len(claves) or claves[i] != claves[ini]:
+            tramos[claves[ini]] = (ini, i)
+            ini = i
+    return tramos
+
+
+class AgregadosPeriodo:
+    """
+    agregado_periodo precalculado de cada (mes, ámbito). Las tablas largas pasan
+    a numpy una sola vez; cada clave se arma (rebanadas contiguas) la primera vez
+    que se pide, así el arranque no paga los ámbitos que nadie consulta.
+    """
+
+    COLS_EDADES = ["PTPD_Aseg_H", "PTPD_Aseg_M", "PTPD_Aseg_NB"]
+    COLS_SALARIOS = ["SalarioMasc", "SalarioFem"]
+
+    def __init__(self, tablas, datos):
+        t, e, s = tablas["totales"], tablas["edades"], tablas["salarios"]
+        self._datos = datos
+        self._cols = pd.Index([c for c in t.columns if c not in ("Mes", "Ambito")])
+        self._filas = {clave: n for n, clave in enumerate(zip(t["Mes"], t["Ambito"]))}
+        self._totales = t[self._cols].to_numpy(dtype=float)
+        self._edades = e[self.COLS_EDADES].to_numpy(dtype=float)
+        self._rangos = e["Rango_edad_2"].to_numpy(dtype=object)
+        self._salarios = s[self.COLS_SALARIOS].to_numpy(dtype=float)
+        self._sectores = s["Sector"].astype(str).to_numpy(dtype=object)
+        self._tramos_e, self._tramos_s = _tramos(e), _tramos(s)
+
+    def __contains__(self, clave):
+        return clave in self._filas
+
+    def __iter__(self):
+        return iter(self._filas)
+
+    def __len__(self):
+        return len(self._filas)
+
+    def __getitem__(self, clave):
+        n = self._filas[clave]
+        i, j = self._tramos_e.get(clave, (0, 0))
+        edades = pd.DataFrame(self._edades[i:j], columns=self.COLS_EDADES, index=pd.CategoricalIndex(
+            self._rangos[i:j], categories=self._datos[clave[0]][0]["Rango_edad_2"].cat.categories, ordered=True, name="Rango_edad_2"))
+        i, j = self._tramos_s.get(clave, (0, 0))
+        salarios = pd.DataFrame(self._salarios[i:j], columns=self.COLS_SALARIOS,
+                                index=pd.Index(self._sectores[i:j], dtype=object, name="Sector"))
+        return {"totales": pd.Series(self._totales[n], index=self._cols), "edades": edades, "salarios": salarios}
+
+
+def cargar(raiz):
+    """(datos, agregados, manifiesto) de la versión publicada; actualiza ingesta.INGESTA como una ingesta de CSV."""
+    t0 = time.perf_counter()
+    ruta = resolver(raiz)
+    with open(os.path.join(ruta, MANIFIESTO), encoding="utf-8") as fh: manifiesto = json.load(fh)
+    if manifiesto.get("esquema") != ESQUEMA:
+        raise RuntimeError(f"Artefacto {ruta!r} con esquema {manifiesto.get('esquema')} (se espera {ESQUEMA}): "
+                           "ejecutar python preparar_artefacto.py")
+    datos = {p["mes"]: (leer_tabla(os.path.join(ruta, p["pd"])), leer_tabla(os.path.join(ruta, p["sbc"])))
+             for p in manifiesto["periodos"]}
+    tablas = {t: leer_tabla(os.path.join(ruta, f"{t}.arrow")) for t in ("entidad", "totales", "edades", "salarios")}
+    entidad = tablas["entidad"]
+    agregados = {
+        "entidad": {mes: g.drop(columns="Mes").reset_index(drop=True) for mes, g in entidad.groupby("Mes", sort=False)},
+        "periodo": AgregadosPeriodo(tablas, datos),
+    }
+    manifiesto.update(ruta=ruta, sqlite=os.path.join(ruta, SQLITE))
+    INGESTA.update(
+        version=manifiesto["version"],
+        modo="artefacto",
+        motor_csv=None,
+        duracion_s=round(time.perf_counter() - t0, 3),
+        archivos_s={},
+        fecha=manifiesto["fecha"],
+        periodos=[{k: p[k] for k in ("mes", "fecha", "filas_pd", "filas_sbc")} for p in manifiesto["periodos"]],
+        validacion=manifiesto.get("validacion"),
+        artefacto=ruta,
+    )
+    return datos, agregados, manifiesto
@@ -0,0 +1,462 @@
+# -*- coding: utf-8 -*-
+"""
+Prueba de carga del tablero (usuarios concurrentes simulados)
+
+Cada usuario virtual repite sesiones realistas contra el servidor: carga de la
+página (`/`, `_dash-layout`, `_dash-dependencies`), cambios de pestaña, cambio
+de barras a mapa, clics que disparan `copy_to_clipboard`, comparación de
+periodos y la cadena de filtros del Explorador (con drill-down por entidad).
+Sólo usa la biblioteca estándar; no necesita servicios externos.
+
+    # contra un gunicorn que ya está corriendo
+    python carga_prueba.py --url http://127.0.0.1:8000 --usuarios 20 --duracion 60
+
+    # lanza gunicorn, espera /readyz, mide y lo detiene
+    python carga_prueba.py --gunicorn "-w 2 --threads 4" --usuarios 20 --duracion 60
+
+    # sin red: app.server en este mismo proceso (test_client de Flask)
+    python carga_prueba.py --en-proceso --usuarios 8 --duracion 20
+
+Informa throughput, latencias p50/p95/p99 (total y por tipo de petición),
+errores y la memoria residente (RSS) de cada worker durante la prueba.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+MESES = ["Julio", "Agosto", "Septiembre", "Octubre"]
+METRICAS_MAPA = ["PTPD_Aseg", "PTPD_Puestos", "TI"]
+ENTIDADES = ["ciudad de mexico", "estado de mexico", "jalisco", "nuevo leon", "puebla", "veracruz"]
+SECTORES = ["todos", "Transportes y comunicaciones", "Servicios para empresas"]
+
+
+# --- Cuerpos de _dash-update-component ---
+def _id_str(id_):
+    return id_ if isinstance(id_, str) else json.dumps(id_, sort_keys=True, separators=(",", ":"))
+
+
+def cuerpo_callback(salida, salidas, entradas, estado=(), disparo=None):
+    """
+    salida: cadena de la dependencia (tal como la publica _dash-dependencies);
+    salidas: [(id, propiedad)]; entradas/estado: [(id, propiedad, valor)].
+    """
+    def props(lista):
+        return [{"id": i, "property": p, "value": v} for i, p, v in lista]
+
+    outs = [{"id": i, "property": p} for i, p in salidas]
+    disparo = disparo or entradas[0]
+    return {
+        "output": salida,
+        "outputs": outs[0] if len(outs) == 1 else outs,
+        "inputs": props(entradas),
+        "changedPropIds": [f"{_id_str(disparo[0])}.{disparo[1]}"],
+        "state": props(estado),
+    }
+
+
+def cb_tab(tab):
+    return cuerpo_callback("tab-contenido.children", [("tab-contenido", "children")], [("tabs", "value", tab)])
+
+
+def cb_seccion(id_):
+    return cuerpo_callback('{"mes":["MATCH"],"seccion":["MATCH"],"type":"seccion-mes"}.children',
+                           [(id_, "children")], [(id_, "id", id_)])
+
+
+def secciones(respuesta):
+    """Ids de los marcadores de sección (seccion-mes) que trae una pestaña mensual."""
+    encontrados = []
+
+    def buscar(nodo):
+        if isinstance(nodo, dict):
+            id_ = nodo.get("id")
+            if isinstance(id_, dict) and id_.get("type") == "seccion-mes": encontrados.append(id_)
+            for v in nodo.values(): buscar(v)
+        elif isinstance(nodo, list):
+            for v in nodo: buscar(v)
+
+    buscar(respuesta)
+    return encontrados
+
+
+def cb_geo(mes, modo):
+    indice = f"geo-{mes}"
+    return cuerpo_callback(
+        '{"index":["MATCH"],"type":"copy-graph"}.figure',
+        [({"type": "copy-graph", "index": indice}, "figure")],
+        [({"type": "geo-modo", "index": indice}, "value", modo)],
+    )
+
+
+def cb_copiar(mes, valor, rng=random):
+    # La entrada ALL llega como lista; sólo el gráfico clicado trae clickData
+    graficas = [f"geo-{mes}", f"pir-nal-{mes}", f"pir-cdmx-{mes}"]
+    elegida = rng.choice(graficas)
+    click = {"points": [{"x": valor, "y": "Jalisco", "customdata": valor}]}
+    cuerpo = cuerpo_callback(
+        "..clipboard.content...notify-copy.style..",
+        [("clipboard", "content"), ("notify-copy", "style")],
+        [({"type": "copy-graph", "index": g}, "clickData", click if g == elegida else None) for g in graficas],
+    )
+    cuerpo["inputs"] = [cuerpo["inputs"], []]   # copy-graph-parche (Comparar) no está en una pestaña mensual
+    cuerpo["changedPropIds"] = [f"{_id_str({'type': 'copy-graph', 'index': elegida})}.clickData"]
+    return cuerpo
+
+
+def cb_comparar(periodos, ambito):
+    graficas = [{"type": "copy-graph-parche", "index": g} for g in ("cmp-pir", "cmp-dpir")]
+    salidas = [("cmp-tablas", "children"), ("cmp-salarios", "children"), ("cmp-graficas", "style")] + [(g, "figure") for g in graficas]
+    return cuerpo_callback(".." + "...".join(f"{_id_str(i)}.{p}" for i, p in salidas) + "..", salidas,
+                           [("cmp-periodos", "value", periodos), ("cmp-ambito", "value", ambito)])
+
+
+def cb_filtros(sesion, mes, entidad, sector, sexo):
+    return cuerpo_callback(
+        "exp-clave.data", [("exp-clave", "data")],
+        [("exp-mes", "value", mes), ("exp-entidad", "value", entidad), ("exp-sector", "value", sector), ("exp-sexo", "value", sexo)],
+        [("sesion", "data", sesion)],
+    )
+
+
+def cb_explorador(salida, clave, sesion):
+    comp, prop = salida.split(".")
+    return cuerpo_callback(salida, [(comp, prop)], [("exp-clave", "data", clave)], [("sesion", "data", sesion)])
+
+
+def cb_drill(entidad, actual):
+    click = {"points": [{"customdata": entidad}]}
+    return cuerpo_callback("exp-entidad.value", [("exp-entidad", "value")],
+                           [("exp-entidades", "clickData", click)], [("exp-entidad", "value", actual)])
+
+
+# --- Clientes ---
+class ClienteHTTP:
+    """Una conexión keep-alive por usuario virtual (como un navegador)."""
+
+    def __init__(self, url, timeout=60):
+        partes = urlsplit(url)
+        self.host, self.puerto = partes.hostname, partes.port or 80
+        self.prefijo = partes.path.rstrip("/")
+        self.timeout = timeout
+        self.conn = None
+
+    def pedir(self, metodo, ruta, cuerpo=None):
+        datos = json.dumps(cuerpo).encode() if cuerpo is not None else None
+        cabeceras = {"Content-Type": "application/json"} if datos else {}
+        for intento in (0, 1):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.puerto, timeout=self.timeout)
+            try:
+                self.conn.request(metodo, self.prefijo + ruta, body=datos, headers=cabeceras)
+                resp = self.conn.getresponse()
+                return resp.status, resp.read()
+            except (http.client.HTTPException, ConnectionError, OSError):
+                self.conn.close()
+                self.conn = None
+                if intento: raise
+
+    def cerrar(self):
+        if self.conn is not None: self.conn.close()
+
+
+class ClienteLocal:
+    """app.server en el mismo proceso (test_client de Flask)."""
+
+    def __init__(self, servidor):
+        self.cliente = servidor.test_client()
+
+    def pedir(self, metodo, ruta, cuerpo=None):
+        resp = self.cliente.open(ruta, method=metodo, json=cuerpo)
+        return resp.status_code, resp.get_data()
+
+    def cerrar(self):
+        pass
+
+
+# --- Sesión simulada ---
+class FinPrueba(Exception):
+    pass
+
+
+class Medicion:
+    def __init__(self):
+        self.lat = defaultdict(list)
+        self.errores = defaultdict(int)
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def registrar(self, tipo, segundos, estado, tam):
+        with self._lock:
+            self.lat[tipo].append(segundos)
+            self.bytes += tam
+            if estado >= 400: self.errores[tipo] += 1
+
+    def error(self, tipo):
+        with self._lock:
+            self.errores[tipo] += 1
+
+
+def sesion_simulada(cliente, medicion, pausa, fin, rng):
+    def pedir(tipo, metodo, ruta, cuerpo=None):
+        if time.monotonic() >= fin: raise FinPrueba
+        t0 = time.perf_counter()
+        try:
+            estado, datos = cliente.pedir(metodo, ruta, cuerpo)
+        except Exception:
+            medicion.error(tipo)
+            return None
+        medicion.registrar(tipo, time.perf_counter() - t0, estado, len(datos))
+        if pausa: time.sleep(rng.uniform(0, 2 * pausa))
+        return json.loads(datos) if estado == 200 and datos[:1] == b"{" else None
+
+    def update(tipo, cuerpo):
+        return pedir(tipo, "POST", "/_dash-update-component", cuerpo)
+
+    def pestana_mes(mes):
+        # Como el navegador: el resumen y luego una petición por sección (si la pestaña es progresiva)
+        r = update("tab:mes", cb_tab(mes))
+        for id_ in secciones(r):
+            update("seccion:" + id_["seccion"], cb_seccion(id_))
+
+    # 1. Carga de la página
+    pedir("index", "GET", "/")
+    layout = pedir("_dash-layout", "GET", "/_dash-layout")
+    pedir("_dash-dependencies", "GET", "/_dash-dependencies")
+    sesion = None
+    try:
+        sesion = layout["props"]["children"][0]["props"]["data"]
+    except (TypeError, KeyError, IndexError):
+        pass
+
+    # 2. Pestaña inicial y recorrido por meses
+    mes = MESES[0]
+    pestana_mes(mes)
+    for _ in range(rng.randint(1, 3)):
+        if rng.random() < 0.5:
+            update("geo-modo", cb_geo(mes, rng.choice(METRICAS_MAPA)))
+        if rng.random() < 0.6:
+            update("copy_to_clipboard", cb_copiar(mes, rng.randint(1, 500000), rng))
+        mes = rng.choice(MESES)
+        pestana_mes(mes)
+
+    # 3. Evolución y comparación
+    if rng.random() < 0.5:
+        update("tab:evolucion", cb_tab("evolucion"))
+    if rng.random() < 0.4:
+        update("tab:comparar", cb_tab("comparar"))
+        update("comparar", cb_comparar(rng.sample(MESES, rng.randint(2, 4)), rng.choice(["nacional", "cdmx"])))
+
+    # 4. Explorador: filtros → clave → bloques, y drill-down
+    if rng.random() < 0.5:
+        update("tab:explorador", cb_tab("explorador"))
+        entidad = "nacional"
+        for _ in range(rng.randint(1, 3)):
+            filtros = (rng.choice(MESES), entidad, rng.choice(SECTORES), rng.choice(["todos", "H", "M"]))
+            r = update("exp-filtros", cb_filtros(sesion, *filtros))
+            clave = r and r.get("response", {}).get("exp-clave", {}).get("data")
+            if clave is None: break
+            for salida in ("exp-kpis.children", "exp-edades.figure", "exp-entidades.figure"):
+                update(f"exp:{salida.split('.')[0]}", cb_explorador(salida, clave, sesion))
+            nueva = rng.choice(ENTIDADES)
+            r = update("exp-drill", cb_drill(nueva, entidad))
+            entidad = (r or {}).get("response", {}).get("exp-entidad", {}).get("value", entidad)
+
+
+def usuario(fabrica, medicion, pausa, fin, semilla):
+    rng = random.Random(semilla)
+    cliente = fabrica()
+    sesiones = 0
+    try:
+        while time.monotonic() < fin:
+            try:
+                sesion_simulada(cliente, medicion, pausa, fin, rng)
+            except FinPrueba:
+                break
+            sesiones += 1
+    finally:
+        cliente.cerrar()
+    return sesiones
+
+
+# --- Memoria de los workers ---
+def rss_kib(pid):
+    try:
+        with open(f"/proc/{pid}/status") as fh:
+            for linea in fh:
+                if linea.startswith("VmRSS:"): return int(linea.split()[1])
+    except OSError:
+        return None
+
+
+def hijos(pid):
+    res = []
+    for d in os.listdir("/proc"):
+        if not d.isdigit(): continue
+        try:
+            with open(f"/proc/{d}/stat") as fh:
+                if int(fh.read().rsplit(")", 1)[1].split()[1]) == pid: res.append(int(d))
+        except (OSError, IndexError, ValueError):
+            pass
+    return res
+
+
+class MuestreoRSS(threading.Thread):
+    """Muestra cada `intervalo` s la RSS del proceso maestro y de sus workers."""
+
+    def __init__(self, pid, intervalo=0.5):
+        super().__init__(daemon=True)
+        self.pid, self.intervalo = pid, intervalo
+        self.maximo = defaultdict(int)
+        self.ultimo = {}
+        self._alto = threading.Event()
+
+    def run(self):
+        while not self._alto.is_set():
+            for p in [self.pid] + hijos(self.pid):
+                kib = rss_kib(p)
+                if kib is None: continue
+                self.ultimo[p] = kib
+                self.maximo[p] = max(self.maximo[p], kib)
+            self._alto.wait(self.intervalo)
+
+    def detener(self):
+        self._alto.set()
+        self.join()
+
+
+# --- Gunicorn local ---
+def lanzar_gunicorn(args_gunicorn, puerto, espera=120):
+    cmd = [sys.executable, "-m", "gunicorn", "dash_app1:server", "-b", f"127.0.0.1:{puerto}"] + args_gunicorn.split()
+    proc = subprocess.Popen(cmd, cwd=os.path.dirname(os.path.abspath(__file__)), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    cliente = ClienteHTTP(f"http://127.0.0.1:{puerto}", timeout=5)
+    limite = time.monotonic() + espera
+    while time.monotonic() < limite:
+        if proc.poll() is not None: raise SystemExit(f"gunicorn terminó al arrancar ({' '.join(cmd)})")
+        try:
+            if cliente.pedir("GET", "/readyz")[0] == 200: return proc
+        except OSError:
+            pass
+        time.sleep(0.5)
+    proc.terminate()
+    raise SystemExit("gunicorn no estuvo listo a tiempo (/readyz)")
+
+
+# --- Informe ---
+def percentil(valores, p):
+    if not valores: return float("nan")
+    orden = sorted(valores)
+    k = (len(orden) - 1) * p / 100
+    i = int(k)
+    return orden[i] if i + 1 >= len(orden) else orden[i] + (orden[i + 1] - orden[i]) * (k - i)
+
+
+def resumen(medicion, duracion, sesiones, rss, config):
+    todas = [x for v in medicion.lat.values() for x in v]
+    total = len(todas)
+
+    def fila(lat):
+        return {"n": len(lat), "p50_ms": round(percentil(lat, 50) * 1000, 1), "p95_ms": round(percentil(lat, 95) * 1000, 1),
+                "p99_ms": round(percentil(lat, 99) * 1000, 1), "max_ms": round(max(lat) * 1000, 1) if lat else None}
+
+    return {
+        "config": config,
+        "duracion_s": round(duracion, 1),
+        "sesiones": sesiones,
+        "peticiones": total,
+        "errores": sum(medicion.errores.values()),
+        "throughput_rps": round(total / duracion, 1) if duracion else None,
+        "mib_enviados": round(medicion.bytes / 2 ** 20, 1),
+        "latencia": fila(todas),
+        "por_tipo": {t: {**fila(v), "errores": medicion.errores.get(t, 0)} for t, v in sorted(medicion.lat.items())},
+        "rss_mib": rss,
+    }
+
+
+def imprimir(res):
+    print(f"\n{res['config']}")
+    print(f"{res['peticiones']} peticiones, {res['sesiones']} sesiones en {res['duracion_s']} s -> "
+          f"{res['throughput_rps']} req/s, {res['errores']} errores, {res['mib_enviados']} MiB")
+    lat = res["latencia"]
+    print(f"latencia total: p50 {lat['p50_ms']} ms · p95 {lat['p95_ms']} ms · p99 {lat['p99_ms']} ms · máx {lat['max_ms']} ms\n")
+    print(f"{'tipo':<24}{'n':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'máx':>9}{'err':>6}")
+    for tipo, f in res["por_tipo"].items():
+        print(f"{tipo:<24}{f['n']:>7}{f['p50_ms']:>9}{f['p95_ms']:>9}{f['p99_ms']:>9}{f['max_ms']:>9}{f['errores']:>6}")
+    if res["rss_mib"]:
+        print("\nRSS (MiB)  " + "  ".join(f"{p}: máx {v['max']} / final {v['final']}" for p, v in res["rss_mib"].items()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    destino = parser.add_mutually_exclusive_group()
+    destino.add_argument("--url", default="http://127.0.0.1:8000", help="Servidor ya en marcha")
+    destino.add_argument("--gunicorn", metavar="ARGS", help="Lanzar gunicorn local con estos argumentos")
+    destino.add_argument("--en-proceso", action="store_true", help="Usar app.server en este proceso")
+    parser.add_argument("--puerto", type=int, default=8765, help="Puerto para --gunicorn")
+    parser.add_argument("--pid", type=int, help="PID del maestro de gunicorn para medir RSS (con --url)")
+    parser.add_argument("--usuarios", type=int, default=10, help="Usuarios concurrentes")
+    parser.add_argument("--duracion", type=float, default=30, help="Segundos de prueba")
+    parser.add_argument("--pausa", type=float, default=0.0, help="Pausa media entre acciones (s)")
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--json", help="Guardar el resultado en este archivo")
+    args = parser.parse_args(argv)
+
+    proc, pid = None, args.pid
+    if args.en_proceso:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import dash_app1
+        dash_app1.LISTO.wait(120)
+        fabrica, pid, config = (lambda: ClienteLocal(dash_app1.app.server)), os.getpid(), "en proceso (test_client)"
+    elif args.gunicorn is not None:
+        proc = lanzar_gunicorn(args.gunicorn, args.puerto)
+        url, pid, config = f"http://127.0.0.1:{args.puerto}", proc.pid, f"gunicorn {args.gunicorn}"
+        fabrica = lambda: ClienteHTTP(url)
+    else:
+        fabrica, config = (lambda: ClienteHTTP(args.url)), args.url
+    config += f" · {args.usuarios} usuarios · pausa {args.pausa} s"
+
+    muestreo = MuestreoRSS(pid) if pid else None
+    if muestreo: muestreo.start()
+    medicion = Medicion()
+    resultados = [0] * args.usuarios
+    t0 = time.monotonic()
+    fin = t0 + args.duracion
+
+    def correr(i):
+        resultados[i] = usuario(fabrica, medicion, args.pausa, fin, args.semilla * 1000 + i)
+
+    hilos = [threading.Thread(target=correr, args=(i,), daemon=True) for i in range(args.usuarios)]
+    try:
+        for h in hilos: h.start()
+        for h in hilos: h.join()
+    finally:
+        duracion = time.monotonic() - t0
+        rss = {}
+        if muestreo:
+            muestreo.detener()
+            rss = {p: {"max": round(muestreo.maximo[p] / 1024, 1), "final": round(muestreo.ultimo.get(p, 0) / 1024, 1)}
+                   for p in sorted(muestreo.maximo)}
+        if proc is not None:
+            proc.send_signal(signal.SIGTERM)
+            try: proc.wait(30)
+            except subprocess.TimeoutExpired: proc.kill()
+
+    res = resumen(medicion, duracion, sum(resultados), rss, config)
+    imprimir(res)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(res, fh, ensure_ascii=False, indent=2)
+    return 1 if res["errores"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
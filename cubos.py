@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Retículo de agregados materializados (cubos) sobre mes, entidad, edad y sector
+
+Cada cubo suma las medidas de conteo (nucleo.COLS_TOTALES: afiliaciones, TDP
+e independientes, total y por sexo) agrupadas por un subconjunto de
+dimensiones. El sexo viaja como columnas de medida en todos los cubos (_H,
+_M, _NB y el total, que es su suma), así que cualquier cubo responde
+cualquier corte por sexo sin multiplicar las filas.
+
+- pd:  todos los subconjuntos de (mes, entidad, edad): 8 cubos.
+- sbc: los subconjuntos que incluyen sector (los conteos por sector sólo existen en sbc): 8 cubos.
+
+Las dimensiones se guardan como códigos enteros y las medidas como una matriz
+int64: un cubo se agrupa ordenando su clave combinada y sumando tramos
+(np.add.reduceat), siempre desde su padre materializado más pequeño, no desde
+las filas. plan() elige para cada consulta el cubo más pequeño que cubre sus
+dimensiones de agrupación y de filtro: los KPI nacionales de un mes leen una
+fila del cubo (mes) en lugar de sumar las filas por entidad y edad.
+"""
+
+import itertools
+
+import numpy as np
+import pandas as pd
+
+DIMENSIONES = {
+    "mes": ["Mes"],
+    "entidad": ["entidad_norm", "entidad_display"],
+    "edad": ["Rango_edad_2"],
+    "sector": ["Sector"],
+}
+HECHOS = {"pd": ("mes", "entidad", "edad"), "sbc": ("mes", "entidad", "edad", "sector")}
+
+
+def columnas(dims):
+    """Columnas de agrupación de un conjunto de dimensiones, en el orden de DIMENSIONES."""
+    return [c for d in DIMENSIONES if d in dims for c in DIMENSIONES[d]]
+
+
+def _dims(dims):
+    return tuple(d for d in DIMENSIONES if d in dims)
+
+
+def _agrupar(codigos, valores, dims):
+    """Suma `valores` por la combinación de códigos de `dims`; filas ordenadas como un groupby (edad vacía = -1, primero)."""
+    if not dims: return {}, valores.sum(axis=0, keepdims=True)
+    if not len(valores): return {d: codigos[d][:0] for d in dims}, valores[:0]
+    tamanos = [int(codigos[d].max(initial=-1)) + 2 for d in dims]
+    clave = np.ravel_multi_index([codigos[d] + 1 for d in dims], tamanos)
+    orden = np.argsort(clave, kind="stable")
+    clave = clave[orden]
+    inicios = np.flatnonzero(np.r_[True, clave[1:] != clave[:-1]])
+    suma = np.add.reduceat(valores[orden], inicios, axis=0)
+    grupos = np.unravel_index(clave[inicios], tamanos)
+    return {d: g - 1 for d, g in zip(dims, grupos)}, suma
+
+
+class Cubo:
+    __slots__ = ("dims", "codigos", "valores")
+
+    def __init__(self, dims, codigos, valores):
+        self.dims, self.codigos, self.valores = dims, codigos, valores
+
+    def __len__(self):
+        return len(self.valores)
+
+
+class Reticulo:
+    """Cubos materializados de los datos de todos los meses y planificador de consultas."""
+
+    def __init__(self, datos, ambitos, medidas):
+        self.datos = datos
+        self.ambitos = ambitos
+        self.medidas = list(medidas)
+        self.meses = list(datos)
+        self.etiquetas = {}
+        self.cubos = {}
+        for i, (hecho, dims) in enumerate(HECHOS.items()):
+            base = self._base(hecho, [par[i] for par in datos.values()], dims)
+            if base is None: continue
+            self.cubos[(hecho, dims)] = base
+            subconjuntos = [s for n in range(len(dims) - 1, -1, -1) for s in itertools.combinations(dims, n)
+                            if hecho == "pd" or "sector" in s]
+            for s in subconjuntos:
+                # Padre: el cubo ya materializado más pequeño que contiene todas sus dimensiones
+                padre = min((c for (h, d), c in self.cubos.items() if h == hecho and set(s) <= set(d)), key=len)
+                self.cubos[(hecho, s)] = Cubo(s, *_agrupar(padre.codigos, padre.valores, s))
+        self._claves = {}
+
+    def _base(self, hecho, frames, dims):
+        necesarias = [c for c in columnas(dims) if c != "Mes"]
+        presentes = [(i, df) for i, df in enumerate(frames) if not df.empty and all(c in df.columns for c in necesarias)]
+        if not presentes: return None
+        edades = list(dict.fromkeys(c for _, df in presentes for c in df["Rango_edad_2"].cat.categories))
+        codigos = {"mes": [], "edad": [], "entidad": [], "sector": []}
+        valores, norm, display, sector = [], [], [], []
+        for i, df in presentes:
+            codigos["mes"].append(np.full(len(df), i, dtype=np.int64))
+            rangos = df["Rango_edad_2"]
+            if list(rangos.cat.categories) != edades: rangos = rangos.cat.set_categories(edades)
+            codigos["edad"].append(rangos.cat.codes.to_numpy(dtype=np.int64))
+            norm.append(df["entidad_norm"].to_numpy(dtype=object)); display.append(df["entidad_display"].to_numpy(dtype=object))
+            if "sector" in dims: sector.append(df["Sector"].to_numpy(dtype=object))
+            # Los independientes por sexo ya vienen de la ingesta (ingesta.derivar_conteos), también en sbc
+            valores.append(df.reindex(columns=self.medidas, fill_value=0).to_numpy(dtype=np.int64))
+        c = {d: np.concatenate(codigos[d]) for d in ("mes", "edad")}
+        c["entidad"], entidades = pd.MultiIndex.from_arrays([np.concatenate(norm), np.concatenate(display)]).factorize(sort=True)
+        self.etiquetas[hecho] = {"edad": edades, "entidad_norm": entidades.get_level_values(0).to_numpy(dtype=object),
+                                 "entidad_display": entidades.get_level_values(1).to_numpy(dtype=object)}
+        if "sector" in dims:
+            c["sector"], sectores = pd.factorize(np.concatenate(sector), sort=True)
+            self.etiquetas[hecho]["sector"] = list(sectores)
+        return Cubo(dims, *_agrupar(c, np.concatenate(valores), dims))
+
+    def claves_ambito(self, hecho, ambito):
+        """Códigos de entidad de un ámbito; mismas reglas que nucleo.vista_ambito."""
+        if (hecho, ambito) not in self._claves:
+            valores = pd.Series(self.etiquetas[hecho]["entidad_norm"], dtype=object)
+            if ambito in self.ambitos: dentro = valores.str.contains(self.ambitos[ambito], na=False)
+            else: dentro = valores == ambito
+            self._claves[(hecho, ambito)] = np.flatnonzero(dentro.to_numpy())
+        return self._claves[(hecho, ambito)]
+
+    # --- Planificador ---
+    def plan(self, por=(), filtros=()):
+        """(hecho, dimensiones) del cubo más pequeño que cubre las dimensiones de agrupación y de filtro."""
+        necesarias = set(por) | set(filtros)
+        hecho = "sbc" if "sector" in necesarias else "pd"
+        candidatos = [d for (h, d) in self.cubos if h == hecho and necesarias <= set(d)]
+        if not candidatos: raise KeyError(f"Ningún cubo de {hecho} cubre {sorted(necesarias)}")
+        return hecho, min(candidatos, key=lambda d: len(self.cubos[(hecho, d)]))
+
+    def consultar(self, por=(), mes=None, ambito="nacional", sector=None):
+        """
+        Medidas (int64) agrupadas por `por` (dimensiones de DIMENSIONES),
+        filtradas por mes, ámbito ("nacional", "cdmx" o una clave
+        entidad_norm) y sector; mismas filas y columnas que un groupby de
+        pandas sobre los frames. Sin `por` devuelve una Serie con los totales.
+        """
+        filtros = {d: v for d, v in (("mes", mes), ("sector", sector)) if v is not None}
+        if ambito != "nacional": filtros["entidad"] = ambito
+        hecho, dims = self.plan(por, filtros)
+        cubo = self.cubos[(hecho, dims)]
+        etiquetas = self.etiquetas[hecho]
+        mascara = np.ones(len(cubo), dtype=bool)
+        if mes is not None:
+            mascara &= cubo.codigos["mes"] == (self.meses.index(mes) if mes in self.meses else -2)
+        if sector is not None:
+            mascara &= cubo.codigos["sector"] == (etiquetas["sector"].index(sector) if sector in etiquetas["sector"] else -2)
+        if "entidad" in filtros:
+            mascara &= np.isin(cubo.codigos["entidad"], self.claves_ambito(hecho, ambito))
+        valores = cubo.valores[mascara]
+        if not por: return pd.Series(valores.sum(axis=0), index=self.medidas)
+        por = _dims(por)
+        codigos = {d: cubo.codigos[d][mascara] for d in por}
+        if por != dims: codigos, valores = _agrupar(codigos, valores, por)
+        if "edad" in por:
+            # Como un groupby de pandas: la edad vacía no forma grupo
+            con_edad = codigos["edad"] >= 0
+            codigos, valores = {d: c[con_edad] for d, c in codigos.items()}, valores[con_edad]
+        salida = {}
+        for d in por:
+            if d == "mes": salida["Mes"] = pd.Categorical.from_codes(codigos[d], self.meses, ordered=True)
+            elif d == "edad": salida["Rango_edad_2"] = pd.Categorical.from_codes(codigos[d], etiquetas["edad"], ordered=True)
+            elif d == "sector": salida["Sector"] = np.array(etiquetas["sector"], dtype=object)[codigos[d]]
+            else:
+                salida["entidad_norm"] = etiquetas["entidad_norm"][codigos[d]]
+                salida["entidad_display"] = etiquetas["entidad_display"][codigos[d]]
+        salida.update(zip(self.medidas, valores.T))
+        return pd.DataFrame(salida)
+
+    def estado(self):
+        return {f"{h}:{'+'.join(d) or 'total'}": len(c) for (h, d), c in self.cubos.items()}
@@ -3,13 +3,36 @@
 Dashboard IMSS – Plataformas Digitales (Versión Final)
 """
 
+import hashlib
+import hmac
 import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from urllib.parse import urlencode
+import numpy as np
 import pandas as pd
 import dash
-from dash import html, dcc, Input, Output, State, ALL, ctx
-import plotly.express as px
+from dash import html, dcc, Input, Output, State, ALL, MATCH, Patch, ctx
 import plotly.graph_objects as go
-import unicodedata
+import plotly.io as pio
+from dash.development.base_component import Component
+from flask import Response, abort, jsonify, request
+
+from exportacion import FORMATOS, en_flujo, formatos_disponibles
+from ingesta import ARCHIVOS_MES, INGESTA, norm_txt
+from nucleo import MOTOR_AGREGADOS, VUELOS, agregado_entidad, agregado_periodo, base_sql, datos, filtro_cdmx, piramides_entidades, recargar, reticulo, vista_ambito
+from nucleo import estado as estado_nucleo
+from perfilado import instalar_perfilado
+from sesiones import almacen_desde_entorno, huella, nueva_sesion
+from validacion import resumen as resumen_validacion
+
+# Fases del arranque en frío (ms); las bibliotecas ya están importadas aquí (ver perfil_arranque.py)
+_T_MODULO = time.perf_counter()
+ARRANQUE = {}
 
 # ==========================================
 # 1. CONFIGURACIÓN DE ESTILO Y COLORES
@@ -28,6 +51,7 @@ COL_TDP   = "#266cb4"   # TDP
 COL_TI    = "#73cae6"   # TI
 COL_HOMBRES = "#027a35"
 COL_MUJERES = "#ac6d14"
+COL_NO_BINARIO = "#7b5ea7"
 
 SECTOR_TRANS = "#8F4889"
 SECTOR_SERV  = "#fdc60a"
@@ -86,31 +110,6 @@ TAB_SELECTED_STYLE = {
 # 2. UTILIDADES Y CARGA DE DATOS
 # ==========================================
 
-ORDEN_EDAD = [
-    "Entre 15 y 20 años", "15 y 20 años",
-    "Entre 20 y 25 años", "20 y 25 años",
-    "Entre 25 y 30 años", "25 y 30 años",
-    "Entre 30 y 35 años", "30 y 35 años",
-    "Entre 35 y 40 años", "35 y 40 años",
-    "Entre 40 y 45 años", "40 y 45 años",
-    "Entre 45 y 50 años", "45 y 50 años",
-    "Entre 50 y 55 años", "50 y 55 años",
-    "Entre 55 y 60 años", "55 y 60 años",
-    "Entre 60 y 65 años", "60 y 65 años",
-    "Entre 65 y 70 años", "65 y 70 años",
-    "Entre 70 y 75 años", "70 y 75 años",
-    "75 años y más"
-]
-
-def sort_ages(df, col_name="Rango_edad_2"):
-    if col_name in df.columns:
-        cats = [c for c in ORDEN_EDAD if c in df[col_name].unique()]
-        extras = [c for c in df[col_name].unique() if c not in ORDEN_EDAD]
-        full_order = cats + extras
-        df[col_name] = pd.Categorical(df[col_name], categories=full_order, ordered=True)
-        return df.sort_values(col_name)
-    return df
-
 def apply_theme(fig):
     fig.update_layout(
         paper_bgcolor='rgba(0,0,0,0)',
@@ -123,63 +122,51 @@ def apply_theme(fig):
     )
     return fig
 
-def norm_txt(s):
-    if not isinstance(s, str): return s
-    s = ''.join(c for c in unicodedata.normalize('NFD', s.lower()) if unicodedata.category(c) != 'Mn')
-    return s.strip()
+def parche_trazas(trazas, **layout):
+    """
+    Actualización parcial (dash.Patch) de una figura cuya estructura ya está en
+    el navegador: sólo viajan los atributos dados de cada traza y de layout.
+    Las claves usan guion bajo como plotly (marker_color → marker.color).
+    """
+    parche = Patch()
+
+    def asignar(destino, attr, valor):
+        *ruta, ultimo = attr.split("_")
+        for k in ruta: destino = destino[k]
+        destino[ultimo] = valor.tolist() if hasattr(valor, "tolist") else valor
+
+    for i, traza in enumerate(trazas):
+        for attr, valor in traza.items(): asignar(parche["data"][i], attr, valor)
+    for attr, valor in layout.items(): asignar(parche["layout"], attr, valor)
+    return parche
 
 def fmt_num(x):
     try: return f"{int(round(float(x), 0)):,}"
     except: return "0"
 
-def filtro_cdmx(df: pd.DataFrame) -> pd.DataFrame:
-    if "entidad_nacimiento" not in df.columns: return df.iloc[0:0].copy()
-    ent_norm = df["entidad_nacimiento"].astype(str).apply(norm_txt)
-    mask = ent_norm.str.contains("ciudad de mexico|cdmx|distrito federal", na=False)
-    return df[mask].copy()
-
-# --- Carga de Datos ---
-def cargar_pd(path_csv: str, etiqueta_mes: str) -> pd.DataFrame:
-    try: df = pd.read_csv(path_csv, encoding="utf-8-sig")
-    except: return pd.DataFrame() 
-    df["Mes"] = etiqueta_mes
-    df["entidad_display"] = df["entidad_nacimiento"].astype(str).replace({"México": "Estado de México", "Mexico": "Estado de México"})
-    df["entidad_norm"] = df["entidad_display"].apply(norm_txt)
-    for col in ["PTPD_Aseg_H", "PTPD_Aseg_M", "PTPD_Puestos_H", "PTPD_Puestos_M", "PTPD_Aseg", "PTPD_Puestos"]:
-        if col in df.columns: df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0)
-    df["independientes_H"] = df.get("PTPD_Aseg_H", 0) - df.get("PTPD_Puestos_H", 0)
-    df["independientes_M"] = df.get("PTPD_Aseg_M", 0) - df.get("PTPD_Puestos_M", 0)
-    df["independientes"]   = df["independientes_H"] + df["independientes_M"]
-    return df
-
-def cargar_sbc(path_csv: str, etiqueta_mes: str) -> pd.DataFrame:
-    try: df = pd.read_csv(path_csv, encoding="utf-8-sig")
-    except: return pd.DataFrame()
-    df["Mes"] = etiqueta_mes
-    if "División" in df.columns: df["Sector"] = df["División"].astype(str)
-    elif "CVE_DIVISION" in df.columns: df["Sector"] = df["CVE_DIVISION"].astype(str)
-    else: df["Sector"] = "Sector"
-    for c in ["SalarioFem", "SalarioMasc", "PTPD_Puestos"]:
-        if c in df.columns: df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0)
-    if "entidad_nacimiento" in df.columns: df["entidad_norm"] = df["entidad_nacimiento"].astype(str).apply(norm_txt)
-    else: df["entidad_norm"] = ""
-    if "Rango_edad_2" not in df.columns: df["Rango_edad_2"] = ""
-    return df
+# --- Assets versionados ---
+DIR_ASSETS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+
+@lru_cache(maxsize=None)
+def _hash_asset(nombre):
+    with open(os.path.join(DIR_ASSETS, nombre), "rb") as fh:
+        return hashlib.sha256(fh.read()).hexdigest()[:12]
+
+def url_asset(app, nombre):
+    """URL del asset con el hash de su contenido (?v=...) para caché inmutable."""
+    try: return f"{app.get_asset_url(nombre)}?v={_hash_asset(nombre)}"
+    except OSError: return app.get_asset_url(nombre)
 
 # ==========================================
 # 3. COMPONENTES VISUALES
 # ==========================================
 
-def bloque_totales(df, df_cdmx, app, titulo):
-    ben_n = df["PTPD_Aseg"].sum() if not df.empty else 0
-    tdp_n = df["PTPD_Puestos"].sum() if not df.empty else 0
-    ind_n = df["independientes"].sum() if not df.empty else 0
+# tot / tot_cdmx: totales del retículo de cubos (nucleo.reticulo), una fila del cubo por ámbito
+def bloque_totales(tot, tot_cdmx, app, titulo, exportar=None):
+    ben_n, tdp_n, ind_n = tot["PTPD_Aseg"], tot["PTPD_Puestos"], tot["independientes"]
+    ben_c, tdp_c, ind_c = tot_cdmx["PTPD_Aseg"], tot_cdmx["PTPD_Puestos"], tot_cdmx["independientes"]
     
-    ben_c = df_cdmx["PTPD_Aseg"].sum() if not df_cdmx.empty else 0
-    tdp_c = df_cdmx["PTPD_Puestos"].sum() if not df_cdmx.empty else 0
-    ind_c = df_cdmx["independientes"].sum() if not df_cdmx.empty else 0
-    
-    icon_repa = app.get_asset_url("repa.png")
+    icon_repa = url_asset(app, "repa.png")
 
     def kpi(label, val, color):
         return html.Div([
@@ -202,26 +189,18 @@ def bloque_totales(df, df_cdmx, app, titulo):
             html.Div([html.Img(src=icon_repa, style={"height": "130px", "opacity":"0.9"})], 
                      style={"display": "flex", "alignItems": "center", "justifyContent": "center", "padding": "0 20px"}),
             col_kpi("Ciudad de México", ben_c, tdp_c, ind_c)
-        ], style={"display": "flex", "flexDirection": "row"})
+        ], style={"display": "flex", "flexDirection": "row"}),
+        *([exportar] if exportar is not None else [])
     ], style=CARD_STYLE)
 
-def bloque_genero(df, df_cdmx, app, titulo):
-    def safe_sum(d, c): return d[c].sum() if not d.empty and c in d.columns else 0
-    
-    bh = safe_sum(df, "PTPD_Aseg_H"); bm = safe_sum(df, "PTPD_Aseg_M")
-    th = safe_sum(df, "PTPD_Puestos_H"); tm = safe_sum(df, "PTPD_Puestos_M")
-    ih = safe_sum(df, "independientes_H"); im = safe_sum(df, "independientes_M")
-    
-    bhc = safe_sum(df_cdmx, "PTPD_Aseg_H"); bmc = safe_sum(df_cdmx, "PTPD_Aseg_M")
-    thc = safe_sum(df_cdmx, "PTPD_Puestos_H"); tmc = safe_sum(df_cdmx, "PTPD_Puestos_M")
-    ihc = safe_sum(df_cdmx, "independientes_H"); imc = safe_sum(df_cdmx, "independientes_M")
-    
-    def get_pcts(h, m):
-        t = h + m
-        return (h/t*100, m/t*100) if t > 0 else (0,0)
+def bloque_genero(tot, tot_cdmx, app, titulo):
+    # Participación sobre el total (H + M + NB): las tres suman 100 %
+    def get_pcts(col, tot_amb):
+        t = tot_amb[col]
+        return tuple(tot_amb[f"{col}{s}"]/t*100 if t > 0 else 0 for s in ("_H", "_M", "_NB"))
 
-    (bH, bM) = get_pcts(bh, bm); (tH, tM) = get_pcts(th, tm); (iH, iM) = get_pcts(ih, im)
-    (bHc, bMc) = get_pcts(bhc, bmc); (tHc, tMc) = get_pcts(thc, tmc); (iHc, iMc) = get_pcts(ihc, imc)
+    (bH, bM, bN) = get_pcts("PTPD_Aseg", tot); (tH, tM, tN) = get_pcts("PTPD_Puestos", tot); (iH, iM, iN) = get_pcts("independientes", tot)
+    (bHc, bMc, bNc) = get_pcts("PTPD_Aseg", tot_cdmx); (tHc, tMc, tNc) = get_pcts("PTPD_Puestos", tot_cdmx); (iHc, iMc, iNc) = get_pcts("independientes", tot_cdmx)
     
     INST_GREEN_STYLE = {
         "backgroundColor": COL_HOMBRES, 
@@ -240,59 +219,60 @@ def bloque_genero(df, df_cdmx, app, titulo):
     TEXT_BLANCO = "#FFFFFF"
     TEXT_CREMA  = "#FEF0C1"
 
-    def concept_box(label, h_pct, m_pct):
+    def concept_box(label, h_pct, m_pct, nb_pct):
         return html.Div([
             html.Div(label, style={"color":DORADO, "fontSize":"14px", "fontWeight":"bold", "marginBottom":"6px", "textAlign":"center", "textTransform":"uppercase"}),
             html.Div([
                 html.Div([html.Div(f"{h_pct:.1f}%", style={"fontWeight":"bold", "fontSize":"22px", "color":TEXT_CREMA}), 
                           html.Div("Hombres", style={"fontSize":"10px", "color": TEXT_CREMA, "fontWeight":"600"})]),
                 
+                html.Div([html.Div(f"{nb_pct:.1f}%", style={"fontWeight":"bold", "fontSize":"14px", "color":TEXT_CREMA}), 
+                          html.Div("No binario", style={"fontSize":"10px", "color": TEXT_CREMA, "fontWeight":"600"})], style={"textAlign":"center", "alignSelf":"flex-end"}),
+                
                 html.Div([html.Div(f"{m_pct:.1f}%", style={"fontWeight":"bold", "fontSize":"22px", "color":TEXT_CREMA}), 
                           html.Div("Mujeres", style={"fontSize":"10px", "color": TEXT_CREMA, "fontWeight":"600", "textAlign":"right"})], style={"textAlign":"right"})
             ], style={"display":"flex", "justifyContent":"space-between"})
         ], style=BOX_CONCEPT_STYLE)
 
-    def panel(titulo_panel, vals_h, vals_m):
+    def panel(titulo_panel, vals_h, vals_m, vals_nb):
         return html.Div([
             html.H4(titulo_panel, style={"color": TEXT_BLANCO, "borderBottom": "2px solid rgba(255,255,255,0.5)", "marginBottom": "15px", "paddingBottom":"5px"}),
-            concept_box("Afiliaciones", vals_h[0], vals_m[0]),
-            concept_box("TDP", vals_h[1], vals_m[1]),
-            concept_box("Independientes", vals_h[2], vals_m[2]),
+            concept_box("Afiliaciones", vals_h[0], vals_m[0], vals_nb[0]),
+            concept_box("TDP", vals_h[1], vals_m[1], vals_nb[1]),
+            concept_box("Independientes", vals_h[2], vals_m[2], vals_nb[2]),
         ], style={"flex": 1})
 
     return html.Div([
         html.H2(titulo, style={**H2_STYLE, "color": TEXT_BLANCO, "borderLeft": f"5px solid {TEXT_BLANCO}"}), 
         html.Div([
-            panel("Nacional", (bH, tH, iH), (bM, tM, iM)),
-            panel("Ciudad de México", (bHc, tHc, iHc), (bMc, tMc, iMc)),
+            panel("Nacional", (bH, tH, iH), (bM, tM, iM), (bN, tN, iN)),
+            panel("Ciudad de México", (bHc, tHc, iHc), (bMc, tMc, iMc), (bNc, tNc, iNc)),
         ], style={"display": "flex", "gap": "20px", "justifyContent": "space-between"})
     ], style=INST_GREEN_STYLE)
 
-def bloque_sectores(df_sbc, titulo, mes):
+def bloque_sectores(df_sbc, titulo, mes, exportar=None):
     if df_sbc.empty: return html.Div()
     
     # 1. Pie
     prop = df_sbc.groupby("Sector", as_index=False)["PTPD_Puestos"].sum()
-    fig_prop = px.pie(prop, names="Sector", values="PTPD_Puestos", hole=0.6, 
-                     color="Sector", color_discrete_map={"Transportes y comunicaciones": MORADO, "Servicios para empresas": GRIS})
+    colores_sector = {"Transportes y comunicaciones": MORADO, "Servicios para empresas": GRIS}
+    fig_prop = go.Figure(go.Pie(labels=prop["Sector"], values=prop["PTPD_Puestos"], hole=0.6,
+                                customdata=prop[["Sector"]].to_numpy(), marker_colors=[colores_sector.get(s) for s in prop["Sector"]]))
     fig_prop.update_traces(textinfo="percent", hovertemplate="<b>%{label}</b><br>TDP: %{value:,.0f}<extra></extra>")
     fig_prop = apply_theme(fig_prop)
     fig_prop.update_layout(showlegend=False, annotations=[dict(text='TDP', x=0.5, y=0.5, font_size=20, showarrow=False)])
 
     # 2. Barras Salarios
-    sal = df_sbc.groupby("Sector", as_index=False)[["SalarioFem", "SalarioMasc"]].mean().fillna(0)
-    sal_long = sal.melt(id_vars="Sector", value_vars=["SalarioFem", "SalarioMasc"], var_name="Genero", value_name="Salario")
-    sal_long["Genero"] = sal_long["Genero"].map({"SalarioFem": "Mujeres", "SalarioMasc": "Hombres"})
-    
-    fig_sal = px.bar(sal_long, y="Sector", x="Salario", color="Genero", orientation="h", barmode="group",
-                     color_discrete_map={"Mujeres": COL_MUJERES, "Hombres": COL_HOMBRES})
+    sal = df_sbc.groupby("Sector", as_index=False)[["SalarioFem", "SalarioMasc"]].mean().fillna({"SalarioFem": 0, "SalarioMasc": 0})
+    fig_sal = go.Figure([go.Bar(x=sal[col], y=sal["Sector"], orientation="h", name=nombre, marker_color=color)
+                         for col, nombre, color in (("SalarioFem", "Mujeres", COL_MUJERES), ("SalarioMasc", "Hombres", COL_HOMBRES))])
     fig_sal.update_traces(hovertemplate="<b>%{y}</b><br>%{fullData.name}: $%{x:,.2f}<extra></extra>")
     fig_sal = apply_theme(fig_sal)
-    fig_sal.update_layout(yaxis_title=None, xaxis_title="Salario Promedio", legend_title_text="")
+    fig_sal.update_layout(barmode="group", yaxis_title=None, xaxis_title="Salario Promedio", legend_title_text="")
 
     # 3. Pirámide Salarial
-    pir = df_sbc.groupby("Rango_edad_2", as_index=False)[["SalarioMasc", "SalarioFem"]].mean().fillna(0)
-    pir = sort_ages(pir, "Rango_edad_2")
+    # Rango_edad_2 es categórica ordenada: el groupby ya sale en orden de edad
+    pir = df_sbc.groupby("Rango_edad_2", as_index=False, observed=True)[["SalarioMasc", "SalarioFem"]].mean().fillna({"SalarioMasc": 0, "SalarioFem": 0})
     pir["Sal_H_neg"] = -pir["SalarioMasc"].abs()
     
     max_val = max(pir["SalarioMasc"].max(), pir["SalarioFem"].max())
@@ -301,20 +281,8 @@ def bloque_sectores(df_sbc, titulo, mes):
     tick_vals = [x for x in range(-int(max_val), int(max_val)+1, tick_step)]
     tick_text = [str(abs(x)) for x in tick_vals]
 
-    fig_pir = fig_pir = px.bar(
-    pir,
-    x="Sal_H_neg",
-    y="Rango_edad_2",
-    orientation="h",
-    color_discrete_sequence=[COL_HOMBRES]
-)
-    fig_pir.data[0].name = "Hombres"   
-    
-    fig_pir.update_traces(
-    hovertemplate="<b>%{y}</b><br>%{fullData.name}: %{customdata:.1f}%<extra></extra>"
-)
-     
-
+    fig_pir = go.Figure(go.Bar(x=pir["Sal_H_neg"], y=pir["Rango_edad_2"], orientation="h", marker_color=COL_HOMBRES,
+                               name="Hombres", showlegend=False))
     fig_pir.add_bar(x=pir["SalarioFem"], y=pir["Rango_edad_2"], orientation="h", marker_color=COL_MUJERES, name="Mujeres")
     fig_pir.add_bar(x=[0], y=[pir["Rango_edad_2"].iloc[0]], orientation="h", marker_color=COL_HOMBRES, name="Hombres", showlegend=True)
     
@@ -369,23 +337,95 @@ def bloque_sectores(df_sbc, titulo, mes):
                 html.H4("Pirámide Salarial por Edad", style={"textAlign":"center", "fontSize":"14px", "color":GUINDA}),
                 dcc.Graph(figure=fig_pir, style={"height":"300px"}, id={'type': 'copy-graph', 'index': f"pir-{titulo}-{mes}"})
             ], style={**CARD_STYLE, "flex":2})
-        ], style={"display":"flex"})
+        ], style={"display":"flex"}),
+        *([exportar] if exportar is not None else [])
     ])
 
+TH_STYLE = {"backgroundColor": GUINDA, "color": "white", "padding": "10px", "textAlign": "center", "border": "1px solid #ddd"}
+TD_STYLE = {"padding": "8px", "border": "1px solid #ddd", "textAlign": "center"}
+
+def render_html_table(df, title):
+    return html.Div([
+        html.H4(title, style={"color":GUINDA, "textAlign":"center", "marginBottom":"10px"}),
+        html.Table(
+            [html.Tr([html.Th(c, style=TH_STYLE) for c in df.columns])] +
+            [html.Tr([html.Td(df.iloc[i][c], style=TD_STYLE) for c in df.columns]) for i in range(len(df))],
+            style={"width":"100%", "borderCollapse":"collapse", "fontSize":"13px", "margin":"0 auto"}
+        )
+    ], style={"marginBottom":"30px", "overflowX":"auto"})
+
+# --- Descarga de agregados (ruta /exportar, en streaming) ---
+def enlaces_exportar(app, conjunto, periodo, ambito="nacional,cdmx"):
+    query = urlencode({"periodo": periodo, "ambito": ambito})
+    enlaces = []
+    for formato in formatos_disponibles():
+        if enlaces: enlaces.append(" · ")
+        enlaces.append(html.A(formato.upper(), href=f"{app.get_relative_path(f'/exportar/{conjunto}.{formato}')}?{query}", download="",
+                              style={"color": GUINDA, "fontWeight": "600", "textDecoration": "none"}))
+    return html.Div(["Descargar datos: ", *enlaces], style={"fontSize": "12px", "color": "#777", "textAlign": "right", "marginTop": "8px"})
+
+def bloque_exportar_historico(app):
+    filas = [("Totales por periodo y ámbito", "totales"), ("Afiliaciones por edad y sexo", "edades"),
+             ("Salario base por sector", "salarios"), ("Totales por entidad de nacimiento", "entidades")]
+    return html.Div([
+        html.H2("Descargar histórico", style=H2_STYLE),
+        *[html.Div([html.Div(nombre, style={"flex": 1}), enlaces_exportar(app, conjunto, "historico")],
+                   style={"display": "flex", "alignItems": "baseline", "borderBottom": "1px solid #eee"}) for nombre, conjunto in filas]
+    ], style=CARD_STYLE)
+
 # ==========================================
 # 4. LAYOUTS DE PESTAÑAS
 # ==========================================
 
-def layout_mes(df, df_sbc, mes_label, app):
-    agg = df.groupby("entidad_display", as_index=False)[["PTPD_Aseg", "PTPD_Puestos"]].sum().sort_values("PTPD_Aseg", ascending=True)
-    agg["TI"] = agg["PTPD_Aseg"] - agg["PTPD_Puestos"]
-    
-    fig_geo = px.bar(agg, y="entidad_display", x=["TI", "PTPD_Puestos"], orientation="h", 
-                     color_discrete_map={"TI": COL_TI, "PTPD_Puestos": COL_TDP}, height=800)
+# --- Distribución geográfica: barras o mapa coroplético ---
+GEO_ASSET = "geo/estados_mx.json"   # generado por preparar_geometria.py
+
+METRICAS_MAPA = {
+    "PTPD_Aseg": ("Afiliaciones", COL_BENEF),
+    "PTPD_Puestos": ("TDP", COL_TDP),
+    "TI": ("TI", COL_TI),
+}
+
+@lru_cache(maxsize=1)
+def claves_geo():
+    try:
+        with open(os.path.join(DIR_ASSETS, GEO_ASSET), encoding="utf-8") as fh:
+            return frozenset(f["id"] for f in json.load(fh)["features"])
+    except OSError:
+        return frozenset()
+
+def fig_geo_mapa(agg, app, metrica="PTPD_Aseg"):
+    # La geometría viaja como URL (con hash): el navegador la descarga una vez
+    # y al recolorear sólo cambian z/customdata.
+    nombre, color = METRICAS_MAPA[metrica]
+    en_mapa = agg["entidad_norm"].isin(claves_geo())
+    d = agg[en_mapa]
+    fig = go.Figure(go.Choropleth(
+        geojson=url_asset(app, GEO_ASSET), featureidkey="id",
+        locations=d["entidad_norm"], z=d[metrica], customdata=d[metrica], text=d["entidad_display"],
+        colorscale=[[0, CREMA_FONDO], [1, color]], marker_line_color=BLANCO_PURO, marker_line_width=0.5,
+        colorbar=dict(title=nombre, thickness=12),
+        hovertemplate="<b>%{text}</b><br>" + nombre + ": %{z:,.0f}<extra></extra>"
+    ))
+    fig.update_geos(fitbounds="locations", visible=False, projection_type="mercator", bgcolor="rgba(0,0,0,0)")
+    fig.update_layout(
+        height=600, margin=dict(t=20, l=0, r=0, b=40),
+        paper_bgcolor='rgba(0,0,0,0)', font=dict(family=FONT_FAMILY, color=TEXTO_GRIS)
+    )
+    fuera = agg.loc[~en_mapa, "entidad_display"].tolist()
+    if fuera:
+        fig.add_annotation(text="Sin representación en el mapa: " + ", ".join(fuera), showarrow=False,
+                           xref="paper", yref="paper", x=0, y=-0.05, xanchor="left", font=dict(size=11, color="#777"))
+    return fig
+
+def fig_geo_barras(agg):
+    agg = agg.sort_values("PTPD_Aseg", ascending=True)
     
+    # Barras apiladas: TI + TDP = total de afiliaciones
+    fig_geo = go.Figure([go.Bar(x=agg[col], y=agg["entidad_display"], orientation="h", name=nombre, marker_color=color)
+                         for col, nombre, color in (("TI", "Trabajadores Independientes (TI)", COL_TI),
+                                                    ("PTPD_Puestos", "Trabajadores de Plataformas (TDP)", COL_TDP))])
     fig_geo.update_traces(hovertemplate="<b>%{y}</b><br>%{fullData.name}: %{x:,.0f}<extra></extra>")
-    new_names = {"TI": "Trabajadores Independientes (TI)", "PTPD_Puestos": "Trabajadores de Plataformas (TDP)"}
-    fig_geo.for_each_trace(lambda t: t.update(name = new_names.get(t.name, t.name)))
     
     fig_geo.add_trace(go.Scatter(
         x=agg["PTPD_Aseg"], y=agg["entidad_display"], mode="text",
@@ -397,7 +437,7 @@ def layout_mes(df, df_sbc, mes_label, app):
     ))
     
     fig_geo.update_layout(
-        margin=dict(r=220, t=60, b=50),
+        barmode="relative", height=800, margin=dict(r=220, t=60, b=50),
         legend=dict(orientation="h", y=1.08, x=0),
         annotations=[
             dict(
@@ -416,100 +456,176 @@ def layout_mes(df, df_sbc, mes_label, app):
     )
     fig_geo = apply_theme(fig_geo)
     fig_geo.update_layout(yaxis_title="", xaxis_title="Total Afiliaciones", legend=dict(title=None))
+    return fig_geo
+
+# --- Pirámides por entidad: múltiplos pequeños ---
+PIRAMIDES_COLUMNAS = 6
+
+def fig_piramides_entidades(pir):
+    """
+    Una pirámide (% de las afiliaciones de cada entidad) por entidad de
+    nacimiento, en una cuadrícula con la misma escala en todas. Los porcentajes
+    llegan ya calculados para todas a la vez (nucleo.piramides_entidades) y la
+    cuadrícula se dibuja sobre un solo par de ejes: cada pirámide es un bloque de
+    barras desplazado (base, y), así que son dos trazas y no un subplot por entidad.
+    """
+    pct, entidades, edades = pir["pct"], pir["entidades"], pir["edades"]
+    n, r = len(entidades), len(edades)
+    if not n: return go.Figure()
+    filas = -(-n // PIRAMIDES_COLUMNAS)
+    tope = float(pct[:, :, :2].max()) or 10
+    ancho, alto = 2.3 * tope, r + 3
+    fila, col = np.divmod(np.arange(n), PIRAMIDES_COLUMNAS)
+    centro = (col * ancho).round(3)
+    suelo = (filas - 1 - fila) * alto
+    base = np.repeat(centro, r)
+    y = (suelo[:, None] + np.arange(r)).ravel()
+    nombres, rangos = np.repeat(entidades, r), np.tile(edades, n)
+    fig = go.Figure()
+    for j, signo, sexo, color in ((0, -1, "Hombres", COL_HOMBRES), (1, 1, "Mujeres", COL_MUJERES)):
+        v = pct[:, :, j].ravel()
+        fig.add_bar(x=(signo * v).round(3), y=y, base=base, width=0.85, orientation="h", marker_color=color, name=sexo,
+                    customdata=list(zip(v.round(2).tolist(), nombres, rangos)),
+                    hovertemplate=f"<b>%{{customdata[1]}}</b><br>%{{customdata[2]}}<br>{sexo}: %{{customdata[0]:.1f}}%<extra></extra>")
+    # Eje central de cada pirámide
+    fig.add_scatter(x=np.repeat(centro, 3), y=np.column_stack([suelo - 0.5, suelo + r - 0.5, np.full(n, np.nan)]).ravel(),
+                    mode="lines", line=dict(color="#E5E5E5", width=1), showlegend=False, hoverinfo="skip")
+    fig = apply_theme(fig)
+    fig.update_layout(
+        barmode="overlay", height=150 * filas + 60, margin=dict(t=40, l=10, r=10, b=10),
+        xaxis=dict(visible=False, fixedrange=True, range=[-ancho / 2, (PIRAMIDES_COLUMNAS - 0.5) * ancho]),
+        yaxis=dict(visible=False, fixedrange=True, range=[-1, filas * alto - 1]),
+        annotations=[dict(text=e, x=c, y=s + r, xref="x", yref="y", yanchor="bottom", showarrow=False,
+                          font=dict(size=11, color=TEXTO_GRIS)) for e, c, s in zip(entidades, centro, suelo)]
+    )
+    return fig
 
-    def make_pop_pyramid(d, title):
-        if d.empty: return go.Figure()
-        age_df = d.groupby("Rango_edad_2", as_index=False)[["PTPD_Aseg_H", "PTPD_Aseg_M"]].sum()
-        age_df = sort_ages(age_df, "Rango_edad_2")
-        
-        tot = age_df["PTPD_Aseg_H"].sum() + age_df["PTPD_Aseg_M"].sum()
-        if tot > 0:
-            age_df["H"] = age_df["PTPD_Aseg_H"]/tot*100
-            age_df["M"] = age_df["PTPD_Aseg_M"]/tot*100
-        else:
-            age_df["H"]=0; age_df["M"]=0
-            
-        age_df["H_neg"] = -age_df["H"]
-        
-        max_pct = max(age_df["H"].max(), age_df["M"].max())
-        if pd.isna(max_pct) or max_pct == 0: max_pct = 10
-        t_vals = [-max_pct, -max_pct/2, 0, max_pct/2, max_pct]
-        t_text = [f"{abs(x):.1f}%" for x in t_vals]
+# --- Pestañas mensuales: resumen primero, secciones pesadas después ---
+def make_pop_pyramid(age_df, title):
+    if age_df.empty: return go.Figure()
 
-        # 1. Crear la figura base
-        fig = px.bar(age_df, x="H_neg", y="Rango_edad_2", orientation="h", color_discrete_sequence=[COL_HOMBRES])
-        
-        # --- CORRECCIÓN AQUÍ ---
-        # Asignamos explícitamente el nombre "Hombres" a la traza principal de datos
-        fig.data[0].name = "Hombres"
-        # Aseguramos que no duplique la leyenda (ya que tienes una barra dummy abajo para eso)
-        fig.data[0].showlegend = False 
-        # -----------------------
-
-        fig.add_bar(x=age_df["M"], y=age_df["Rango_edad_2"], orientation="h", marker_color=COL_MUJERES, name="Mujeres")
-        
-        # Esta es tu barra dummy para forzar la leyenda (la mantenemos igual)
-        fig.add_bar(x=[0], y=[age_df["Rango_edad_2"].iloc[0]], orientation="h", marker_color=COL_HOMBRES, name="Hombres", showlegend=True)
-        
-        if not age_df.empty:
-            # Ahora %{fullData.name} leerá "Hombres" correctamente en la traza 0
-            fig.update_traces(hovertemplate="<b>%{y}</b><br>%{fullData.name}: %{customdata:.1f}%<extra></extra>")
-            fig.data[0].customdata = age_df["H"]
-            fig.data[1].customdata = age_df["M"]
-        
-        fig = apply_theme(fig)
-        fig.update_layout(
-            barmode="overlay", title=title, xaxis_title="% Población", yaxis_title=None,
-            xaxis=dict(tickvals=t_vals, ticktext=t_text),
-            legend=dict(y=1.1, x=0.5, xanchor="center")
-        )
-        return fig
+    # % sobre el total de afiliaciones (H + M + NB), como bloque_genero
+    tot = age_df["PTPD_Aseg"].sum()
+    if tot > 0:
+        age_df["H"] = age_df["PTPD_Aseg_H"]/tot*100
+        age_df["M"] = age_df["PTPD_Aseg_M"]/tot*100
+    else:
+        age_df["H"]=0; age_df["M"]=0
 
-    fig_pir_nal = make_pop_pyramid(df, "Nacional")
-    fig_pir_cdmx = make_pop_pyramid(filtro_cdmx(df), "CDMX")
+    age_df["H_neg"] = -age_df["H"]
 
-    return html.Div([
-        bloque_totales(df, filtro_cdmx(df), app, "Resumen Ejecutivo"),
-        bloque_genero(df, filtro_cdmx(df), app, "Estructura Demográfica"),
-        
-        html.Div([
+    max_pct = max(age_df["H"].max(), age_df["M"].max())
+    if pd.isna(max_pct) or max_pct == 0: max_pct = 10
+    t_vals = [-max_pct, -max_pct/2, 0, max_pct/2, max_pct]
+    t_text = [f"{abs(x):.1f}%" for x in t_vals]
+
+    # 1. Crear la figura base: la traza de datos de Hombres no sale en la leyenda
+    # (de eso se encarga la barra dummy de abajo)
+    fig = go.Figure(go.Bar(x=age_df["H_neg"], y=age_df["Rango_edad_2"], orientation="h", marker_color=COL_HOMBRES,
+                           name="Hombres", showlegend=False))
+
+    fig.add_bar(x=age_df["M"], y=age_df["Rango_edad_2"], orientation="h", marker_color=COL_MUJERES, name="Mujeres")
+
+    # Esta es tu barra dummy para forzar la leyenda (la mantenemos igual)
+    fig.add_bar(x=[0], y=[age_df["Rango_edad_2"].iloc[0]], orientation="h", marker_color=COL_HOMBRES, name="Hombres", showlegend=True)
+
+    if not age_df.empty:
+        # %{fullData.name} lee "Hombres" en la traza 0
+        fig.update_traces(hovertemplate="<b>%{y}</b><br>%{fullData.name}: %{customdata:.1f}%<extra></extra>")
+        fig.data[0].customdata = age_df["H"]
+        fig.data[1].customdata = age_df["M"]
+
+    fig = apply_theme(fig)
+    fig.update_layout(
+        barmode="overlay", title=title, xaxis_title="% Población", yaxis_title=None,
+        xaxis=dict(tickvals=t_vals, ticktext=t_text),
+        legend=dict(y=1.1, x=0.5, xanchor="center")
+    )
+    return fig
+
+# Cada sección llega en su propia petición una vez montado el resumen (ver cargar_seccion);
+# la altura mínima reserva su lugar para que la página no salte al llenarse
+SECCIONES_MES = {"geo": "900px", "piramides": "1400px", "sectores_nacional": "600px", "sectores_cdmx": "600px"}
+PESTANAS_PROGRESIVAS = os.environ.get("IMSS_PESTANAS_PROGRESIVAS", "1") == "1"
+
+def resumen_mes(mes_label, app):
+    """KPI y estructura demográfica: sólo leen totales del retículo (ver cubos.py)."""
+    ret = reticulo()
+    tot_nal, tot_cdmx = ret.consultar(mes=mes_label), ret.consultar(mes=mes_label, ambito="cdmx")
+    return [
+        bloque_totales(tot_nal, tot_cdmx, app, "Resumen Ejecutivo", exportar=enlaces_exportar(app, "totales", mes_label)),
+        bloque_genero(tot_nal, tot_cdmx, app, "Estructura Demográfica"),
+    ]
+
+def seccion_mes(df, df_sbc, mes_label, seccion, app):
+    if seccion == "geo":
+        fig_geo = fig_geo_barras(agregado_entidad(df, mes_label))
+        return html.Div([
             html.H2("Distribución Geográfica por entidad de nacimiento", style=H2_STYLE),
-            dcc.Graph(figure=fig_geo, id={'type': 'copy-graph', 'index': f"geo-{mes_label}"})
-        ], style=CARD_STYLE),
-        
-        html.Div([
+            dcc.RadioItems(
+                id={'type': 'geo-modo', 'index': f"geo-{mes_label}"},
+                options=[{"label": "Barras", "value": "barras"}] + [
+                    {"label": f"Mapa – {nombre}", "value": metrica} for metrica, (nombre, _) in METRICAS_MAPA.items()
+                ],
+                value="barras", inline=True,
+                inputStyle={"marginRight": "5px"}, labelStyle={"marginRight": "20px", "cursor": "pointer"},
+                style={"color": GUINDA, "fontWeight": "600", "fontSize": "13px", "marginBottom": "10px"}
+            ),
+            dcc.Graph(figure=fig_geo, id={'type': 'copy-graph', 'index': f"geo-{mes_label}"}),
+            enlaces_exportar(app, "entidades", mes_label)
+        ], style=CARD_STYLE)
+    if seccion == "piramides":
+        # Edades desde el cubo más pequeño que cubre cada consulta (ver cubos.py)
+        ret = reticulo()
+        fig_pir_nal = make_pop_pyramid(ret.consultar(por=("edad",), mes=mes_label), "Nacional")
+        fig_pir_cdmx = make_pop_pyramid(ret.consultar(por=("edad",), mes=mes_label, ambito="cdmx"), "CDMX")
+        fig_pir_entidades = fig_piramides_entidades(piramides_entidades(mes_label))
+        return html.Div([
             html.H2("Pirámides de Edad (Afiliaciones)", style=H2_STYLE),
             html.Div([
                 html.Div(dcc.Graph(figure=fig_pir_nal, id={'type': 'copy-graph', 'index': f"pir-nal-{mes_label}"}), style={"flex":1}),
                 html.Div(dcc.Graph(figure=fig_pir_cdmx, id={'type': 'copy-graph', 'index': f"pir-cdmx-{mes_label}"}), style={"flex":1})
-            ], style={"display":"flex"})
-        ], style=CARD_STYLE),
-        
-        # Pasar el MES para IDs únicos
-        bloque_sectores(df_sbc, "Análisis Sectorial - Nacional", mes_label),
-        bloque_sectores(filtro_cdmx(df_sbc), "Análisis Sectorial - CDMX", mes_label)
-    ])
+            ], style={"display":"flex"}),
+            html.H4("Por entidad de nacimiento (% de las afiliaciones de cada entidad; Hombres ← | → Mujeres)",
+                    style={"color": GUINDA, "marginLeft": "10px", "marginTop": "20px"}),
+            dcc.Graph(figure=fig_pir_entidades, id={'type': 'copy-graph', 'index': f"pir-entidades-{mes_label}"}),
+            enlaces_exportar(app, "edades", mes_label)
+        ], style=CARD_STYLE)
+    # Pasar el MES para IDs únicos
+    if seccion == "sectores_nacional":
+        return bloque_sectores(df_sbc, "Análisis Sectorial - Nacional", mes_label, exportar=enlaces_exportar(app, "salarios", mes_label, "nacional"))
+    if seccion == "sectores_cdmx":
+        return bloque_sectores(vista_ambito(df_sbc, "cdmx"), "Análisis Sectorial - CDMX", mes_label, exportar=enlaces_exportar(app, "salarios", mes_label, "cdmx"))
+    raise KeyError(seccion)
+
+def marcador_seccion(seccion, mes_label):
+    return dcc.Loading(html.Div(id={'type': 'seccion-mes', 'mes': mes_label, 'seccion': seccion}, style={"minHeight": SECCIONES_MES[seccion]}),
+                       type="circle", color=GUINDA)
+
+def layout_mes(df, df_sbc, mes_label, app, progresivo=False):
+    """La pestaña completa o, con progresivo, el resumen y un marcador por sección."""
+    if progresivo: secciones = [marcador_seccion(s, mes_label) for s in SECCIONES_MES]
+    else: secciones = [seccion_mes(df, df_sbc, mes_label, s, app) for s in SECCIONES_MES]
+    return html.Div(resumen_mes(mes_label, app) + secciones)
 
 # --- Pestaña Evolución ---
-def layout_evolucion(df_jul, df_ago, df_sep, df_oct, sj, sa, ss, so):
-    df_all = pd.concat([df_jul, df_ago, df_sep, df_oct], ignore_index=True)
+def layout_evolucion(sj, sa, ss, so):
     order = ["Julio", "Agosto", "Septiembre", "Octubre"]
-    df_all["Mes"] = pd.Categorical(df_all["Mes"], categories=order, ordered=True)
     sbc_all = pd.concat([sj, sa, ss, so], ignore_index=True)
     sbc_all["Mes"] = pd.Categorical(sbc_all["Mes"], categories=order, ordered=True)
 
-    nat = df_all.groupby("Mes", as_index=False)[["PTPD_Aseg","PTPD_Puestos","independientes","PTPD_Aseg_H","PTPD_Aseg_M","PTPD_Puestos_H","PTPD_Puestos_M","independientes_H","independientes_M"]].sum()
+    # Totales por mes: cubo (mes) para Nacional, (mes, entidad) para CDMX
+    nat = reticulo().consultar(por=("mes",))
     nat["Tasa"] = (nat["PTPD_Puestos"]/nat["PTPD_Aseg"]*100).fillna(0)
-    cdmx_all = filtro_cdmx(df_all)
-    cdmx = cdmx_all.groupby("Mes", as_index=False)[["PTPD_Aseg","PTPD_Puestos","independientes","PTPD_Aseg_H","PTPD_Aseg_M","PTPD_Puestos_H","PTPD_Puestos_M","independientes_H","independientes_M"]].sum()
+    cdmx = reticulo().consultar(por=("mes",), ambito="cdmx")
     cdmx["Tasa"] = (cdmx["PTPD_Puestos"]/cdmx["PTPD_Aseg"]*100).fillna(0)
 
     def make_var_table(data):
         d = data.copy()
         d["Var_abs_ben"] = d["PTPD_Aseg"].diff()
-        d["Var_pct_ben"] = d["PTPD_Aseg"].pct_change() * 100
+        d["Var_pct_ben"] = (d["PTPD_Aseg"] / d["PTPD_Aseg"].shift() - 1) * 100
         d["Var_abs_tdp"] = d["PTPD_Puestos"].diff()
-        d["Var_pct_tdp"] = d["PTPD_Puestos"].pct_change() * 100
+        d["Var_pct_tdp"] = (d["PTPD_Puestos"] / d["PTPD_Puestos"].shift() - 1) * 100
         
         final = pd.DataFrame()
         final["Periodo"] = d["Mes"]
@@ -533,19 +649,6 @@ def layout_evolucion(df_jul, df_ago, df_sep, df_oct, sj, sa, ss, so):
         final["Brecha salarial H/M (%)"] = g["Brecha"].apply(lambda x: f"{x:.2f}")
         return final
 
-    TH_STYLE = {"backgroundColor": GUINDA, "color": "white", "padding": "10px", "textAlign": "center", "border": "1px solid #ddd"}
-    TD_STYLE = {"padding": "8px", "border": "1px solid #ddd", "textAlign": "center"}
-
-    def render_html_table(df, title):
-        return html.Div([
-            html.H4(title, style={"color":GUINDA, "textAlign":"center", "marginBottom":"10px"}),
-            html.Table(
-                [html.Tr([html.Th(c, style=TH_STYLE) for c in df.columns])] +
-                [html.Tr([html.Td(df.iloc[i][c], style=TD_STYLE) for c in df.columns]) for i in range(len(df))],
-                style={"width":"100%", "borderCollapse":"collapse", "fontSize":"13px", "margin":"0 auto"}
-            )
-        ], style={"marginBottom":"30px", "overflowX":"auto"})
-
     def plot_lines(data, cols, names, colors, title, y_title):
         fig = go.Figure()
         for col, name, color in zip(cols, names, colors):
@@ -565,9 +668,9 @@ def layout_evolucion(df_jul, df_ago, df_sep, df_oct, sj, sa, ss, so):
         fig_rate = apply_theme(fig_rate)
         fig_rate.update_layout(title="Tasa Formalización", yaxis_title="%")
 
-        f_sex_ben = plot_lines(data, ["PTPD_Aseg_H", "PTPD_Aseg_M"], ["Hombres", "Mujeres"], [COL_HOMBRES, COL_MUJERES], "Afiliaciones", "Personas")
-        f_sex_tdp = plot_lines(data, ["PTPD_Puestos_H", "PTPD_Puestos_M"], ["Hombres", "Mujeres"], [COL_HOMBRES, COL_MUJERES], "TDP", "Personas")
-        f_sex_ind = plot_lines(data, ["independientes_H", "independientes_M"], ["Hombres", "Mujeres"], [COL_HOMBRES, COL_MUJERES], "Independientes", "Personas")
+        f_sex_ben = plot_lines(data, ["PTPD_Aseg_H", "PTPD_Aseg_M", "PTPD_Aseg_NB"], ["Hombres", "Mujeres", "No binario"], [COL_HOMBRES, COL_MUJERES, COL_NO_BINARIO], "Afiliaciones", "Personas")
+        f_sex_tdp = plot_lines(data, ["PTPD_Puestos_H", "PTPD_Puestos_M", "PTPD_Puestos_NB"], ["Hombres", "Mujeres", "No binario"], [COL_HOMBRES, COL_MUJERES, COL_NO_BINARIO], "TDP", "Personas")
+        f_sex_ind = plot_lines(data, ["independientes_H", "independientes_M", "independientes_NB"], ["Hombres", "Mujeres", "No binario"], [COL_HOMBRES, COL_MUJERES, COL_NO_BINARIO], "Independientes", "Personas")
         
         df_vars = make_var_table(data)
         df_sal = make_sal_table(sbc_data, is_cdmx)
@@ -598,10 +701,259 @@ def layout_evolucion(df_jul, df_ago, df_sep, df_oct, sj, sa, ss, so):
         build_section(cdmx, sbc_all, "Evolución Ciudad de México", True)
     ])
 
+# --- Pestaña Explorador (filtros; los agregados viven en el servidor) ---
+SEXOS = {"todos": ("Total", ""), "H": ("Hombres", "_H"), "M": ("Mujeres", "_M"), "NB": ("No binario", "_NB")}
+VACIO_EXPLORADOR = pd.DataFrame(columns=["Rango_edad_2", "entidad_norm", "entidad_display", "Aseg", "Puestos", "TI"])
+
+def opciones_explorador(meses):
+    entidades, sectores = {}, set()
+    for df, df_sbc in meses.values():
+        if not df.empty: entidades.update(zip(df["entidad_norm"], df["entidad_display"]))
+        if "Sector" in df_sbc.columns: sectores.update(df_sbc["Sector"].unique())
+    return sorted(entidades.items(), key=lambda kv: kv[1]), sorted(sectores)
+
+def layout_explorador(meses):
+    entidades, sectores = opciones_explorador(meses)
+    ETIQUETA = {"fontSize": "12px", "color": "#777", "marginBottom": "4px", "fontWeight": "600"}
+
+    def control(etiqueta, comp):
+        return html.Div([html.Div(etiqueta, style=ETIQUETA), comp], style={"flex": 1, "minWidth": "200px"})
+
+    return html.Div([
+        # Sólo viaja la clave de los filtros (ver aplicar_filtros)
+        dcc.Store(id="exp-clave"),
+        html.Div([
+            html.H2("Explorador por filtros", style=H2_STYLE),
+            html.Div([
+                control("Periodo", dcc.Dropdown(id="exp-mes", options=list(meses), value=list(meses)[-1], clearable=False)),
+                control("Entidad de nacimiento", dcc.Dropdown(
+                    id="exp-entidad", value="nacional", clearable=False,
+                    options=[{"label": "Nacional", "value": "nacional"}] + [{"label": n, "value": k} for k, n in entidades]
+                )),
+                control("Sector", dcc.Dropdown(
+                    id="exp-sector", value="todos", clearable=False,
+                    options=[{"label": "Todos", "value": "todos"}] + [{"label": s, "value": s} for s in sectores]
+                )),
+                control("Sexo", dcc.RadioItems(
+                    id="exp-sexo", value="todos", inline=True,
+                    options=[{"label": n, "value": k} for k, (n, _) in SEXOS.items()],
+                    inputStyle={"marginRight": "5px"}, labelStyle={"marginRight": "15px", "cursor": "pointer"},
+                    style={"color": GUINDA, "fontWeight": "600", "fontSize": "13px", "paddingTop": "8px"}
+                )),
+            ], style={"display": "flex", "gap": "20px", "flexWrap": "wrap"})
+        ], style=CARD_STYLE),
+        html.Div(id="exp-kpis", style=CARD_STYLE),
+        html.Div([
+            # Las figuras llegan con su estructura; los filtros sólo envían parches con los datos
+            html.Div(dcc.Graph(id="exp-edades", figure=fig_explorador_edades(VACIO_EXPLORADOR)), style={**CARD_STYLE, "flex": 1, "marginRight": "15px"}),
+            html.Div([
+                html.Small("Clic en una entidad para filtrar por ella (clic de nuevo para volver a Nacional)", style={"color": "#777"}),
+                dcc.Graph(id="exp-entidades", figure=fig_explorador_entidades(VACIO_EXPLORADOR, "nacional"))
+            ], style={**CARD_STYLE, "flex": 1})
+        ], style={"display": "flex"})
+    ])
+
+def kpis_explorador(totales, etiqueta):
+    def kpi(label, val, color):
+        return html.Div([
+            html.Div(label, style={"fontSize": "13px", "color": "#777", "marginBottom": "4px"}),
+            html.Div(fmt_num(val), style={"fontSize": "26px", "fontWeight": "800", "color": color})
+        ], style={"flex": 1})
+
+    return [
+        html.H4(etiqueta, style={"color": GUINDA, "borderBottom": f"2px solid {DORADO}", "marginBottom": "10px", "marginTop": 0}),
+        html.Div([
+            kpi("Afiliaciones", totales["Aseg"], COL_BENEF),
+            kpi("Trab. Plataformas (TDP)", totales["Puestos"], COL_TDP),
+            kpi("Trab. Independientes (TI)", totales["TI"], COL_TI),
+        ], style={"display": "flex"})
+    ]
+
+def trazas_explorador_edades(edades):
+    return [{"x": edades["Puestos"], "y": edades["Rango_edad_2"]}, {"x": edades["TI"], "y": edades["Rango_edad_2"]}]
+
+def fig_explorador_edades(edades):
+    tdp, ti = trazas_explorador_edades(edades)
+    fig = go.Figure([
+        go.Bar(**tdp, orientation="h", name="TDP", marker_color=COL_TDP,
+               hovertemplate="<b>%{y}</b><br>TDP: %{x:,.0f}<extra></extra>"),
+        go.Bar(**ti, orientation="h", name="TI", marker_color=COL_TI,
+               hovertemplate="<b>%{y}</b><br>TI: %{x:,.0f}<extra></extra>"),
+    ])
+    fig = apply_theme(fig)
+    fig.update_layout(barmode="stack", title="Afiliaciones por edad", xaxis_title="Personas", yaxis_title=None, height=600)
+    return fig
+
+def trazas_explorador_entidades(entidades, seleccion):
+    d = entidades.sort_values("Aseg", ascending=True)
+    colores = [GUINDA if k == seleccion else COL_BENEF for k in d["entidad_norm"]]
+    return [{"x": d["Aseg"], "y": d["entidad_display"], "customdata": d["entidad_norm"], "marker_color": colores}]
+
+def fig_explorador_entidades(entidades, seleccion):
+    barras, = trazas_explorador_entidades(entidades, seleccion)
+    fig = go.Figure(go.Bar(**barras, orientation="h", hovertemplate="<b>%{y}</b><br>Afiliaciones: %{x:,.0f}<extra></extra>"))
+    fig = apply_theme(fig)
+    fig.update_layout(title="Afiliaciones por entidad", xaxis_title="Afiliaciones", yaxis_title=None, height=800)
+    return fig
+
+# --- Pestaña Comparar (periodos arbitrarios sobre agregados precalculados) ---
+CONCEPTOS = {"PTPD_Aseg": "Afiliaciones", "PTPD_Puestos": "TDP", "independientes": "TI"}
+AMBITOS_COMPARAR = {"nacional": "Nacional", "cdmx": "Ciudad de México"}
+PALETA_PERIODOS = [GUINDA, COL_TDP, DORADO, COL_TI, COL_BENEF, COL_HOMBRES]
+
+def layout_comparar(meses):
+    periodos = list(meses)
+    return html.Div([
+        html.Div([
+            html.H2("Comparar periodos", style=H2_STYLE),
+            html.Div([
+                html.Div(dcc.Dropdown(id="cmp-periodos", options=periodos, value=[periodos[0], periodos[-1]], multi=True, clearable=False),
+                         style={"flex": 2, "minWidth": "300px"}),
+                dcc.RadioItems(
+                    id="cmp-ambito", value="nacional", inline=True,
+                    options=[{"label": n, "value": k} for k, n in AMBITOS_COMPARAR.items()],
+                    inputStyle={"marginRight": "5px"}, labelStyle={"marginRight": "20px", "cursor": "pointer"},
+                    style={"flex": 1, "color": GUINDA, "fontWeight": "600", "fontSize": "13px", "paddingTop": "8px"}
+                ),
+            ], style={"display": "flex", "gap": "20px", "flexWrap": "wrap"}),
+            html.Small("Las diferencias se calculan contra el primer periodo seleccionado (en orden cronológico).", style={"color": "#777"})
+        ], style=CARD_STYLE),
+        html.Div(id="cmp-tablas", style=CARD_STYLE),
+        # Las gráficas traen todas sus trazas (un par por periodo); cada comparación sólo las parcha
+        html.Div([
+            html.Div([
+                html.Div(dcc.Graph(figure=fig_comparar_piramide(meses), id={'type': 'copy-graph-parche', 'index': "cmp-pir"}), style={**CARD_STYLE, "flex": 1, "marginRight": "15px"}),
+                html.Div(dcc.Graph(figure=fig_comparar_cambio(meses), id={'type': 'copy-graph-parche', 'index': "cmp-dpir"}), style={**CARD_STYLE, "flex": 1}),
+            ], style={"display": "flex"}),
+            html.Div(id="cmp-salarios", style=CARD_STYLE),
+        ], id="cmp-graficas")
+    ])
+
+SEXOS_PIRAMIDE = (("PTPD_Aseg_H", -1, "Hombres", COL_HOMBRES), ("PTPD_Aseg_M", 1, "Mujeres", COL_MUJERES))
+
+def fig_comparar_piramide(meses):
+    """Pirámides superpuestas: un par de trazas (Hombres, Mujeres) por periodo, ocultas hasta que se elige."""
+    fig = go.Figure()
+    for i, m in enumerate(meses):
+        for _, signo, sexo, _ in SEXOS_PIRAMIDE:
+            fig.add_trace(go.Scatter(
+                x=[], y=[], mode="lines+markers", name=m, legendgroup=m, showlegend=(signo > 0), visible=False,
+                line=dict(color=PALETA_PERIODOS[i % len(PALETA_PERIODOS)], width=2), marker=dict(size=6),
+                hovertemplate=f"<b>%{{y}}</b><br>{m} · {sexo}: %{{customdata:.2f}}%<extra></extra>"
+            ))
+    fig = apply_theme(fig)
+    fig.update_layout(title="Pirámide de afiliaciones (% del total) – Hombres ← | → Mujeres", xaxis_title="% Población",
+                      yaxis_title=None, height=500, legend=dict(y=1.1))
+    fig.update_xaxes(tickformat=".1f", zeroline=True, zerolinecolor="#999")
+    return fig
+
+def fig_comparar_cambio(meses):
+    """Cambio por edad contra el periodo base: un par de barras por periodo, ocultas hasta que se elige."""
+    fig = go.Figure()
+    for m in meses:
+        for _, _, sexo, c in SEXOS_PIRAMIDE:
+            fig.add_bar(x=[], y=[], orientation="h", name=f"{sexo} {m}", marker_color=c, visible=False)
+    fig = apply_theme(fig)
+    fig.update_layout(title="Cambio en la estructura por edad (pp)", barmode="group", xaxis_title="Puntos porcentuales",
+                      yaxis_title=None, height=500, legend=dict(y=1.1))
+    return fig
+
+def contenido_comparar(meses, periodos, ambito):
+    """
+    Tablas y trazas de la comparación, en el orden de fig_comparar_piramide /
+    fig_comparar_cambio; None si hay menos de dos periodos.
+    """
+    periodos = [m for m in meses if m in (periodos or [])]
+    if len(periodos) < 2: return None
+    aggs = {m: agregado_periodo(*meses[m], m, ambito) for m in periodos}
+    base, otros = periodos[0], periodos[1:]
+    sufijo = AMBITOS_COMPARAR[ambito]
+
+    def con_deltas(valores, fmt_val, fmt_delta, pct=True):
+        # valores: filas = concepto, columnas = periodo; Δ = resta contra la columna base
+        delta = valores.sub(valores[base], axis=0)
+        tabla = pd.DataFrame({"Concepto": valores.index})
+        for m in periodos:
+            tabla[m] = [fmt_val(x) for x in valores[m]]
+        for m in otros:
+            tabla[f"Δ {m} vs {base}"] = [fmt_delta(x) for x in delta[m]]
+            if pct:
+                rel = delta[m] / valores[base].where(valores[base] != 0) * 100
+                tabla[f"Δ% {m}"] = [f"{x:+.1f}%" if pd.notna(x) else "-" for x in rel]
+        return tabla
+
+    # 1. Totales
+    tot = pd.DataFrame({m: a["totales"] for m, a in aggs.items()})
+    t_tot = con_deltas(tot.loc[list(CONCEPTOS)].rename(index=CONCEPTOS), fmt_num, lambda x: f"{x:+,.0f}")
+
+    # 2. Estructura por sexo (% mujeres; Δ en puntos porcentuales)
+    muj = pd.DataFrame({
+        nombre: tot.loc[f"{col}_M"] / tot.loc[col].where(lambda x: x > 0) * 100
+        for col, nombre in CONCEPTOS.items()
+    }).T.fillna(0)
+    t_sexo = con_deltas(muj, lambda x: f"{x:.1f}%", lambda x: f"{x:+.1f} pp", pct=False)
+
+    # 3. Pirámides superpuestas y cambio por edad
+    presentes = set().union(*(a["edades"].index for a in aggs.values()))
+    orden = [c for c in aggs[base]["edades"].index.categories if c in presentes]
+    pir = {m: a["edades"].reindex(orden).fillna(0) for m, a in aggs.items()}
+    pir = {m: e / max(e.to_numpy().sum(), 1) * 100 for m, e in pir.items()}
+    vacia = {"visible": False, "x": [], "y": []}
+    trazas_pir, trazas_dpir = [], []
+    for m in meses:
+        for col, signo, sexo, _ in SEXOS_PIRAMIDE:
+            trazas_pir.append({"visible": True, "x": signo * pir[m][col], "y": orden, "customdata": pir[m][col],
+                               "line_dash": "solid" if m == base else "dot"} if m in pir else {**vacia, "customdata": []})
+            trazas_dpir.append({
+                "visible": True, "x": pir[m][col] - pir[base][col], "y": orden, "marker_opacity": 1 if m == otros[-1] else 0.5,
+                "hovertemplate": f"<b>%{{y}}</b><br>{sexo} {m} vs {base}: %{{x:+.2f}} pp<extra></extra>"
+            } if m in otros else vacia)
+
+    # 4. Salarios por sector
+    sal = pd.concat({m: a["salarios"] for m, a in aggs.items()}, axis=1)
+    filas = {}
+    for sector in sal.index:
+        for col, sexo in (("SalarioMasc", "Hombres"), ("SalarioFem", "Mujeres")):
+            filas[f"{sector} – {sexo}"] = {m: sal.loc[sector, (m, col)] if (m, col) in sal.columns else float("nan") for m in periodos}
+    t_sal = con_deltas(pd.DataFrame(filas).T.reindex(columns=periodos), lambda x: f"${x:,.2f}" if pd.notna(x) else "-",
+                       lambda x: f"{x:+,.2f}" if pd.notna(x) else "-")
+
+    return {
+        "tablas": [render_html_table(t_tot, f"Totales – {sufijo}"), render_html_table(t_sexo, f"Participación de mujeres – {sufijo}")],
+        "salarios": render_html_table(t_sal, f"Salario base promedio por sector – {sufijo}"),
+        "piramide": trazas_pir,
+        "cambio": trazas_dpir,
+        "titulo_cambio": f"Cambio en la estructura por edad vs {base} (pp)",
+    }
+
 # ==========================================
 # 5. APP PRINCIPAL
 # ==========================================
 app = dash.Dash(__name__, title="IMSS Plataformas - Final v5", suppress_callback_exceptions=True)
+server = app.server   # gunicorn dash_app1:server
+
+# plotly importa sus serializadores opcionales (orjson) y carga el template por defecto
+# con la primera figura; si dos hilos llegan a la vez, uno puede ver el módulo a medio
+# importar. Se resuelve aquí y las figuras se construyen en paralelo sin candado.
+pio.json.to_json_plotly({})
+pio.templates[pio.templates.default]
+
+# Perfilado de _dash-layout / _dash-update-component (ver perfilado.py)
+instalar_perfilado(app.server)
+
+# --- Caché de larga duración para assets versionados ---
+CACHE_INMUTABLE = "public, max-age=31536000, immutable"
+RE_NOMBRE_HASH = re.compile(r"\.[0-9a-f]{8,}\.[A-Za-z0-9]+$")
+
+@app.server.after_request
+def cache_assets(resp):
+    # Dash versiona sus CSS/JS de assets con ?m=<mtime>; url_asset usa ?v=<hash>;
+    # las fuentes llevan el hash en el nombre. Todo lo versionado es inmutable.
+    ruta_assets = app.config.routes_pathname_prefix + app.config.assets_url_path.strip("/") + "/"
+    if request.path.startswith(ruta_assets) and resp.status_code == 200:
+        if "v" in request.args or "m" in request.args or RE_NOMBRE_HASH.search(request.path):
+            resp.headers["Cache-Control"] = CACHE_INMUTABLE
+    return resp
 
 glosario = html.Details([
     html.Summary("Glosario de Términos y Notas Metodológicas (Clic para desplegar)", style={"cursor":"pointer", "color":GUINDA, "fontWeight":"bold", "fontSize":"16px", "padding":"10px", "backgroundColor":"#eee", "borderRadius":"5px"}),
@@ -687,11 +1039,222 @@ glosario = html.Details([
 
     ], style={"padding":"20px", "lineHeight":"1.6", "fontSize":"14px", "color":"#333", "textAlign": "justify"})
 ], style={**CARD_STYLE, "padding":"0"})
-# Carga
-df_j = cargar_pd("PD_jul.csv", "Julio"); sbc_j = cargar_sbc("sbc_jul.csv", "Julio")
-df_a = cargar_pd("PD_ago.csv", "Agosto"); sbc_a = cargar_sbc("sbc_ago.csv", "Agosto")
-df_s = cargar_pd("PD_sep.csv", "Septiembre"); sbc_s = cargar_sbc("sbc_sep.csv", "Septiembre")
-df_o = cargar_pd("PD_oct.csv", "Octubre"); sbc_o = cargar_sbc("sbc_oct.csv", "Octubre")
+# Carga (una sola vez por proceso, compartida con los demás tableros)
+_t = time.perf_counter()
+MESES = datos()
+ARRANQUE["datos_ms"] = round((time.perf_counter() - _t) * 1000, 1)
+
+# ==========================================
+# 6. CACHÉ DE PESTAÑAS Y PRECALENTAMIENTO
+# ==========================================
+TAB_EVOLUCION = "evolucion"
+TAB_COMPARAR = "comparar"
+TAB_EXPLORADOR = "explorador"
+
+_TABS = {}
+_LOCK_DATOS = threading.Lock()
+LISTO = threading.Event()
+
+def claves_tabs():
+    return list(MESES) + [TAB_EVOLUCION, TAB_COMPARAR, TAB_EXPLORADOR]
+
+def claves_secciones():
+    return [(mes, s) for mes in MESES for s in SECCIONES_MES] if PESTANAS_PROGRESIVAS else []
+
+def congelar_figuras(comp):
+    """Sustituye cada go.Figure por su dict JSON: Dash ya no la valida ni copia al servirla."""
+    if isinstance(comp, (list, tuple)):
+        for c in comp: congelar_figuras(c)
+    elif isinstance(comp, Component):
+        if isinstance(getattr(comp, "figure", None), go.Figure):
+            comp.figure = comp.figure.to_plotly_json()
+        congelar_figuras(getattr(comp, "children", None))
+    return comp
+
+def construir_tab(clave):
+    if clave == TAB_EVOLUCION:
+        contenido = html.Div([
+            layout_evolucion(*(s for _, s in MESES.values())),
+            bloque_exportar_historico(app)
+        ])
+    elif clave == TAB_COMPARAR:
+        contenido = layout_comparar(MESES)
+    elif clave == TAB_EXPLORADOR:
+        contenido = layout_explorador(MESES)
+    else:
+        df, df_sbc = MESES[clave]
+        contenido = layout_mes(df, df_sbc, clave, app, progresivo=PESTANAS_PROGRESIVAS)
+    return congelar_figuras(contenido)
+
+def construir_seccion(clave):
+    mes, seccion = clave
+    df, df_sbc = MESES[mes]
+    return congelar_figuras(seccion_mes(df, df_sbc, mes, seccion, app))
+
+def tab_cacheada(clave):
+    # Varias vistas que piden la misma pestaña fría esperan una sola construcción (ver vuelo_unico.py)
+    return VUELOS.memorizar(_TABS, clave, construir_tab, clave)
+
+def seccion_cacheada(clave):
+    # Misma caché que las pestañas: clave (mes, sección)
+    return VUELOS.memorizar(_TABS, clave, construir_seccion, clave)
+
+def calentar():
+    """Construye en paralelo todas las pestañas y las vistas por ámbito por defecto."""
+    LISTO.clear()
+    hilos = int(os.environ.get("IMSS_PRECALENTAR_HILOS", 4))
+    try:
+        with ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="calentar") as pool:
+            previos = [pool.submit(vista_ambito, d, "cdmx") for par in MESES.values() for d in par]
+            previos.append(pool.submit(reticulo))
+            previos += [pool.submit(agregado_entidad, df, mes) for mes, (df, _) in MESES.items()]
+            previos += [pool.submit(agregado_periodo, df, df_sbc, mes, amb) for mes, (df, df_sbc) in MESES.items() for amb in AMBITOS_COMPARAR]
+            for f in previos: f.result()
+            pendientes = [(c, pool.submit(tab_cacheada, c)) for c in claves_tabs()]
+            pendientes += [(c, pool.submit(seccion_cacheada, c)) for c in claves_secciones()]
+            for clave, f in pendientes:
+                try: f.result()
+                except Exception: app.logger.exception("No se pudo precalentar la pestaña %s", clave)
+    finally:
+        # Una pestaña que falle se construye al primer acceso; no bloquea el tráfico
+        LISTO.set()
+
+def iniciar_calentamiento():
+    if os.environ.get("IMSS_PRECALENTAR", "1") != "1":
+        LISTO.set()
+        return
+    threading.Thread(target=calentar, name="calentar", daemon=True).start()
+
+def recargar_datos():
+    """Vuelve a leer los CSV, invalida las cachés y precalienta de nuevo."""
+    global MESES, _TABS
+    nuevos = recargar()
+    with _LOCK_DATOS:
+        MESES = nuevos
+        # Caché nueva: una pestaña en construcción con los datos anteriores se guarda en la descartada
+        _TABS = {}
+        ALMACEN.clear()
+    iniciar_calentamiento()
+
+# --- Salud: no tocan app.layout ni construyen figuras ---
+INICIO = time.time()
+
+@app.server.route("/healthz")
+def healthz():
+    return jsonify({"vivo": True, "pid": os.getpid(), "uptime_s": round(time.time() - INICIO, 1)})
+
+@app.server.route("/readyz")
+def readyz():
+    listo = LISTO.is_set()
+    claves = claves_tabs() + claves_secciones()
+    en_cache = sum(k in _TABS for k in claves)
+    cuerpo = {
+        "listo": listo,
+        "version_datos": INGESTA.get("version"),
+        "periodos": INGESTA.get("periodos", []),
+        "ingesta_s": INGESTA.get("duracion_s"),
+        "ingesta_fecha": INGESTA.get("fecha"),
+        "validacion": resumen_validacion(INGESTA.get("validacion")),
+        "arranque": ARRANQUE,
+        "cache": {"pestanas": en_cache, "total": len(claves), "llenado": round(en_cache / len(claves), 3)},
+        "sesiones": ALMACEN.estado(),
+        "nucleo": estado_nucleo(),
+    }
+    return jsonify(cuerpo), (200 if listo else 503)
+
+# --- Exportación de agregados (streaming desde la caché de agregados) ---
+CONJUNTOS_EXPORTAR = ("totales", "edades", "salarios", "entidades")
+
+def bloques_exportar(meses, conjunto, periodos, ambitos):
+    """Un DataFrame por periodo (y ámbito); se generan conforme se envían."""
+    for mes in periodos:
+        df, df_sbc = meses[mes]
+        if conjunto == "entidades":
+            agg = agregado_entidad(df, mes)
+            bloque = agg[["entidad_display", "PTPD_Aseg", "PTPD_Puestos", "TI"]].rename(columns={"entidad_display": "Entidad"})
+            bloque.insert(0, "Periodo", mes)
+            yield bloque
+            continue
+        for ambito in ambitos:
+            a = agregado_periodo(df, df_sbc, mes, ambito)
+            if conjunto == "totales": bloque = a["totales"].to_frame().T.reset_index(drop=True).astype("int64")
+            elif conjunto == "edades": bloque = a["edades"].reset_index()
+            else: bloque = a["salarios"].rename_axis("Sector").reset_index()
+            bloque.insert(0, "Ambito", ambito)
+            bloque.insert(0, "Periodo", mes)
+            yield bloque
+
+@app.server.route("/exportar/<conjunto>.<formato>")
+def exportar(conjunto, formato):
+    if conjunto not in CONJUNTOS_EXPORTAR or formato not in formatos_disponibles(): abort(404)
+    meses = MESES
+    periodo = request.args.get("periodo", "historico")
+    periodos = list(meses) if periodo == "historico" else [periodo]
+    if any(p not in meses for p in periodos): abort(404)
+    ambitos = request.args.get("ambito", "nacional,cdmx").split(",")
+    validos = set(AMBITOS_COMPARAR) | {k for k, _ in opciones_explorador(meses)[0]}
+    if any(a not in validos for a in ambitos): abort(400)
+    nombre = f"imss_{conjunto}_{norm_txt(periodo)}.{formato}"
+    return Response(en_flujo(formato, bloques_exportar(meses, conjunto, periodos, ambitos), hoja=conjunto),
+                    content_type=FORMATOS[formato], headers={"Content-Disposition": f'attachment; filename="{nombre}"'})
+
+TOKEN_ADMIN = os.environ.get("IMSS_ADMIN_TOKEN", "")
+if TOKEN_ADMIN:
+    @app.server.route("/_admin/recargar", methods=["POST"])
+    def admin_recargar():
+        if not hmac.compare_digest(request.headers.get("X-Admin-Token", ""), TOKEN_ADMIN): abort(403)
+        recargar_datos()
+        return jsonify({"recargado": list(MESES)}), 202
+
+# Con gunicorn --preload el maestro precalienta antes de crear los workers y
+# éstos heredan la caché lista (ver gunicorn.conf.py)
+if os.environ.get("IMSS_PRECALENTAR_DIFERIDO") != "1":
+    iniciar_calentamiento()
+
+# ==========================================
+# 7. ESTADO POR SESIÓN (EXPLORADOR)
+# ==========================================
+# Los callbacks del explorador sólo intercambian {filtros, huella}; los
+# agregados se guardan por sesión en el servidor (ver sesiones.py).
+ALMACEN = almacen_desde_entorno()
+
+def agregados_explorador(filtros):
+    df, df_sbc = MESES.get(filtros["mes"], (pd.DataFrame(), pd.DataFrame()))
+    base = df if filtros["sector"] == "todos" else df_sbc
+    # Mes o sexo desconocidos (la clave viaja por el navegador): sin datos, como un mes vacío
+    if base.empty or filtros["sexo"] not in SEXOS:
+        return {"totales": {"Aseg": 0, "Puestos": 0, "TI": 0, "entidad": "Nacional"}, "edades": VACIO_EXPLORADOR, "entidades": VACIO_EXPLORADOR}
+    suf = SEXOS[filtros["sexo"]][1]
+    if MOTOR_AGREGADOS == "sqlite":
+        # Consultas parametrizadas sobre los índices de cobertura (ver motor_sql.py)
+        edades, entidades = base_sql().explorador(filtros["mes"], filtros["entidad"], filtros["sector"], suf)
+    else:
+        cols = {f"PTPD_Aseg{suf}": "Aseg", f"PTPD_Puestos{suf}": "Puestos"}
+
+        def por_sector(d):
+            return d if filtros["sector"] == "todos" else d[d["Sector"] == filtros["sector"]]
+
+        def sumar(d, por):
+            g = d.groupby(por, as_index=False, observed=True)[list(cols)].sum().rename(columns=cols)
+            g["TI"] = g["Aseg"] - g["Puestos"]
+            return g
+
+        edades = sumar(por_sector(vista_ambito(base, filtros["entidad"])), "Rango_edad_2")
+        entidades = sumar(por_sector(base), ["entidad_norm", "entidad_display"])
+    totales = {c: float(edades[c].sum()) for c in ("Aseg", "Puestos", "TI")}
+    nombre = entidades.loc[entidades["entidad_norm"] == filtros["entidad"], "entidad_display"]
+    totales["entidad"] = nombre.iloc[0] if len(nombre) else "Nacional"
+    return {"totales": totales, "edades": edades, "entidades": entidades}
+
+def agregados_sesion(sesion, clave):
+    """Agregados de la sesión; si este worker no los tiene o son de otros filtros, se recalculan."""
+    guardado = ALMACEN.get(sesion) if sesion else None
+    if guardado is not None and guardado["huella"] == clave["huella"]:
+        return guardado
+    # Sesiones con los mismos filtros a la vez comparten un solo cálculo
+    agregados = {"huella": clave["huella"], **VUELOS.hacer(("explorador", clave["huella"]), agregados_explorador, clave["filtros"])}
+    if sesion: ALMACEN.set(sesion, agregados)
+    return agregados
 
 header = html.Div([
     html.Div([
@@ -703,30 +1266,113 @@ header = html.Div([
 clipboard = dcc.Clipboard(id="clipboard", style={"display": "none"})
 notify = html.Div(id="notify-copy", style={"position":"fixed", "bottom":"20px", "right":"20px", "backgroundColor":"#333", "color":"white", "padding":"10px 20px", "borderRadius":"5px", "display":"none", "zIndex":9999}, children="Dato copiado")
 
-app.layout = html.Div([
-    html.Link(href="https://fonts.googleapis.com/css2?family=Montserrat:wght@300;400;600;700&display=swap", rel="stylesheet"),
+layout_fijo = html.Div([
     header,
     html.Div([
         glosario,
-        dcc.Tabs([
-            dcc.Tab(label="Julio", style=TAB_STYLE, selected_style=TAB_SELECTED_STYLE, children=[layout_mes(df_j, sbc_j, "Julio", app)]),
-            dcc.Tab(label="Agosto", style=TAB_STYLE, selected_style=TAB_SELECTED_STYLE, children=[layout_mes(df_a, sbc_a, "Agosto", app)]),
-            dcc.Tab(label="Septiembre", style=TAB_STYLE, selected_style=TAB_SELECTED_STYLE, children=[layout_mes(df_s, sbc_s, "Septiembre", app)]),
-            dcc.Tab(label="Octubre", style=TAB_STYLE, selected_style=TAB_SELECTED_STYLE, children=[layout_mes(df_o, sbc_o, "Octubre", app)]),
-            dcc.Tab(label="Evolución", style=TAB_STYLE, selected_style=TAB_SELECTED_STYLE, children=[layout_evolucion(df_j, df_a, df_s, df_o, sbc_j, sbc_a, sbc_s, sbc_o)]),
+        # El contenido de cada pestaña se sirve desde la caché (ver render_tab)
+        dcc.Tabs(id="tabs", value=ARCHIVOS_MES[0][0], children=[
+            *[dcc.Tab(label=mes, value=mes, style=TAB_STYLE, selected_style=TAB_SELECTED_STYLE) for mes, _, _ in ARCHIVOS_MES],
+            dcc.Tab(label="Evolución", value=TAB_EVOLUCION, style=TAB_STYLE, selected_style=TAB_SELECTED_STYLE),
+            dcc.Tab(label="Comparar", value=TAB_COMPARAR, style=TAB_STYLE, selected_style=TAB_SELECTED_STYLE),
+            dcc.Tab(label="Explorador", value=TAB_EXPLORADOR, style=TAB_STYLE, selected_style=TAB_SELECTED_STYLE),
         ], style={"marginTop":"20px"}),
+        html.Div(id="tab-contenido"),
         clipboard,
         notify
     ], style={"maxWidth":"1400px", "margin":"0 auto", "padding":"20px"})
 ], style={"backgroundColor":CREMA_FONDO, "minHeight":"100vh", "fontFamily":FONT_FAMILY})
 
+def servir_layout():
+    # Cada carga de página recibe su propio id de sesión; el resto es fijo
+    return html.Div([dcc.Store(id="sesion", data=nueva_sesion()), layout_fijo])
+
+app.layout = servir_layout
+
+@app.callback(Output("tab-contenido", "children"), Input("tabs", "value"))
+def render_tab(tab):
+    return tab_cacheada(tab)
+
+# --- Pestañas mensuales: cada sección se pide sola en cuanto se monta su marcador ---
+@app.callback(Output({'type': 'seccion-mes', 'mes': MATCH, 'seccion': MATCH}, 'children'),
+              Input({'type': 'seccion-mes', 'mes': MATCH, 'seccion': MATCH}, 'id'))
+def cargar_seccion(id_seccion):
+    mes, seccion = id_seccion["mes"], id_seccion["seccion"]
+    if mes not in MESES or seccion not in SECCIONES_MES: return dash.no_update
+    return seccion_cacheada((mes, seccion))
+
+@app.callback(
+    Output({'type': 'copy-graph', 'index': MATCH}, 'figure'),
+    Input({'type': 'geo-modo', 'index': MATCH}, 'value'),
+    prevent_initial_call=True
+)
+def cambiar_vista_geo(modo):
+    mes = ctx.triggered_id["index"].removeprefix("geo-")
+    agg = agregado_entidad(MESES[mes][0], mes)
+    if modo in METRICAS_MAPA: return fig_geo_mapa(agg, app, modo)
+    return fig_geo_barras(agg)
+
+# --- Comparar: sólo restas sobre agregados por periodo ya calculados; las gráficas se parchan ---
+@app.callback(
+    Output("cmp-tablas", "children"), Output("cmp-salarios", "children"), Output("cmp-graficas", "style"),
+    Output({'type': 'copy-graph-parche', 'index': "cmp-pir"}, 'figure'),
+    Output({'type': 'copy-graph-parche', 'index': "cmp-dpir"}, 'figure'),
+    Input("cmp-periodos", "value"), Input("cmp-ambito", "value")
+)
+def comparar_periodos(periodos, ambito):
+    c = contenido_comparar(MESES, periodos, ambito)
+    if c is None:
+        return html.Div("Selecciona al menos dos periodos.", style={"color": "#777"}), dash.no_update, {"display": "none"}, dash.no_update, dash.no_update
+    return (c["tablas"], c["salarios"], {"display": "block"},
+            parche_trazas(c["piramide"]), parche_trazas(c["cambio"], title_text=c["titulo_cambio"]))
+
+# --- Explorador: los callbacks intercambian la clave, no los datos ---
+@app.callback(
+    Output("exp-clave", "data"),
+    Input("exp-mes", "value"), Input("exp-entidad", "value"), Input("exp-sector", "value"), Input("exp-sexo", "value"),
+    State("sesion", "data")
+)
+def aplicar_filtros(mes, entidad, sector, sexo, sesion):
+    filtros = {"mes": mes, "entidad": entidad, "sector": sector, "sexo": sexo}
+    clave = {"filtros": filtros, "huella": huella(filtros, INGESTA.get("version"))}
+    agregados_sesion(sesion, clave)
+    return clave
+
+@app.callback(Output("exp-kpis", "children"), Input("exp-clave", "data"), State("sesion", "data"), prevent_initial_call=True)
+def explorador_kpis(clave, sesion):
+    f = clave["filtros"]
+    totales = agregados_sesion(sesion, clave)["totales"]
+    partes = [f["mes"], totales["entidad"], "Todos los sectores" if f["sector"] == "todos" else f["sector"], SEXOS.get(f["sexo"], ("Sin datos",))[0]]
+    return kpis_explorador(totales, " · ".join(partes))
+
+@app.callback(Output("exp-edades", "figure"), Input("exp-clave", "data"), State("sesion", "data"), prevent_initial_call=True)
+def explorador_edades(clave, sesion):
+    return parche_trazas(trazas_explorador_edades(agregados_sesion(sesion, clave)["edades"]))
+
+@app.callback(Output("exp-entidades", "figure"), Input("exp-clave", "data"), State("sesion", "data"), prevent_initial_call=True)
+def explorador_entidades(clave, sesion):
+    entidades = agregados_sesion(sesion, clave)["entidades"]
+    return parche_trazas(trazas_explorador_entidades(entidades, clave["filtros"]["entidad"]))
+
+@app.callback(
+    Output("exp-entidad", "value"),
+    Input("exp-entidades", "clickData"), State("exp-entidad", "value"),
+    prevent_initial_call=True
+)
+def explorador_drill(click, actual):
+    if not click or not click.get("points"): return dash.no_update
+    elegida = click["points"][0].get("customdata")
+    if not elegida: return dash.no_update
+    return "nacional" if elegida == actual else elegida
+
 @app.callback(
     Output("clipboard", "content"),
     Output("notify-copy", "style"),
     Input({'type': 'copy-graph', 'index': ALL}, 'clickData'),
+    Input({'type': 'copy-graph-parche', 'index': ALL}, 'clickData'),
     prevent_initial_call=True
 )
-def copy_to_clipboard(clickData):
+def copy_to_clipboard(clickData, clickData_parche):
     if not ctx.triggered:
         return dash.no_update, {"display": "none"}
 
@@ -778,6 +1424,8 @@ def copy_to_clipboard(clickData):
 
     return dash.no_update, {"display": "none"}
 
+ARRANQUE["modulo_ms"] = round((time.perf_counter() - _T_MODULO) * 1000, 1)
+
 if __name__ == "__main__":
     import os
     port = int(os.environ.get("PORT", 10000))
@@ -11,7 +11,7 @@ import pandas as pd
 import dash
 from dash import html, dcc
 import plotly.express as px
-import unicodedata
+from nucleo import agregado_periodo, mes
 
 # ===== Paleta =====
 GUINDA = "#9d2148"
@@ -19,21 +19,11 @@ DORADO = "#b28e5c"
 VERDE  = "#027a35"
 
 # ===== Datos =====
-df = pd.read_csv("PD_sep.csv", encoding="utf-8-sig")
-df["entidad_display"] = df["entidad_nacimiento"].astype(str)
-
-def norm_txt(s):
-    if not isinstance(s, str): return s
-    s = ''.join(c for c in unicodedata.normalize('NFD', s.lower()) if unicodedata.category(c) != 'Mn')
-    return s.strip()
-
-df["entidad_norm"] = df["entidad_display"].apply(norm_txt)
-
-# Trabajadores independientes
-df["independientes_H"] = (pd.to_numeric(df["PTPD_Aseg_H"], errors="coerce").fillna(0)
-                          - pd.to_numeric(df["PTPD_Puestos_H"], errors="coerce").fillna(0))
-df["independientes_M"] = (pd.to_numeric(df["PTPD_Aseg_M"], errors="coerce").fillna(0)
-                          - pd.to_numeric(df["PTPD_Puestos_M"], errors="coerce").fillna(0))
+# Compartidos (nucleo.py): entidad normalizada e independientes ya vienen calculados
+df, df_sbc = mes("Septiembre")
+# Totales y edades (Nacional y CDMX) agregados una sola vez por el núcleo
+agg_nal = agregado_periodo(df, df_sbc, "Septiembre", "nacional")
+agg_cdmx = agregado_periodo(df, df_sbc, "Septiembre", "cdmx")
 
 # ================================================================
 # 1) Personas beneficiadas por entidad
@@ -86,9 +76,7 @@ fig2.update_layout(
 
 # ================================================================
 # 3) Pirámide nacional
-age_nat = (df.groupby("Rango_edad_2", as_index=False)
-             [["PTPD_Aseg_H","PTPD_Aseg_M"]].sum())
-age_nat = age_nat.sort_values("Rango_edad_2")
+age_nat = agg_nal["edades"][["PTPD_Aseg_H","PTPD_Aseg_M"]].reset_index()
 men_nat_abs = age_nat["PTPD_Aseg_H"].abs()
 age_nat["PTPD_Aseg_H_neg"] = -men_nat_abs
 
@@ -117,13 +105,9 @@ fig3.update_layout(
 
 # ================================================================
 # 4) Pirámide CDMX
-mask_cdmx = df["entidad_norm"].str.contains("ciudad de mexico|cdmx|distrito federal", na=False)
-df_cdmx = df[mask_cdmx].copy()
+age_cdmx = agg_cdmx["edades"][["PTPD_Aseg_H","PTPD_Aseg_M"]].reset_index()
 
-if not df_cdmx.empty:
-    age_cdmx = (df_cdmx.groupby("Rango_edad_2", as_index=False)
-                [["PTPD_Aseg_H","PTPD_Aseg_M"]].sum())
-    age_cdmx = age_cdmx.sort_values("Rango_edad_2")
+if not age_cdmx.empty:
     men_cdmx_abs = age_cdmx["PTPD_Aseg_H"].abs()
     age_cdmx["PTPD_Aseg_H_neg"] = -men_cdmx_abs
 
@@ -162,9 +146,8 @@ totales = pd.DataFrame({
         "Hombres independientes", "Mujeres independientes"
     ],
     "Valor": [
-        df["PTPD_Aseg_H"].sum(), df["PTPD_Aseg_M"].sum(),
-        df["PTPD_Puestos_H"].sum(), df["PTPD_Puestos_M"].sum(),
-        df["independientes_H"].sum(), df["independientes_M"].sum()
+        *agg_nal["totales"][["PTPD_Aseg_H", "PTPD_Aseg_M", "PTPD_Puestos_H", "PTPD_Puestos_M",
+                             "independientes_H", "independientes_M"]]
     ],
     "Color": [VERDE, GUINDA, VERDE, GUINDA, VERDE, GUINDA]
 })
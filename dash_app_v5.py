@@ -16,7 +16,7 @@ import pandas as pd
 import dash
 from dash import html, dcc
 import plotly.express as px
-import unicodedata
+from nucleo import agregado_periodo, mes, totales_por_mes
 
 # ======== Paletas ========
 GUINDA = "#9d2148"
@@ -34,12 +34,6 @@ FONT = dict(family="Montserrat", color="#333")
 BG = "white"
 
 # ======== Utilidades ========
-def norm_txt(s):
-    if not isinstance(s, str): return s
-    s = ''.join(c for c in unicodedata.normalize('NFD', s.lower())
-                if unicodedata.category(c) != 'Mn')
-    return s.strip()
-
 def fmt_num(x):
     try:
         return f"{int(round(float(x), 0)):,}".replace(",", " ")
@@ -49,56 +43,11 @@ def fmt_num(x):
 def pct(a, b):
     return (float(a)/float(b)*100.0) if float(b) != 0 else 0.0
 
-def filtro_cdmx(df: pd.DataFrame) -> pd.DataFrame:
-    if "entidad_nacimiento" not in df.columns:
-        return df.iloc[0:0].copy()
-    ent = df["entidad_nacimiento"].astype(str)
-    ent_norm = ent.apply(norm_txt)
-    mask = ent_norm.str.contains("ciudad de mexico|cdmx|distrito federal", na=False)
-    return df[mask].copy()
-
-# ======== Carga de bases por mes ========
-def cargar_pd(path_csv: str, etiqueta_mes: str) -> pd.DataFrame:
-    df = pd.read_csv(path_csv, encoding="utf-8-sig")
-    df["Mes"] = etiqueta_mes
-    df["entidad_display"] = df["entidad_nacimiento"].astype(str)
-    df["entidad_norm"] = df["entidad_display"].apply(norm_txt)
-    for col in ["PTPD_Aseg_H","PTPD_Aseg_M","PTPD_Puestos_H","PTPD_Puestos_M","PTPD_Aseg","PTPD_Puestos"]:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0)
-    df["independientes_H"] = df["PTPD_Aseg_H"] - df["PTPD_Puestos_H"]
-    df["independientes_M"] = df["PTPD_Aseg_M"] - df["PTPD_Puestos_M"]
-    df["independientes"]   = df["independientes_H"] + df["independientes_M"]
-    return df
-
-def cargar_sbc(path_csv: str, etiqueta_mes: str) -> pd.DataFrame:
-    df = pd.read_csv(path_csv, encoding="utf-8-sig")
-    df["Mes"] = etiqueta_mes
-    # Estandariza nombres clave
-    if "División" in df.columns:  # lo mostramos como "Sector"
-        df["Sector"] = df["División"].astype(str)
-    else:
-        df["Sector"] = df["CVE_DIVISION"].astype(str)
-    # Asegura numéricos
-    for c in ["SalarioFem", "SalarioMasc", "PTPD_Puestos"]:
-        if c in df.columns:
-            df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0)
-    # normaliza entidad para filtrar CDMX
-    if "entidad_nacimiento" in df.columns:
-        df["entidad_norm"] = df["entidad_nacimiento"].astype(str).apply(norm_txt)
-    else:
-        df["entidad_norm"] = ""
-    # Rango_edad_2 para pirámide
-    if "Rango_edad_2" not in df.columns:
-        df["Rango_edad_2"] = ""
-    return df
-
 # ======== Bloques Totales y Género (ya existentes) ========
-def bloque_totales(df: pd.DataFrame, df_cdmx: pd.DataFrame, app: dash.Dash, titulo: str) -> html.Div:
-    ben_n = df["PTPD_Aseg"].sum();  tdp_n = df["PTPD_Puestos"].sum();  ind_n = df["independientes"].sum()
-    ben_c = df_cdmx["PTPD_Aseg"].sum() if not df_cdmx.empty else 0
-    tdp_c = df_cdmx["PTPD_Puestos"].sum() if not df_cdmx.empty else 0
-    ind_c = df_cdmx["independientes"].sum() if not df_cdmx.empty else 0
+def bloque_totales(tot: pd.Series, tot_cdmx: pd.Series, app: dash.Dash, titulo: str) -> html.Div:
+    # Totales ya agregados por el núcleo (nucleo.agregado_periodo)
+    ben_n = tot["PTPD_Aseg"];  tdp_n = tot["PTPD_Puestos"];  ind_n = tot["independientes"]
+    ben_c = tot_cdmx["PTPD_Aseg"];  tdp_c = tot_cdmx["PTPD_Puestos"];  ind_c = tot_cdmx["independientes"]
 
     card_style = {"backgroundColor": BEIGE, "borderRadius": "18px",
                   "padding": "16px 18px", "boxShadow": "0 6px 16px rgba(0,0,0,.08)"}
@@ -124,23 +73,19 @@ def bloque_totales(df: pd.DataFrame, df_cdmx: pd.DataFrame, app: dash.Dash, titu
         ], style=card_style)
     ], style={"marginTop": "8px", "marginBottom": "16px"})
 
-def bloque_genero(df: pd.DataFrame, df_cdmx: pd.DataFrame, app: dash.Dash, titulo: str) -> html.Div:
+def bloque_genero(tot: pd.Series, tot_cdmx: pd.Series, app: dash.Dash, titulo: str) -> html.Div:
     def perc_cat(h, m):
         tot = h + m
         return pct(h, tot), pct(m, tot)
 
-    bh, bm = df["PTPD_Aseg_H"].sum(), df["PTPD_Aseg_M"].sum()
-    th, tm = df["PTPD_Puestos_H"].sum(), df["PTPD_Puestos_M"].sum()
-    ih, im = df["independientes_H"].sum(), df["independientes_M"].sum()
-    bH, bM = perc_cat(bh, bm);  tH, tM = perc_cat(th, tm);  iH, iM = perc_cat(ih, im)
+    bH, bM = perc_cat(tot["PTPD_Aseg_H"], tot["PTPD_Aseg_M"])
+    tH, tM = perc_cat(tot["PTPD_Puestos_H"], tot["PTPD_Puestos_M"])
+    iH, iM = perc_cat(tot["independientes_H"], tot["independientes_M"])
 
-    if not df_cdmx.empty:
-        bhc, bmc = df_cdmx["PTPD_Aseg_H"].sum(), df_cdmx["PTPD_Aseg_M"].sum()
-        thc, tmc = df_cdmx["PTPD_Puestos_H"].sum(), df_cdmx["PTPD_Puestos_M"].sum()
-        ihc, imc = df_cdmx["independientes_H"].sum(), df_cdmx["independientes_M"].sum()
-        bHc, bMc = perc_cat(bhc, bmc);  tHc, tMc = perc_cat(thc, tmc);  iHc, iMc = perc_cat(ihc, imc)
-    else:
-        bHc=bMc=tHc=tMc=iHc=iMc=0.0
+    # CDMX sin registros: totales en cero, 0 %
+    bHc, bMc = perc_cat(tot_cdmx["PTPD_Aseg_H"], tot_cdmx["PTPD_Aseg_M"])
+    tHc, tMc = perc_cat(tot_cdmx["PTPD_Puestos_H"], tot_cdmx["PTPD_Puestos_M"])
+    iHc, iMc = perc_cat(tot_cdmx["independientes_H"], tot_cdmx["independientes_M"])
 
     card_style = {"backgroundColor": BLUE_DARK, "borderRadius": "18px",
                   "padding": "18px 20px", "boxShadow": "0 6px 16px rgba(0,0,0,.08)", "color": WHITE}
@@ -232,7 +177,7 @@ def bloque_sectores(df_sbc: pd.DataFrame, titulo: str) -> html.Div:
     fig_brecha.update_layout(plot_bgcolor=BG, font=FONT, xaxis_title="Porcentaje", yaxis_title="")
 
     # --- Pirámide salarial por edad (promedios) ---
-    pir = (df_sbc.groupby("Rango_edad_2", as_index=False)[["SalarioMasc","SalarioFem"]].mean().fillna(0))
+    pir = (df_sbc.groupby("Rango_edad_2", observed=True)[["SalarioMasc","SalarioFem"]].mean().fillna(0).reset_index())
     pir = pir.sort_values("Rango_edad_2")
     pir["Sal_H_neg"] = -pir["SalarioMasc"].abs()
 
@@ -321,9 +266,10 @@ def layout_mes(df: pd.DataFrame, df_sbc: pd.DataFrame, mes_label: str, app: dash
     fig2.update_layout(plot_bgcolor=BG, font=FONT, xaxis_title="Registros", yaxis_title="",
                        legend_title_text="Indicador", margin=dict(l=80,r=40,t=60,b=30))
 
-    # 3) Pirámide nacional (beneficiadas)
-    age_nat = (df.groupby("Rango_edad_2", as_index=False)[["PTPD_Aseg_H","PTPD_Aseg_M"]]
-               .sum().sort_values("Rango_edad_2"))
+    # 3) Pirámide nacional (beneficiadas): agregados del núcleo, ya en el orden de edades
+    agg_nal = agregado_periodo(df, df_sbc, mes_label, "nacional")
+    agg_cdmx = agregado_periodo(df, df_sbc, mes_label, "cdmx")
+    age_nat = agg_nal["edades"][["PTPD_Aseg_H","PTPD_Aseg_M"]].reset_index()
     men_nat_abs = age_nat["PTPD_Aseg_H"].abs()
     age_nat["PTPD_Aseg_H_neg"] = -men_nat_abs
     fig3 = px.bar(age_nat, x="PTPD_Aseg_H_neg", y="Rango_edad_2", orientation="h",
@@ -339,10 +285,8 @@ def layout_mes(df: pd.DataFrame, df_sbc: pd.DataFrame, mes_label: str, app: dash
     fig3.update_layout(barmode="overlay", plot_bgcolor=BG, font=FONT, xaxis_title="Personas", yaxis_title="Edad")
 
     # 4) Pirámide CDMX
-    df_cdmx = filtro_cdmx(df)
-    if not df_cdmx.empty:
-        age_cdmx = (df_cdmx.groupby("Rango_edad_2", as_index=False)[["PTPD_Aseg_H","PTPD_Aseg_M"]]
-                    .sum().sort_values("Rango_edad_2"))
+    age_cdmx = agg_cdmx["edades"][["PTPD_Aseg_H","PTPD_Aseg_M"]].reset_index()
+    if not age_cdmx.empty:
         men_cdmx_abs = age_cdmx["PTPD_Aseg_H"].abs()
         age_cdmx["PTPD_Aseg_H_neg"] = -men_cdmx_abs
         fig4 = px.bar(age_cdmx, x="PTPD_Aseg_H_neg", y="Rango_edad_2", orientation="h",
@@ -360,8 +304,8 @@ def layout_mes(df: pd.DataFrame, df_sbc: pd.DataFrame, mes_label: str, app: dash
         fig4 = px.bar(title=f"Pirámide poblacional CDMX ({mes_label}) – sin registros"); fig4.update_layout(plot_bgcolor=BG, font=FONT)
 
     # Bloques existentes
-    totales_div = bloque_totales(df, df_cdmx, app, "Totales (números absolutos)")
-    genero_div  = bloque_genero(df, df_cdmx, app, "Estructura de género (% por categoría)")
+    totales_div = bloque_totales(agg_nal["totales"], agg_cdmx["totales"], app, "Totales (números absolutos)")
+    genero_div  = bloque_genero(agg_nal["totales"], agg_cdmx["totales"], app, "Estructura de género (% por categoría)")
 
     # NUEVO: Bloque de Sectores (Nacional y CDMX)
     sectores_div = bloque_sectores_nal_cdmx(df_sbc)
@@ -385,24 +329,12 @@ def layout_mes(df: pd.DataFrame, df_sbc: pd.DataFrame, mes_label: str, app: dash
     ])
 
 # ======== Evolución (sin cambios de fondo) ========
-def layout_evolucion(df_jul: pd.DataFrame, df_ago: pd.DataFrame, df_sep: pd.DataFrame) -> html.Div:
-    df_all = pd.concat([df_jul, df_ago, df_sep], ignore_index=True)
-    orden = ["Julio","Agosto","Septiembre"]
-    df_all["Mes"] = pd.Categorical(df_all["Mes"], categories=orden, ordered=True)
-
-    nat = (df_all.groupby("Mes", as_index=False)[
-        ["PTPD_Aseg","PTPD_Puestos","independientes",
-         "PTPD_Aseg_H","PTPD_Aseg_M","PTPD_Puestos_H","PTPD_Puestos_M",
-         "independientes_H","independientes_M"]
-    ].sum())
+def layout_evolucion(orden) -> html.Div:
+    # Totales por mes del núcleo: cubo (mes) para Nacional, (mes, entidad) para CDMX
+    nat = totales_por_mes(orden)
     nat["tasa_formalizacion"] = (nat["PTPD_Puestos"]/nat["PTPD_Aseg"]*100).round(2)
 
-    cdmx = filtro_cdmx(df_all)
-    cdmx_agg = (cdmx.groupby("Mes", as_index=False)[
-        ["PTPD_Aseg","PTPD_Puestos","independientes",
-         "PTPD_Aseg_H","PTPD_Aseg_M","PTPD_Puestos_H","PTPD_Puestos_M",
-         "independientes_H","independientes_M"]
-    ].sum())
+    cdmx_agg = totales_por_mes(orden, "cdmx")
     cdmx_agg["tasa_formalizacion"] = (cdmx_agg["PTPD_Puestos"]/cdmx_agg["PTPD_Aseg"]*100).round(2)
 
     def line_multi(df, cols, titulo, ytitle):
@@ -464,14 +396,10 @@ def layout_evolucion(df_jul: pd.DataFrame, df_ago: pd.DataFrame, df_sep: pd.Data
 # ======== App ========
 app = dash.Dash(__name__, title="IMSS Plataformas Digitales – v5.2")
 
-# Carga PD (personas) y SBC (salarios/divisiones)
-df_jul = cargar_pd("PD_jul.csv",  "Julio")
-df_ago = cargar_pd("PD_ago.csv",  "Agosto")
-df_sep = cargar_pd("PD_sep.csv",  "Septiembre")
-
-sbc_jul = cargar_sbc("sbc_jul.csv", "Julio")
-sbc_ago = cargar_sbc("sbc_ago.csv", "Agosto")
-sbc_sep = cargar_sbc("sbc_sep.csv", "Septiembre")
+# Datos compartidos (nucleo.py): se leen una sola vez por proceso
+df_jul, sbc_jul = mes("Julio")
+df_ago, sbc_ago = mes("Agosto")
+df_sep, sbc_sep = mes("Septiembre")
 
 app.layout = html.Div(style={
     "fontFamily": "Montserrat",
@@ -484,7 +412,7 @@ app.layout = html.Div(style={
         dcc.Tab(label="Julio",       children=[layout_mes(df_jul, sbc_jul, "Julio", app)]),
         dcc.Tab(label="Agosto",      children=[layout_mes(df_ago, sbc_ago, "Agosto", app)]),
         dcc.Tab(label="Septiembre",  children=[layout_mes(df_sep, sbc_sep, "Septiembre", app)]),
-        dcc.Tab(label="Evolución",   children=[layout_evolucion(df_jul, df_ago, df_sep)])
+        dcc.Tab(label="Evolución",   children=[layout_evolucion(["Julio", "Agosto", "Septiembre"])])
     ])
 ])
 
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Exportación de agregados en streaming (CSV, XLSX, Parquet)
+
+Cada formato recibe un iterable de DataFrames (un bloque por periodo/ámbito,
+tomados de la caché de agregados) y produce bytes a medida que los recibe, así
+que el archivo completo nunca se arma en la memoria del worker:
+
+- CSV      se escribe bloque por bloque (UTF-8 con BOM para Excel).
+- Parquet  los bloques se juntan hasta FILAS_GRUPO filas por row group (un
+           bloque de totales es una sola fila); cada row group se envía en
+           cuanto se escribe y el resto, al cerrar.
+- XLSX     XlsxWriter en modo constant_memory sobre un archivo temporal, que
+           después se envía en trozos (un .xlsx es un zip y no se puede
+           emitir antes de cerrarlo).
+"""
+
+import io
+import tempfile
+from functools import lru_cache
+
+import pandas as pd
+
+FORMATOS = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "parquet": "application/vnd.apache.parquet",
+}
+TROZO = 64 * 1024
+FILAS_GRUPO = 64 * 1024
+
+
+@lru_cache(maxsize=1)
+def formatos_disponibles():
+    disponibles = ["csv"]
+    for formato, modulo in (("xlsx", "xlsxwriter"), ("parquet", "pyarrow.parquet")):
+        try:
+            __import__(modulo)
+            disponibles.append(formato)
+        except ImportError:
+            pass
+    return tuple(disponibles)
+
+
+def csv_en_flujo(bloques):
+    primero = True
+    for df in bloques:
+        texto = df.to_csv(index=False, header=primero, lineterminator="\n")
+        yield (("\ufeff" if primero else "") + texto).encode("utf-8")
+        primero = False
+
+
+class _Drenaje(io.RawIOBase):
+    """Destino de escritura que entrega lo acumulado cada vez que se vacía."""
+
+    def __init__(self):
+        self._partes = []
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        self._pos += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self._pos
+
+    def vaciar(self):
+        datos = b"".join(self._partes)
+        self._partes.clear()
+        return datos
+
+
+def parquet_en_flujo(bloques):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    destino, escritor = _Drenaje(), None
+    pendientes, filas = [], 0
+    try:
+        for df in bloques:
+            if escritor is None:
+                esquema = pa.Schema.from_pandas(df, preserve_index=False)
+                escritor = pq.ParquetWriter(destino, esquema, compression="zstd")
+            pendientes.append(pa.Table.from_pandas(df, schema=esquema, preserve_index=False))
+            filas += len(df)
+            if filas < FILAS_GRUPO: continue
+            escritor.write_table(pa.concat_tables(pendientes))
+            pendientes, filas = [], 0
+            datos = destino.vaciar()
+            if datos: yield datos
+        if pendientes: escritor.write_table(pa.concat_tables(pendientes))
+    finally:
+        if escritor is not None: escritor.close()
+    yield destino.vaciar()
+
+
+def xlsx_en_flujo(bloques, hoja="Datos"):
+    import xlsxwriter
+
+    with tempfile.TemporaryFile() as tmp:
+        libro = xlsxwriter.Workbook(tmp, {"constant_memory": True, "nan_inf_to_errors": True})
+        ws = libro.add_worksheet(hoja[:31])
+        negrita = libro.add_format({"bold": True})
+        fila = 0
+        for df in bloques:
+            if fila == 0:
+                ws.write_row(0, 0, list(df.columns), negrita)
+                fila = 1
+            for valores in df.itertuples(index=False, name=None):
+                ws.write_row(fila, 0, [None if pd.isna(v) else v for v in valores])
+                fila += 1
+        libro.close()
+        tmp.seek(0)
+        while True:
+            datos = tmp.read(TROZO)
+            if not datos: break
+            yield datos
+
+
+def en_flujo(formato, bloques, hoja="Datos"):
+    if formato == "csv": return csv_en_flujo(bloques)
+    if formato == "parquet": return parquet_en_flujo(bloques)
+    if formato == "xlsx": return xlsx_en_flujo(bloques, hoja)
+    raise ValueError(f"Formato no soportado: {formato}")
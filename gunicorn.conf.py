@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+Configuración de gunicorn para el tablero (Procfile: gunicorn -c gunicorn.conf.py dash_app1:server)
+
+El trabajo del tablero es CPU (pandas/plotly) con muy poca E/S, así que un
+worker por núcleo y unos cuantos hilos por worker: los hilos no multiplican el
+CPU, pero una construcción lenta de layout ya no bloquea las peticiones cortas
+(_dash-dependencies, copiado, /readyz) que llegan detrás en el mismo worker.
+
+Variables de entorno:
+
+- IMSS_GUNICORN_PERFIL=hilos     hilos (gthread, por defecto) o sync (un hilo por worker).
+- WEB_CONCURRENCY                número de workers. Por defecto, los núcleos disponibles
+                                 (afinidad y cuota de CPU del cgroup) limitados por la
+                                 memoria (ver RSS_WORKER_MIB) y por MAX_WORKERS_AUTO.
+- IMSS_GUNICORN_HILOS            hilos por worker (perfil hilos: 4).
+- IMSS_GUNICORN_PRELOAD=1        el maestro carga los CSV y precalienta la caché antes de
+                                 crear los workers; éstos (y los que se reciclan por
+                                 max_requests) nacen listos y comparten esas páginas
+                                 (copy-on-write).
+- IMSS_GUNICORN_TIMEOUT=120      segundos antes de reiniciar un worker colgado.
+- IMSS_GUNICORN_MAX_PETICIONES   reciclar cada worker tras N peticiones (2000; 0 = nunca),
+                                 con jitter del 10 % para que no se reinicien a la vez.
+- PORT                           puerto de escucha (Render lo define).
+"""
+
+import os
+
+PERFILES = {
+    "sync": {"worker_class": "sync", "threads": 1},
+    "hilos": {"worker_class": "gthread", "threads": 4},
+}
+
+# RSS de un worker con los datos cargados y la caché caliente: 143-181 MiB con
+# carga_prueba.py (tabla del README) y ~170 MiB en la medición más reciente
+# (--en-proceso). El maestro con preload ocupa otro tanto.
+RSS_WORKER_MIB = 180
+# Tope del valor automático: el trabajo es CPU y un host grande sin cuota en el
+# cgroup no debe traducirse en decenas de copias de los datos
+MAX_WORKERS_AUTO = 4
+
+
+def _leer(path):
+    try:
+        with open(path) as fh:
+            return fh.read().strip()
+    except OSError:
+        return None
+
+
+def _nucleos():
+    try:
+        n = len(os.sched_getaffinity(0))
+    except AttributeError:
+        n = os.cpu_count() or 1
+    # Cuota de CPU del contenedor: cgroup v2 (cpu.max "cuota periodo") o v1
+    cuota = (_leer("/sys/fs/cgroup/cpu.max") or "").split()
+    if len(cuota) == 2 and cuota[0] != "max":
+        n = min(n, -(-int(cuota[0]) // int(cuota[1])))
+    cuota_v1, periodo_v1 = _leer("/sys/fs/cgroup/cpu/cpu.cfs_quota_us"), _leer("/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+    if cuota_v1 and periodo_v1 and int(cuota_v1) > 0:
+        n = min(n, -(-int(cuota_v1) // int(periodo_v1)))
+    return max(1, n)
+
+
+def _memoria_mib():
+    """Límite de memoria del cgroup (v2 o v1) o, si no hay, la memoria total."""
+    limites = []
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        valor = _leer(path)
+        if valor and valor.isdigit() and int(valor) < 1 << 60:   # v1 "sin límite" es ~2^63
+            limites.append(int(valor) // 2**20)
+    for linea in (_leer("/proc/meminfo") or "").splitlines():
+        if linea.startswith("MemTotal:"):
+            limites.append(int(linea.split()[1]) // 1024)
+    return min(limites) if limites else None
+
+
+def _workers_auto():
+    n = min(_nucleos(), MAX_WORKERS_AUTO)
+    memoria = _memoria_mib()
+    if memoria:
+        # El maestro cuenta como un proceso más del mismo tamaño
+        n = min(n, memoria // RSS_WORKER_MIB - 1)
+    return max(1, n)
+
+
+perfil = os.environ.get("IMSS_GUNICORN_PERFIL", "hilos")
+if perfil not in PERFILES:
+    raise RuntimeError(f"IMSS_GUNICORN_PERFIL desconocido: {perfil} (opciones: {', '.join(PERFILES)})")
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '10000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY") or _workers_auto())
+worker_class = PERFILES[perfil]["worker_class"]
+threads = int(os.environ.get("IMSS_GUNICORN_HILOS", PERFILES[perfil]["threads"]))
+preload_app = os.environ.get("IMSS_GUNICORN_PRELOAD", "1") == "1"
+timeout = int(os.environ.get("IMSS_GUNICORN_TIMEOUT", 120))
+graceful_timeout = 30
+keepalive = 5
+max_requests = int(os.environ.get("IMSS_GUNICORN_MAX_PETICIONES", 2000))
+max_requests_jitter = max_requests // 10
+# Latido de los workers en memoria: un disco lento no provoca reinicios por timeout
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+precalentar_en_maestro = preload_app and os.environ.get("IMSS_PRECALENTAR", "1") == "1"
+if precalentar_en_maestro:
+    os.environ["IMSS_PRECALENTAR_DIFERIDO"] = "1"
+
+
+def when_ready(server):
+    server.log.info("Perfil %s: %d workers x %d hilos (%s), preload=%s",
+                    perfil, workers, threads, worker_class, preload_app)
+    if precalentar_en_maestro:
+        # Síncrono y antes del fork: los hilos del pool terminan aquí y no
+        # quedan locks tomados en los hijos
+        import dash_app1
+        dash_app1.calentar()
+        server.log.info("Caché precalentada en el maestro")
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+Ingesta de los archivos mensuales PD / sbc
+
+Lectura, limpieza y columnas derivadas de cada mes. Vive fuera del tablero
+para que la ingesta en procesos (fork) pueda referirse a estas funciones sin
+depender de un módulo a medio importar.
+"""
+
+import hashlib
+import logging
+import multiprocessing
+import os
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pandas as pd
+
+log = logging.getLogger(__name__)
+
+
+def norm_txt(s):
+    if not isinstance(s, str): return s
+    s = ''.join(c for c in unicodedata.normalize('NFD', s.lower()) if unicodedata.category(c) != 'Mn')
+    return s.strip()
+
+
+def norm_columna(serie: pd.Series) -> pd.Series:
+    # Normaliza sólo los valores distintos (34 entidades) y los mapea a la columna
+    return serie.map({v: norm_txt(v) for v in serie.unique()})
+
+
+# --- Rangos de edad ---
+# Orden canónico de Rango_edad_2; "15 y 20 años" y "Entre 15 y 20 años" son el mismo rango
+RANGOS_EDAD = [f"Entre {a} y {a + 5} años" for a in range(15, 75, 5)] + ["75 años y más"]
+
+
+def canon_edad(etiqueta):
+    if not isinstance(etiqueta, str): return etiqueta
+    e = " ".join(etiqueta.split())
+    if e[:1].isdigit() and " y " in e and not e.endswith("más"): e = "Entre " + e
+    return e
+
+
+def norm_edad(serie: pd.Series) -> pd.Categorical:
+    """Categórica ordenada: los códigos siguen RANGOS_EDAD (etiquetas desconocidas al final)."""
+    mapa = {v: canon_edad(v) for v in serie.unique()}
+    extras = sorted(v for v in set(mapa.values()) if isinstance(v, str) and v not in RANGOS_EDAD)
+    return pd.Categorical(serie.map(mapa), categories=RANGOS_EDAD + extras, ordered=True)
+
+
+# --- Motor de lectura CSV ---
+# Esquema explícito de los extractos PD y sbc (columnas ausentes se ignoran)
+ESQUEMA_CSV = {
+    "entidad_nacimiento": "string", "Nivel Agregación": "string", "Rango_edad_2": "string",
+    "División": "string", "CVE_DIVISION": "int32", "fecha": "int32",
+    "PTPD_Aseg": "int64", "PTPD_Aseg_H": "int64", "PTPD_Aseg_M": "int64", "PTPD_Aseg_NB": "int64",
+    "PTPD_Puestos": "int64", "PTPD_Puestos_H": "int64", "PTPD_Puestos_M": "int64", "PTPD_Puestos_NB": "int64",
+    "TOTAL": "int64", "SalarioFem": "float64", "SalarioMasc": "float64",
+}
+
+
+def motor_csv():
+    """IMSS_MOTOR_CSV=c (pandas, por defecto) o pyarrow (lector multihilo de Arrow)."""
+    motor = os.environ.get("IMSS_MOTOR_CSV", "c")
+    if motor == "pyarrow":
+        try:
+            import pyarrow.csv  # noqa: F401
+        except ImportError:
+            return "c"
+    return motor
+
+
+def leer_csv(path_csv: str) -> pd.DataFrame:
+    if motor_csv() != "pyarrow":
+        return pd.read_csv(path_csv, encoding="utf-8-sig")
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    tabla = pacsv.read_csv(
+        path_csv,
+        read_options=pacsv.ReadOptions(use_threads=True, encoding="utf8"),
+        convert_options=pacsv.ConvertOptions(
+            column_types={col: pa.type_for_alias(t) for col, t in ESQUEMA_CSV.items()},
+            strings_can_be_null=False,
+        ),
+    )
+    # Arrow ya omite el BOM UTF-8 al leer; se limpia por si el encabezado trae otro
+    tabla = tabla.rename_columns([c.lstrip("\ufeff") for c in tabla.column_names])
+    return tabla.to_pandas(types_mapper=pd.ArrowDtype)
+
+
+def errores_lectura():
+    """Errores esperables al leer un CSV: ausente o ilegible, vacío, mal formado o (pyarrow) fuera de ESQUEMA_CSV."""
+    errores = (OSError, UnicodeDecodeError, pd.errors.EmptyDataError, pd.errors.ParserError)
+    if motor_csv() == "pyarrow":
+        import pyarrow as pa
+        errores += (pa.ArrowInvalid,)
+    return errores
+
+
+def frame_ilegible(path_csv, error):
+    """Frame vacío que lleva el motivo (attrs["error"]); validacion.validar lo informa como error del archivo."""
+    log.warning("No se pudo leer %s: %s: %s", path_csv, type(error).__name__, error)
+    df = pd.DataFrame()
+    df.attrs["error"] = f"{type(error).__name__}: {error}"
+    return df
+
+
+# --- Conteos por sexo ---
+# NB es un miembro más del sexo: PTPD_Aseg = H + M + NB (igual para Puestos e independientes)
+SEXOS = ("_H", "_M", "_NB")
+COLS_CONTEO = ["PTPD_Aseg", "PTPD_Puestos"] + [f"{c}{s}" for c in ("PTPD_Aseg", "PTPD_Puestos") for s in SEXOS]
+
+
+def derivar_conteos(df: pd.DataFrame) -> pd.DataFrame:
+    """Conteos numéricos (ausentes = 0) e independientes por sexo en una sola resta matricial."""
+    presentes = [c for c in COLS_CONTEO if c in df.columns]
+    df[presentes] = df[presentes].apply(pd.to_numeric, errors="coerce").fillna(0)
+    por_sexo = df.reindex(columns=[f"{c}{s}" for c in ("PTPD_Aseg", "PTPD_Puestos") for s in SEXOS], fill_value=0)
+    enteros = all(pd.api.types.is_integer_dtype(t) for t in por_sexo.dtypes)
+    matriz = por_sexo.to_numpy(dtype="int64" if enteros else "float64")
+    independientes = matriz[:, :len(SEXOS)] - matriz[:, len(SEXOS):]
+    for j, s in enumerate(SEXOS): df[f"independientes{s}"] = independientes[:, j]
+    df["independientes"] = independientes.sum(axis=1)
+    return df
+
+
+# --- Carga de Datos ---
+def cargar_pd(path_csv: str, etiqueta_mes: str) -> pd.DataFrame:
+    try: df = leer_csv(path_csv)
+    except errores_lectura() as e: return frame_ilegible(path_csv, e)
+    df["Mes"] = etiqueta_mes
+    df["entidad_display"] = df["entidad_nacimiento"].astype(str).replace({"México": "Estado de México", "Mexico": "Estado de México"})
+    df["entidad_norm"] = norm_columna(df["entidad_display"])
+    df = df.sort_values("entidad_norm", kind="stable", ignore_index=True)
+    if "Rango_edad_2" in df.columns: df["Rango_edad_2"] = norm_edad(df["Rango_edad_2"])
+    return derivar_conteos(df)
+
+
+def cargar_sbc(path_csv: str, etiqueta_mes: str) -> pd.DataFrame:
+    try: df = leer_csv(path_csv)
+    except errores_lectura() as e: return frame_ilegible(path_csv, e)
+    df["Mes"] = etiqueta_mes
+    if "División" in df.columns: df["Sector"] = df["División"].astype(str)
+    elif "CVE_DIVISION" in df.columns: df["Sector"] = df["CVE_DIVISION"].astype(str)
+    else: df["Sector"] = "Sector"
+    for c in ["SalarioFem", "SalarioMasc"]:
+        if c in df.columns: df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0)
+    derivar_conteos(df)
+    if "entidad_nacimiento" in df.columns:
+        df["entidad_display"] = df["entidad_nacimiento"].astype(str).replace({"México": "Estado de México", "Mexico": "Estado de México"})
+        df["entidad_norm"] = norm_columna(df["entidad_display"])
+        df = df.sort_values("entidad_norm", kind="stable", ignore_index=True)
+    else: df["entidad_norm"] = ""
+    if "Rango_edad_2" not in df.columns: df["Rango_edad_2"] = ""
+    df["Rango_edad_2"] = norm_edad(df["Rango_edad_2"])
+    return df
+
+
+ARCHIVOS_MES = [
+    ("Julio", "PD_jul.csv", "sbc_jul.csv"),
+    ("Agosto", "PD_ago.csv", "sbc_ago.csv"),
+    ("Septiembre", "PD_sep.csv", "sbc_sep.csv"),
+    ("Octubre", "PD_oct.csv", "sbc_oct.csv"),
+]
+
+INGESTA = {}
+CUARENTENA = {}     # filas apartadas por validacion.py (IMSS_VALIDACION=cuarentena): {archivo: DataFrame}
+
+
+def version_datos():
+    """Hash del contenido de los CSV: identifica el conjunto de datos servido."""
+    h = hashlib.sha256()
+    for _, pd_csv, sbc_csv in ARCHIVOS_MES:
+        for path in (pd_csv, sbc_csv):
+            try:
+                with open(path, "rb") as fh: h.update(fh.read())
+            except OSError:
+                h.update(b"-")
+    return h.hexdigest()[:12]
+
+
+def _cargar_medido(cargador, path_csv, etiqueta_mes):
+    import validacion  # validacion importa de este módulo
+    t0 = time.perf_counter()
+    df = cargador(path_csv, etiqueta_mes)
+    t = time.perf_counter() - t0
+    df, informe, cuarentena = validacion.validar(df, os.path.basename(path_csv), etiqueta_mes)
+    return df, t, informe, cuarentena
+
+
+def _bytes_totales():
+    return sum(os.path.getsize(p) for _, a, b in ARCHIVOS_MES for p in (a, b) if os.path.exists(p))
+
+
+def pool_ingesta():
+    """
+    IMSS_INGESTA=auto (por defecto: hilos si los CSV suman más de
+    IMSS_INGESTA_UMBRAL_MB, si no secuencial, porque con archivos pequeños el
+    pool cuesta más de lo que ahorra), hilos (el parser C de pandas suelta el
+    GIL al tokenizar), procesos (sólo con fork, para no reimportar el tablero
+    en cada proceso hijo) o secuencial.
+    """
+    modo = os.environ.get("IMSS_INGESTA", "auto")
+    if modo == "auto":
+        umbral = float(os.environ.get("IMSS_INGESTA_UMBRAL_MB", 16)) * 1024 * 1024
+        modo = "hilos" if _bytes_totales() > umbral else "secuencial"
+    n = int(os.environ.get("IMSS_INGESTA_TRABAJADORES", min(8, 2 * len(ARCHIVOS_MES))))
+    if modo == "procesos" and "fork" in multiprocessing.get_all_start_methods():
+        return modo, ProcessPoolExecutor(max_workers=n, mp_context=multiprocessing.get_context("fork"))
+    if modo == "secuencial": n = 1
+    return ("secuencial" if n == 1 else "hilos"), ThreadPoolExecutor(max_workers=n, thread_name_prefix="ingesta")
+
+
+def cargar_datos():
+    import validacion
+    t0 = time.perf_counter()
+    modo, pool = pool_ingesta()
+    with pool:
+        futuros = {mes: (pool.submit(_cargar_medido, cargar_pd, pd_csv, mes), pool.submit(_cargar_medido, cargar_sbc, sbc_csv, mes))
+                   for mes, pd_csv, sbc_csv in ARCHIVOS_MES}
+        # Se recogen en el orden de ARCHIVOS_MES: el resultado no depende de qué archivo termine antes
+        resultados = {mes: (fp.result(), fs.result()) for mes, (fp, fs) in futuros.items()}
+    datos = {mes: (rp[0], rs[0]) for mes, (rp, rs) in resultados.items()}
+    tiempos, informes = {}, {}
+    CUARENTENA.clear()
+    for (mes, pd_csv, sbc_csv) in ARCHIVOS_MES:
+        for path, (_, t, informe, cuarentena) in zip((pd_csv, sbc_csv), resultados[mes]):
+            tiempos[path] = round(t, 3)
+            if informe is not None: informes[os.path.basename(path)] = informe
+            if cuarentena is not None: CUARENTENA[os.path.basename(path)] = cuarentena
+    modo_validacion = validacion.modo()
+    INGESTA.update(
+        version=version_datos(),
+        modo=modo,
+        motor_csv=motor_csv(),
+        duracion_s=round(time.perf_counter() - t0, 3),
+        archivos_s=tiempos,
+        fecha=time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        periodos=[{
+            "mes": mes,
+            "fecha": int(df["fecha"].iloc[0]) if "fecha" in df.columns and not df.empty else None,
+            "filas_pd": len(df), "filas_sbc": len(df_sbc),
+        } for mes, (df, df_sbc) in datos.items()],
+        validacion=None if modo_validacion == "no" else {
+            "modo": modo_validacion, "archivos": informes,
+            "alineacion": {mes: validacion.alineacion(df, df_sbc) for mes, (df, df_sbc) in datos.items()},
+        },
+    )
+    return datos
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Motor analítico embebido (SQLite en memoria) para los agregados
+
+Las tablas pd y sbc se cargan una vez desde los frames de la ingesta, con
+índices de cobertura que incluyen todas las columnas que leen las consultas:
+un filtro por (mes, entidad) o (mes, sector, entidad) se resuelve recorriendo
+sólo el índice, sin tocar la tabla ni materializar subconjuntos en pandas.
+
+Las consultas son parametrizadas; los nombres de columna (sexo) salen de listas
+cerradas, nunca de la entrada del usuario. Los datos viven en la memoria de
+SQLite, fuera de los objetos de Python. Una conexión SQLite no sobrevive a un
+fork: cada proceso construye la suya (ver nucleo.base_sql). Con el artefacto
+precalculado (artefacto.py) la base ya viene construida en un archivo, que cada
+proceso abre en sólo lectura y mapea en memoria en lugar de insertar las filas.
+"""
+
+import os
+import pathlib
+import sqlite3
+import threading
+
+import pandas as pd
+
+COLS_CONTEO = ["PTPD_Aseg", "PTPD_Puestos", "PTPD_Aseg_H", "PTPD_Aseg_M", "PTPD_Aseg_NB",
+               "PTPD_Puestos_H", "PTPD_Puestos_M", "PTPD_Puestos_NB"]
+COLS_SALARIO = ["SalarioFem", "SalarioMasc"]
+SUFIJOS_SEXO = ("", "_H", "_M", "_NB")
+
+ESQUEMA = """
+CREATE TABLE pd (
+    mes TEXT NOT NULL, entidad_norm TEXT, entidad_display TEXT, edad INTEGER,
+    PTPD_Aseg INTEGER, PTPD_Puestos INTEGER, PTPD_Aseg_H INTEGER, PTPD_Aseg_M INTEGER, PTPD_Aseg_NB INTEGER,
+    PTPD_Puestos_H INTEGER, PTPD_Puestos_M INTEGER, PTPD_Puestos_NB INTEGER
+);
+CREATE TABLE sbc (
+    mes TEXT NOT NULL, entidad_norm TEXT, entidad_display TEXT, Sector TEXT, edad INTEGER,
+    PTPD_Aseg INTEGER, PTPD_Puestos INTEGER, PTPD_Aseg_H INTEGER, PTPD_Aseg_M INTEGER, PTPD_Aseg_NB INTEGER,
+    PTPD_Puestos_H INTEGER, PTPD_Puestos_M INTEGER, PTPD_Puestos_NB INTEGER, SalarioFem REAL, SalarioMasc REAL
+);
+"""
+
+# Índices de cobertura: clave de filtro + todas las columnas leídas
+INDICES = """
+CREATE INDEX pd_mes_entidad ON pd (mes, entidad_norm, edad, entidad_display,
+    PTPD_Aseg, PTPD_Puestos, PTPD_Aseg_H, PTPD_Aseg_M, PTPD_Aseg_NB, PTPD_Puestos_H, PTPD_Puestos_M, PTPD_Puestos_NB);
+CREATE INDEX sbc_mes_sector ON sbc (mes, Sector, entidad_norm, edad, entidad_display,
+    PTPD_Aseg, PTPD_Puestos, PTPD_Aseg_H, PTPD_Aseg_M, PTPD_Aseg_NB, PTPD_Puestos_H, PTPD_Puestos_M, PTPD_Puestos_NB);
+CREATE INDEX sbc_mes_entidad ON sbc (mes, entidad_norm, Sector, SalarioMasc, SalarioFem);
+ANALYZE;
+"""
+
+
+def _filas(df, tabla, mes):
+    cols = COLS_CONTEO + (["Sector"] if tabla == "sbc" else []) + (COLS_SALARIO if tabla == "sbc" else [])
+    faltan = [c for c in cols if c not in df.columns]
+    if df.empty or faltan: return [], []
+    edad = df["Rango_edad_2"].cat.codes.where(df["Rango_edad_2"].notna(), None)
+    datos = {"mes": [mes] * len(df), "entidad_norm": df["entidad_norm"].tolist(),
+             "entidad_display": df["entidad_display"].tolist(), "edad": edad.tolist()}
+    datos.update({c: df[c].tolist() for c in cols})
+    orden = ["mes", "entidad_norm", "entidad_display"] + (["Sector"] if tabla == "sbc" else []) + ["edad"] + COLS_CONTEO \
+        + (COLS_SALARIO if tabla == "sbc" else [])
+    return orden, list(zip(*(datos[c] for c in orden)))
+
+
+class BaseAnalitica:
+    """Tablas pd/sbc de todos los meses en un SQLite en memoria, consultadas bajo un lock."""
+
+    def __init__(self, datos, ambitos, ruta=None):
+        self.pid = os.getpid()
+        self.datos = datos
+        self.ambitos = ambitos
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self.edades = next((list(d["Rango_edad_2"].cat.categories)
+                            for par in datos.values() for d in par if "Rango_edad_2" in d.columns), None)
+        if ruta is not None:
+            # Base ya construida (artefacto): sólo lectura, inmutable y mapeada en memoria
+            uri = pathlib.Path(ruta).absolute().as_uri() + "?mode=ro&immutable=1"
+            self._con = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            self._con.execute(f"PRAGMA mmap_size = {os.path.getsize(ruta)}")
+        else:
+            self._con = sqlite3.connect(":memory:", check_same_thread=False)
+            self._con.executescript(ESQUEMA)
+            for mes, (df, df_sbc) in datos.items():
+                for tabla, d in (("pd", df), ("sbc", df_sbc)):
+                    cols, filas = _filas(d, tabla, mes)
+                    if filas:
+                        self._con.executemany(f"INSERT INTO {tabla} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})", filas)
+            self._con.executescript(INDICES)
+            self._con.commit()
+        self._entidades = {t: [r[0] for r in self._con.execute(f"SELECT DISTINCT entidad_norm FROM {t}")] for t in ("pd", "sbc")}
+
+    def consulta(self, sql, parametros=()):
+        with self._lock:
+            cur = self._con.execute(sql, parametros)
+            cols = [c[0] for c in cur.description]
+            return pd.DataFrame(cur.fetchall(), columns=cols)
+
+    def guardar(self, ruta):
+        """Copia tablas, índices y estadísticas a un archivo SQLite (preparar_artefacto.py)."""
+        destino = sqlite3.connect(ruta)
+        try:
+            with self._lock: self._con.backup(destino)
+        finally:
+            destino.close()
+
+    def plan(self, sql, parametros=()):
+        with self._lock:
+            return [r[-1] for r in self._con.execute("EXPLAIN QUERY PLAN " + sql, parametros)]
+
+    # --- Filtros ---
+    def filtro_ambito(self, tabla, ambito):
+        """(sql, parámetros) del filtro de ámbito; mismas reglas que nucleo.vista_ambito."""
+        if ambito == "nacional": return "", []
+        valores = pd.Series(self._entidades[tabla], dtype=object)
+        if ambito in self.ambitos:
+            claves = valores[valores.str.contains(self.ambitos[ambito], na=False)].tolist()
+        else:
+            claves = [ambito] if ambito in set(valores) else []
+        return f" AND entidad_norm IN ({', '.join('?' * len(claves))})", claves
+
+    def etiquetas_edad(self, codigos):
+        return pd.CategoricalIndex([self.edades[int(c)] for c in codigos], categories=self.edades, ordered=True, name="Rango_edad_2")
+
+    # --- Agregados ---
+    def por_entidad(self, mes):
+        """Totales por entidad de un mes (columnas de nucleo.agregado_entidad)."""
+        agg = self.consulta(
+            "SELECT entidad_norm, entidad_display, SUM(PTPD_Aseg) AS PTPD_Aseg, SUM(PTPD_Puestos) AS PTPD_Puestos"
+            " FROM pd WHERE mes = ? GROUP BY entidad_norm, entidad_display ORDER BY entidad_norm, entidad_display", (mes,))
+        agg["TI"] = agg["PTPD_Aseg"] - agg["PTPD_Puestos"]
+        return agg
+
+    def periodo(self, mes, ambito, cols_totales):
+        """Totales, afiliaciones por edad y sexo y salarios por sector (estructura de nucleo.agregado_periodo)."""
+        filtro, params = self.filtro_ambito("pd", ambito)
+        suma = ", ".join(f"TOTAL({c}) AS {c}" for c in COLS_CONTEO)
+        tot = self.consulta(f"SELECT {suma} FROM pd WHERE mes = ?{filtro}", [mes, *params]).iloc[0]
+        for suf in SUFIJOS_SEXO[1:]:
+            tot[f"independientes{suf}"] = tot[f"PTPD_Aseg{suf}"] - tot[f"PTPD_Puestos{suf}"]
+        # Como en ingesta.derivar_conteos: independientes = H + M + NB
+        tot["independientes"] = sum(tot[f"independientes{suf}"] for suf in SUFIJOS_SEXO[1:])
+        edades = self.consulta(
+            f"SELECT edad, {', '.join(f'TOTAL(PTPD_Aseg{suf}) AS PTPD_Aseg{suf}' for suf in SUFIJOS_SEXO[1:])} FROM pd"
+            f" WHERE mes = ? AND edad IS NOT NULL{filtro} GROUP BY edad ORDER BY edad", [mes, *params])
+        edades.index = self.etiquetas_edad(edades.pop("edad"))
+        filtro, params = self.filtro_ambito("sbc", ambito)
+        salarios = self.consulta(
+            f"SELECT Sector, AVG(SalarioMasc) AS SalarioMasc, AVG(SalarioFem) AS SalarioFem FROM sbc"
+            f" WHERE mes = ?{filtro} GROUP BY Sector ORDER BY Sector", [mes, *params]).set_index("Sector").astype(float)
+        salarios.index = salarios.index.astype(str)
+        return {"totales": tot.reindex(cols_totales).astype(float), "edades": edades.astype(float), "salarios": salarios}
+
+    def explorador(self, mes, entidad, sector, sufijo):
+        """Afiliaciones/TDP/TI por edad (en la entidad) y por entidad, con filtro de sector y sexo."""
+        if sufijo not in SUFIJOS_SEXO: raise ValueError(f"Sexo no soportado: {sufijo!r}")
+        aseg, puestos = f"PTPD_Aseg{sufijo}", f"PTPD_Puestos{sufijo}"
+        tabla, filtro, params = ("pd", "", []) if sector == "todos" else ("sbc", " AND Sector = ?", [sector])
+        f_ent, p_ent = self.filtro_ambito(tabla, entidad)
+        edades = self.consulta(
+            f"SELECT edad, SUM({aseg}) AS Aseg, SUM({puestos}) AS Puestos FROM {tabla}"
+            f" WHERE mes = ?{filtro}{f_ent} AND edad IS NOT NULL GROUP BY edad ORDER BY edad", [mes, *params, *p_ent])
+        edades.insert(0, "Rango_edad_2", pd.Categorical(self.etiquetas_edad(edades.pop("edad"))))
+        entidades = self.consulta(
+            f"SELECT entidad_norm, entidad_display, SUM({aseg}) AS Aseg, SUM({puestos}) AS Puestos FROM {tabla}"
+            f" WHERE mes = ?{filtro} GROUP BY entidad_norm, entidad_display ORDER BY entidad_norm, entidad_display", [mes, *params])
+        for d in (edades, entidades):
+            d["TI"] = d["Aseg"] - d["Puestos"]
+        return edades, entidades
+
+    def estado(self):
+        with self._lock:
+            filas = {t: self._con.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in ("pd", "sbc")}
+            paginas = self._con.execute("PRAGMA page_count").fetchone()[0] * self._con.execute("PRAGMA page_size").fetchone()[0]
+        return {"filas": filas, "bytes": paginas, "archivo": self.ruta}
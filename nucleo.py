@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""
+Núcleo de datos y agregados compartido por todos los tableros
+
+dash_app1 y las versiones anteriores (dash_app_v4, dash_app_v5, dash_app_v6.1,
+oct_dash) toman de aquí los datos en lugar de leer cada una los CSV:
+
+- La ingesta (ingesta.py: esquema explícito, pool, motor CSV configurable)
+  ocurre una sola vez por proceso, la primera vez que alguien pide datos().
+- Las vistas por ámbito se materializan una vez por frame; los frames vienen
+  ordenados por entidad_norm, así que una entidad es un rango contiguo.
+- Los agregados por periodo y ámbito se calculan una vez y se reutilizan
+  (una sola vez aunque varios hilos los pidan a la vez: vuelo_unico.py);
+  IMSS_MOTOR_AGREGADOS=sqlite (por defecto) los resuelve con consultas
+  parametrizadas sobre el motor embebido (motor_sql.py), pandas con groupbys.
+- Los totales por mes, entidad, edad, sexo y sector salen del retículo de
+  cubos materializados (cubos.py): cada consulta lee el cubo más pequeño que
+  la cubre.
+- Con IMSS_ARTEFACTO=<directorio> los datos, los agregados y la base SQL salen
+  del artefacto precalculado (artefacto.py, preparar_artefacto.py) y los CSV
+  no se leen.
+
+Varios tableros importados en el mismo proceso (tableros.py) comparten una sola
+copia de los datos. Frames y vistas son compartidos: nadie debe modificarlos.
+"""
+
+import os
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+import artefacto
+from cubos import Reticulo
+from ingesta import cargar_datos, cargar_pd, cargar_sbc, norm_txt  # noqa: F401 (reexportados)
+from motor_sql import BaseAnalitica
+from vuelo_unico import VueloUnico
+
+MOTOR_AGREGADOS = os.environ.get("IMSS_MOTOR_AGREGADOS", "sqlite")
+if MOTOR_AGREGADOS not in ("sqlite", "pandas"):
+    raise RuntimeError(f"IMSS_MOTOR_AGREGADOS desconocido: {MOTOR_AGREGADOS} (opciones: sqlite, pandas)")
+
+ARTEFACTO = os.environ.get("IMSS_ARTEFACTO", "")
+
+_DATOS = None
+_MANIFIESTO = None
+_PRECALCULADOS = {}
+_LOCK = threading.Lock()
+
+
+def _leer():
+    """(datos, agregados precalculados, manifiesto): del artefacto si IMSS_ARTEFACTO está definido, si no de los CSV."""
+    if ARTEFACTO: return artefacto.cargar(ARTEFACTO)
+    return cargar_datos(), {}, None
+
+
+def _publicar(nuevos, agregados, manifiesto):
+    # Se llama con _LOCK tomado; _DATOS va al final porque datos() lo lee sin lock
+    global _DATOS, _MANIFIESTO, _PRECALCULADOS, _AGG_ENTIDAD, _AGG_PERIODO, _PIRAMIDES
+    _BASE_SQL.clear()
+    _RETICULO.clear()
+    # Cachés nuevas (no clear()): un cálculo en vuelo con los datos anteriores guarda en la caché descartada
+    _AGG_ENTIDAD = dict(agregados.get("entidad", {}))
+    _AGG_PERIODO = {}
+    _PIRAMIDES = {}
+    _PRECALCULADOS = agregados.get("periodo", {})
+    _MANIFIESTO = manifiesto
+    _DATOS = nuevos
+
+
+def datos():
+    """{mes: (df_pd, df_sbc)} en el orden de ARCHIVOS_MES; se leen una sola vez por proceso."""
+    if _DATOS is None:
+        with _LOCK:
+            if _DATOS is None: _publicar(*_leer())
+    return _DATOS
+
+
+def mes(etiqueta):
+    """(df_pd, df_sbc) de un mes ("Julio", "Agosto", ...)."""
+    return datos()[etiqueta]
+
+
+def recargar():
+    """Vuelve a leer los CSV (o la versión publicada del artefacto) y descarta los agregados; las vistas caen con sus frames."""
+    nuevos = _leer()
+    with _LOCK:
+        _publicar(*nuevos)
+    return nuevos[0]
+
+
+# --- Vistas por ámbito (Nacional, CDMX, entidad) ---
+AMBITOS = {"cdmx": "ciudad de mexico|cdmx|distrito federal"}
+
+_VISTAS = {}
+
+
+def vista_ambito(df: pd.DataFrame, ambito: str = "cdmx") -> pd.DataFrame:
+    """
+    Subconjunto de `df` para un ámbito ("nacional", "cdmx" o una clave
+    `entidad_norm`), materializado una sola vez por frame y reutilizado por
+    todos los bloques. Los datos vienen ordenados por `entidad_norm`, así que
+    una sola entidad es un rango contiguo (`iloc`, sin copiar filas).
+    La vista es compartida: los bloques no deben modificarla.
+    """
+    if ambito == "nacional": return df
+    clave = (id(df), ambito)
+    vista = _VISTAS.get(clave)
+    if vista is not None: return vista
+    if "entidad_norm" not in df.columns:
+        vista = df.iloc[0:0]
+    else:
+        ent = df["entidad_norm"]
+        valores = pd.Series(ent.unique(), dtype=object)
+        if ambito in AMBITOS:
+            claves = valores[valores.str.contains(AMBITOS[ambito], na=False)].tolist()
+        else:
+            claves = [ambito] if ambito in set(valores) else []
+        if len(claves) == 1 and ent.is_monotonic_increasing:
+            ini, fin = ent.searchsorted(claves[0], side="left"), ent.searchsorted(claves[0], side="right")
+            vista = df.iloc[ini:fin]
+        else:
+            vista = df[ent.isin(claves)]
+    _VISTAS[clave] = vista
+    weakref.finalize(df, _VISTAS.pop, clave, None)
+    return vista
+
+
+def filtro_cdmx(df: pd.DataFrame) -> pd.DataFrame:
+    return vista_ambito(df, "cdmx")
+
+
+# --- Motor SQL embebido ---
+_BASE_SQL = {}
+
+
+def base_sql():
+    """Motor SQL de los datos actuales; uno por proceso (los workers no heredan la conexión del maestro)."""
+    actuales = datos()
+    base = _BASE_SQL.get(os.getpid())
+    if base is None or base.datos is not actuales:
+        with _LOCK:
+            base = _BASE_SQL.get(os.getpid())
+            if base is None or base.datos is not actuales:
+                ruta = _MANIFIESTO["sqlite"] if _MANIFIESTO else None
+                base = _BASE_SQL[os.getpid()] = BaseAnalitica(actuales, AMBITOS, ruta=ruta)
+    return base
+
+
+# --- Agregados memorizados ---
+# Total y cada sexo (H, M, NB): el total es la suma de los tres
+COLS_TOTALES = ["PTPD_Aseg", "PTPD_Puestos", "independientes",
+                "PTPD_Aseg_H", "PTPD_Aseg_M", "PTPD_Aseg_NB", "PTPD_Puestos_H", "PTPD_Puestos_M", "PTPD_Puestos_NB",
+                "independientes_H", "independientes_M", "independientes_NB"]
+COLS_EDADES = ["PTPD_Aseg_H", "PTPD_Aseg_M", "PTPD_Aseg_NB"]
+
+_RETICULO = {}
+
+
+def reticulo():
+    """Cubos materializados de los datos actuales; se construyen una vez (pandas puro: sobreviven al fork)."""
+    actuales = datos()
+    ret = _RETICULO.get("actual")
+    if ret is None or ret.datos is not actuales:
+        with _LOCK:
+            ret = _RETICULO.get("actual")
+            if ret is None or ret.datos is not actuales:
+                ret = _RETICULO["actual"] = Reticulo(actuales, AMBITOS, COLS_TOTALES)
+    return ret
+
+_AGG_ENTIDAD = {}
+_AGG_PERIODO = {}
+_PIRAMIDES = {}
+# Con la caché fría, los hilos que piden el mismo agregado esperan un solo cálculo
+VUELOS = VueloUnico()
+
+
+def calcular_entidad(df):
+    """Totales por entidad con pandas (lo usan el motor pandas y preparar_artefacto.py)."""
+    agg = df.groupby(["entidad_norm", "entidad_display"], as_index=False)[["PTPD_Aseg", "PTPD_Puestos"]].sum()
+    agg["TI"] = agg["PTPD_Aseg"] - agg["PTPD_Puestos"]
+    return agg
+
+
+def calcular_periodo(df, df_sbc, ambito):
+    """Totales, edades y salarios de un ámbito con pandas (lo usan el motor pandas y preparar_artefacto.py)."""
+    d, s = vista_ambito(df, ambito), vista_ambito(df_sbc, ambito)
+    totales = d.reindex(columns=COLS_TOTALES).sum().astype(float)
+    edades = d.groupby("Rango_edad_2", observed=True)[COLS_EDADES].sum().astype(float)
+    if s.empty: salarios = pd.DataFrame(columns=["SalarioMasc", "SalarioFem"], dtype=float)
+    else: salarios = s.groupby("Sector")[["SalarioMasc", "SalarioFem"]].mean().astype(float)
+    salarios.index = salarios.index.astype(str)
+    return {"totales": totales, "edades": edades, "salarios": salarios}
+
+
+def _nuevo_agregado_entidad(df, mes):
+    return base_sql().por_entidad(mes) if MOTOR_AGREGADOS == "sqlite" else calcular_entidad(df)
+
+
+def agregado_entidad(df, mes):
+    """Totales por entidad (clave normalizada) de un mes; se calcula una sola vez."""
+    return VUELOS.memorizar(_AGG_ENTIDAD, mes, _nuevo_agregado_entidad, df, mes)
+
+
+def _nuevo_agregado_periodo(df, df_sbc, mes, ambito):
+    if (mes, ambito) in _PRECALCULADOS: return _PRECALCULADOS[(mes, ambito)]
+    if MOTOR_AGREGADOS == "sqlite": return base_sql().periodo(mes, ambito, COLS_TOTALES)
+    return calcular_periodo(df, df_sbc, ambito)
+
+
+def agregado_periodo(df, df_sbc, mes, ambito):
+    """Totales, afiliaciones por edad y sexo y salarios por sector de un periodo y ámbito; se calculan una sola vez."""
+    return VUELOS.memorizar(_AGG_PERIODO, (mes, ambito), _nuevo_agregado_periodo, df, df_sbc, mes, ambito)
+
+
+def totales_por_mes(meses, ambito="nacional"):
+    """Totales de `meses` (en ese orden, Mes categórico) desde el cubo por mes del retículo."""
+    d = reticulo().consultar(por=("mes",), ambito=ambito)
+    d = d[d["Mes"].isin(meses)].copy()
+    d["Mes"] = d["Mes"].cat.set_categories(meses, ordered=True)
+    return d.sort_values("Mes").reset_index(drop=True)
+
+
+def piramides_entidades(mes):
+    """
+    Pirámides de todas las entidades de un mes en un solo arreglo: pct[e, r, s]
+    es el % de las afiliaciones de la entidad e (total H + M + NB) en el rango de
+    edad r y el sexo s (COLS_EDADES). Sale de una sola consulta al cubo (mes,
+    entidad, edad), no de un groupby por entidad; se calcula una sola vez.
+    """
+    return VUELOS.memorizar(_PIRAMIDES, mes, _nuevas_piramides, mes)
+
+
+def _nuevas_piramides(mes):
+    d = reticulo().consultar(por=("entidad", "edad"), mes=mes)
+    edades = list(d["Rango_edad_2"].cat.categories)
+    if d.empty:   # mes sin filas (CSV ausente o ilegible, ver validacion.py): cuadrícula vacía
+        pct = np.zeros((0, len(edades), len(COLS_EDADES)))
+        pct.flags.writeable = False
+        return {"claves": [], "entidades": [], "edades": edades, "sexos": COLS_EDADES, "pct": pct}
+    # Las filas vienen ordenadas por entidad: factorize conserva ese orden
+    codigos, entidades = pd.MultiIndex.from_frame(d[["entidad_norm", "entidad_display"]]).factorize()
+    conteos = np.zeros((len(entidades), len(edades), len(COLS_EDADES)))
+    conteos[codigos, d["Rango_edad_2"].cat.codes.to_numpy()] = d[COLS_EDADES].to_numpy(dtype=float)
+    tot = np.bincount(codigos, weights=d["PTPD_Aseg"].to_numpy(dtype=float), minlength=len(entidades))[:, None, None]
+    pct = np.divide(conteos * 100, tot, out=np.zeros_like(conteos), where=tot > 0)
+    pct.flags.writeable = False
+    return {"claves": entidades.get_level_values(0).tolist(), "entidades": entidades.get_level_values(1).tolist(),
+            "edades": edades, "sexos": COLS_EDADES, "pct": pct}
+
+
+def estado():
+    base = _BASE_SQL.get(os.getpid())
+    return {"periodos": list(_DATOS or {}), "vistas": len(_VISTAS), "motor": MOTOR_AGREGADOS,
+            "agregados_entidad": len(_AGG_ENTIDAD), "agregados_periodo": len(_AGG_PERIODO),
+            "piramides": len(_PIRAMIDES),
+            "vuelos": VUELOS.estado(),
+            "sql": base.estado() if base is not None else None,
+            "cubos": _RETICULO["actual"].estado() if _RETICULO else None,
+            "artefacto": _MANIFIESTO["ruta"] if _MANIFIESTO else None}
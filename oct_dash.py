@@ -16,7 +16,7 @@ import pandas as pd
 import dash
 from dash import html, dcc
 import plotly.express as px
-import unicodedata
+from nucleo import agregado_periodo, mes, totales_por_mes
 # ======== Paletas ========
 GUINDA = "#9d2148"
 DORADO = "#b28e5c"
@@ -38,14 +38,6 @@ BG   = "white"
 
 
 # ======== Utilidades ========
-def norm_txt(s):
-    if not isinstance(s, str):
-        return s
-    s = ''.join(c for c in unicodedata.normalize('NFD', s.lower())
-                if unicodedata.category(c) != 'Mn')
-    return s.strip()
-
-
 def fmt_num(x):
     try:
         return f"{int(round(float(x), 0)):,}"
@@ -59,69 +51,17 @@ def pct(a, b):
     return (a / b * 100.0) if b != 0 else 0.0
 
 
-def filtro_cdmx(df: pd.DataFrame) -> pd.DataFrame:
-    if "entidad_nacimiento" not in df.columns:
-        return df.iloc[0:0].copy()
-    ent_norm = df["entidad_nacimiento"].astype(str).apply(norm_txt)
-    mask = ent_norm.str.contains("ciudad de mexico|cdmx|distrito federal", na=False)
-    return df[mask].copy()
-
-
-# ======== Carga de datos ========
-def cargar_pd(path_csv: str, etiqueta_mes: str) -> pd.DataFrame:
-    df = pd.read_csv(path_csv, encoding="utf-8-sig")
-    df["Mes"] = etiqueta_mes
-    df["entidad_display"] = df["entidad_nacimiento"].astype(str)
-    df["entidad_norm"] = df["entidad_display"].apply(norm_txt)
-
-    for col in ["PTPD_Aseg_H", "PTPD_Aseg_M",
-                "PTPD_Puestos_H", "PTPD_Puestos_M",
-                "PTPD_Aseg", "PTPD_Puestos"]:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0)
-
-    df["independientes_H"] = df["PTPD_Aseg_H"] - df["PTPD_Puestos_H"]
-    df["independientes_M"] = df["PTPD_Aseg_M"] - df["PTPD_Puestos_M"]
-    df["independientes"]   = df["independientes_H"] + df["independientes_M"]
-    return df
-
-
-def cargar_sbc(path_csv: str, etiqueta_mes: str) -> pd.DataFrame:
-    df = pd.read_csv(path_csv, encoding="utf-8-sig")
-    df["Mes"] = etiqueta_mes
-
-    if "División" in df.columns:
-        df["Sector"] = df["División"].astype(str)
-    elif "CVE_DIVISION" in df.columns:
-        df["Sector"] = df["CVE_DIVISION"].astype(str)
-    else:
-        df["Sector"] = "Sector"
-
-    for c in ["SalarioFem", "SalarioMasc", "PTPD_Puestos"]:
-        if c in df.columns:
-            df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0)
-
-    if "entidad_nacimiento" in df.columns:
-        df["entidad_norm"] = df["entidad_nacimiento"].astype(str).apply(norm_txt)
-    else:
-        df["entidad_norm"] = ""
-
-    if "Rango_edad_2" not in df.columns:
-        df["Rango_edad_2"] = ""
-
-    return df
-
-
 # ===================== Bloque Totales =====================
-def bloque_totales(df: pd.DataFrame, df_cdmx: pd.DataFrame,
+def bloque_totales(tot: pd.Series, tot_cdmx: pd.Series,
                    app: dash.Dash, titulo: str) -> html.Div:
-    ben_n = df["PTPD_Aseg"].sum()
-    tdp_n = df["PTPD_Puestos"].sum()
-    ind_n = df["independientes"].sum()
+    # Totales ya agregados por el núcleo (nucleo.agregado_periodo)
+    ben_n = tot["PTPD_Aseg"]
+    tdp_n = tot["PTPD_Puestos"]
+    ind_n = tot["independientes"]
 
-    ben_c = df_cdmx["PTPD_Aseg"].sum() if not df_cdmx.empty else 0
-    tdp_c = df_cdmx["PTPD_Puestos"].sum() if not df_cdmx.empty else 0
-    ind_c = df_cdmx["independientes"].sum() if not df_cdmx.empty else 0
+    ben_c = tot_cdmx["PTPD_Aseg"]
+    tdp_c = tot_cdmx["PTPD_Puestos"]
+    ind_c = tot_cdmx["independientes"]
 
     card_style = {
         "backgroundColor": BEIGE,
@@ -168,7 +108,7 @@ def bloque_totales(df: pd.DataFrame, df_cdmx: pd.DataFrame,
 
 
 # ===================== Bloque Estructura de género =====================
-def bloque_genero(df: pd.DataFrame, df_cdmx: pd.DataFrame,
+def bloque_genero(tot: pd.Series, tot_cdmx: pd.Series,
                   app: dash.Dash, titulo: str) -> html.Div:
 
     def perc_cat(h, m):
@@ -176,23 +116,14 @@ def bloque_genero(df: pd.DataFrame, df_cdmx: pd.DataFrame,
         return pct(h, tot), pct(m, tot)
 
     # Nacional
-    bh, bm = df["PTPD_Aseg_H"].sum(), df["PTPD_Aseg_M"].sum()
-    th, tm = df["PTPD_Puestos_H"].sum(), df["PTPD_Puestos_M"].sum()
-    ih, im = df["independientes_H"].sum(), df["independientes_M"].sum()
-    bH, bM = perc_cat(bh, bm)
-    tH, tM = perc_cat(th, tm)
-    iH, iM = perc_cat(ih, im)
-
-    # CDMX
-    if not df_cdmx.empty:
-        bhc, bmc = df_cdmx["PTPD_Aseg_H"].sum(), df_cdmx["PTPD_Aseg_M"].sum()
-        thc, tmc = df_cdmx["PTPD_Puestos_H"].sum(), df_cdmx["PTPD_Puestos_M"].sum()
-        ihc, imc = df_cdmx["independientes_H"].sum(), df_cdmx["independientes_M"].sum()
-        bHc, bMc = perc_cat(bhc, bmc)
-        tHc, tMc = perc_cat(thc, tmc)
-        iHc, iMc = perc_cat(ihc, imc)
-    else:
-        bHc = bMc = tHc = tMc = iHc = iMc = 0.0
+    bH, bM = perc_cat(tot["PTPD_Aseg_H"], tot["PTPD_Aseg_M"])
+    tH, tM = perc_cat(tot["PTPD_Puestos_H"], tot["PTPD_Puestos_M"])
+    iH, iM = perc_cat(tot["independientes_H"], tot["independientes_M"])
+
+    # CDMX (sin registros: totales en cero, 0 %)
+    bHc, bMc = perc_cat(tot_cdmx["PTPD_Aseg_H"], tot_cdmx["PTPD_Aseg_M"])
+    tHc, tMc = perc_cat(tot_cdmx["PTPD_Puestos_H"], tot_cdmx["PTPD_Puestos_M"])
+    iHc, iMc = perc_cat(tot_cdmx["independientes_H"], tot_cdmx["independientes_M"])
 
     card_style = {
         "backgroundColor": BLUE_DARK,
@@ -385,9 +316,9 @@ def bloque_sectores(df_sbc: pd.DataFrame, titulo: str) -> html.Div:
     # ================================================================
     # 3) Pirámide salarial por edad
     # ================================================================
-    pir = (df_sbc.groupby("Rango_edad_2", as_index=False)[
+    pir = (df_sbc.groupby("Rango_edad_2", observed=True)[
         ["SalarioMasc", "SalarioFem"]
-    ].mean().fillna(0))
+    ].mean().fillna(0).reset_index())
     pir = pir.sort_values("Rango_edad_2")
     pir["Sal_H_neg"] = -pir["SalarioMasc"].abs()
 
@@ -612,10 +543,10 @@ def layout_mes(df: pd.DataFrame, df_sbc: pd.DataFrame,
         margin=dict(l=80, r=40, t=60, b=30)
     )
 
-    # 3) Pirámide nacional (beneficiadas)
-    age_nat = (df.groupby("Rango_edad_2", as_index=False)[
-        ["PTPD_Aseg_H", "PTPD_Aseg_M"]
-    ].sum().sort_values("Rango_edad_2"))
+    # 3) Pirámide nacional (beneficiadas): agregados del núcleo, ya en el orden de edades
+    agg_nal = agregado_periodo(df, df_sbc, mes_label, "nacional")
+    agg_cdmx = agregado_periodo(df, df_sbc, mes_label, "cdmx")
+    age_nat = agg_nal["edades"][["PTPD_Aseg_H", "PTPD_Aseg_M"]].reset_index()
     men_nat_abs = age_nat["PTPD_Aseg_H"].abs()
     age_nat["PTPD_Aseg_H_neg"] = -men_nat_abs
 
@@ -653,11 +584,8 @@ def layout_mes(df: pd.DataFrame, df_sbc: pd.DataFrame,
     )
 
     # 4) Pirámide CDMX
-    df_cdmx = filtro_cdmx(df)
-    if not df_cdmx.empty:
-        age_cdmx = (df_cdmx.groupby("Rango_edad_2", as_index=False)[
-            ["PTPD_Aseg_H", "PTPD_Aseg_M"]
-        ].sum().sort_values("Rango_edad_2"))
+    age_cdmx = agg_cdmx["edades"][["PTPD_Aseg_H", "PTPD_Aseg_M"]].reset_index()
+    if not age_cdmx.empty:
         men_cdmx_abs = age_cdmx["PTPD_Aseg_H"].abs()
         age_cdmx["PTPD_Aseg_H_neg"] = -men_cdmx_abs
 
@@ -699,8 +627,8 @@ def layout_mes(df: pd.DataFrame, df_sbc: pd.DataFrame,
         )
         fig4.update_layout(plot_bgcolor=BG, font=FONT)
 
-    totales_div = bloque_totales(df, df_cdmx, app, "Totales (números absolutos)")
-    genero_div  = bloque_genero(df, df_cdmx, app, "Estructura por sexo (% por categoría)")
+    totales_div = bloque_totales(agg_nal["totales"], agg_cdmx["totales"], app, "Totales (números absolutos)")
+    genero_div  = bloque_genero(agg_nal["totales"], agg_cdmx["totales"], app, "Estructura por sexo (% por categoría)")
     sectores_div = bloque_sectores_nal_cdmx(df_sbc)
 
     return html.Div([
@@ -839,28 +767,15 @@ def tabla_html_narrow(df: pd.DataFrame, titulo: str) -> html.Div:
 
 
 # ===================== Evolución =====================
-def layout_evolucion(df_jul, df_ago, df_sep, df_oct,
-                     sbc_jul, sbc_ago, sbc_sep, sbc_oct:
+def layout_evolucion(sbc_jul, sbc_ago, sbc_sep, sbc_oct:
 pd.DataFrame) -> html.Div:
-    df_all = pd.concat([df_jul, df_ago, df_sep, df_oct], ignore_index=True)
     orden = ["Julio", "Agosto", "Septiembre", "Octubre"]
-    df_all["Mes"] = pd.Categorical(df_all["Mes"], categories=orden, ordered=True)
-
-    nat = (df_all.groupby("Mes", as_index=False)[[
-        "PTPD_Aseg", "PTPD_Puestos", "independientes",
-        "PTPD_Aseg_H", "PTPD_Aseg_M",
-        "PTPD_Puestos_H", "PTPD_Puestos_M",
-        "independientes_H", "independientes_M"
-    ]].sum())
+
+    # Totales por mes del núcleo: cubo (mes) para Nacional, (mes, entidad) para CDMX
+    nat = totales_por_mes(orden)
     nat["tasa_formalizacion"] = (nat["PTPD_Puestos"] / nat["PTPD_Aseg"] * 100).round(2)
 
-    cdmx_all = filtro_cdmx(df_all)
-    cdmx_agg = (cdmx_all.groupby("Mes", as_index=False)[[
-        "PTPD_Aseg", "PTPD_Puestos", "independientes",
-        "PTPD_Aseg_H", "PTPD_Aseg_M",
-        "PTPD_Puestos_H", "PTPD_Puestos_M",
-        "independientes_H", "independientes_M"
-    ]].sum())
+    cdmx_agg = totales_por_mes(orden, "cdmx")
     cdmx_agg["tasa_formalizacion"] = (cdmx_agg["PTPD_Puestos"] /
                                       cdmx_agg["PTPD_Aseg"] * 100).round(2)
 
@@ -1038,12 +953,12 @@ pd.DataFrame) -> html.Div:
     # ---- Salarios y brecha promedio (Nacional / CDMX) ----
     def resumen_salario(df_sbc_list, mes_labels):
         rows = []
-        for df_sbc, mes in zip(df_sbc_list, mes_labels):
+        for df_sbc, etiqueta in zip(df_sbc_list, mes_labels):
             prom_m = df_sbc["SalarioMasc"].mean()
             prom_f = df_sbc["SalarioFem"].mean()
             brecha = ((prom_m - prom_f) / prom_m * 100) if prom_m else 0
             rows.append({
-                "Mes": mes,
+                "Mes": etiqueta,
                 "SalarioMasc": prom_m,
                 "SalarioFem": prom_f,
                 "Brecha": brecha
@@ -1140,17 +1055,11 @@ pd.DataFrame) -> html.Div:
 # ===================== Construcción de la app =====================
 app = dash.Dash(__name__, title="IMSS Plataformas Digitales – v6")
 
-# Carga de bases PD
-df_jul = cargar_pd("PD_jul.csv", "Julio")
-df_ago = cargar_pd("PD_ago.csv", "Agosto")
-df_sep = cargar_pd("PD_sep.csv", "Septiembre")
-df_oct = cargar_pd("PD_oct.csv", "Octubre")
-
-# Carga de bases SBC (salarios/división)
-sbc_jul = cargar_sbc("sbc_jul.csv", "Julio")
-sbc_ago = cargar_sbc("sbc_ago.csv", "Agosto")
-sbc_sep = cargar_sbc("sbc_sep.csv", "Septiembre")
-sbc_oct = cargar_sbc("sbc_oct.csv", "Octubre")
+# Datos compartidos (nucleo.py): se leen una sola vez por proceso
+df_jul, sbc_jul = mes("Julio")
+df_ago, sbc_ago = mes("Agosto")
+df_sep, sbc_sep = mes("Septiembre")
+df_oct, sbc_oct = mes("Octubre")
 
 glosario_div = html.Details([
     html.Summary("Glosario de términos", style={
@@ -1265,7 +1174,7 @@ app.layout = html.Div(style={
         dcc.Tab(label="Octubre",
         children=[layout_mes(df_oct, sbc_oct, "Octubre", app)]),
         dcc.Tab(label="Evolución",
-                children=[layout_evolucion(df_jul, df_ago, df_sep, df_oct, sbc_jul, sbc_ago, sbc_sep, sbc_oct)])
+                children=[layout_evolucion(sbc_jul, sbc_ago, sbc_sep, sbc_oct)])
 
     ])
 ])
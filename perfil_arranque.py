@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+Perfil del arranque en frío de un worker (import de dash_app1)
+
+Cada repetición importa el módulo en un proceso nuevo con `python -X importtime`
+y sin precalentar (IMSS_PRECALENTAR=0), y resume dónde se va el tiempo:
+
+- pared: el proceso completo (intérprete, bibliotecas, datos y módulo)
+- por paquete de primer nivel: tiempo propio de sus módulos (-X importtime)
+- fases de dash_app1 (dash_app1.ARRANQUE): carga de datos y resto del módulo
+
+El código de salida es 1 si la mediana del tiempo de pared supera el objetivo
+(OBJETIVO_MS, 1500 ms con 1 vCPU; --objetivo-ms 0 sólo informa), para CI o
+antes de desplegar. dash importa IPython sólo si está
+instalado (dash._jupyter) y no viene en requirements.txt: --bloquear IPython
+simula el entorno de despliegue en una máquina de desarrollo.
+
+    python perfil_arranque.py
+    python perfil_arranque.py --repeticiones 5 --bloquear IPython --json arranque.json
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+# Mediana medida con 1 vCPU, los CSV y sin IPython: ~860-1100 ms
+OBJETIVO_MS = 1500
+LINEA = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|\s*(\S+)")
+CODIGO = """
+import sys
+for m in {bloquear!r}: sys.modules[m] = None
+import json, time
+t = time.perf_counter()
+import {modulo} as m
+print(json.dumps({{"import_ms": (time.perf_counter() - t) * 1000, "fases": getattr(m, "ARRANQUE", None)}}))
+"""
+
+
+def medir(modulo, bloquear):
+    """(pared en ms, ms propios por paquete de primer nivel, salida del hijo) de un import en frío."""
+    entorno = {**os.environ, "IMSS_PRECALENTAR": "0"}
+    codigo = CODIGO.format(modulo=modulo, bloquear=list(bloquear))
+    t0 = time.perf_counter()
+    r = subprocess.run([sys.executable, "-X", "importtime", "-c", codigo], cwd=DIRECTORIO, env=entorno,
+                       capture_output=True, text=True)
+    pared = (time.perf_counter() - t0) * 1000
+    if r.returncode:
+        raise RuntimeError(f"No se pudo importar {modulo}:\n{r.stderr[-2000:]}")
+    paquetes = {}
+    for linea in r.stderr.splitlines():
+        m = LINEA.match(linea)
+        if m:
+            raiz = m.group(3).split(".")[0]
+            paquetes[raiz] = paquetes.get(raiz, 0) + int(m.group(1)) / 1000
+    return pared, paquetes, json.loads(r.stdout.strip().splitlines()[-1])
+
+
+def perfil(modulo, repeticiones, bloquear):
+    medidas = [medir(modulo, bloquear) for _ in range(repeticiones)]
+    paredes = [p for p, _, _ in medidas]
+    nombres = {k for _, paquetes, _ in medidas for k in paquetes}
+    paquetes = {k: round(statistics.median(p.get(k, 0) for _, p, _ in medidas), 1) for k in nombres}
+    fases = [h["fases"] or {} for _, _, h in medidas]
+    return {
+        "modulo": modulo,
+        "repeticiones": repeticiones,
+        "bloqueados": list(bloquear),
+        "pared_ms": {"p50": round(statistics.median(paredes), 1), "min": round(min(paredes), 1), "max": round(max(paredes), 1)},
+        "import_ms": round(statistics.median(h["import_ms"] for _, _, h in medidas), 1),
+        "fases_ms": {k: round(statistics.median(f.get(k, 0) for f in fases), 1) for k in fases[0]},
+        "paquetes_ms": dict(sorted(paquetes.items(), key=lambda kv: -kv[1])),
+    }
+
+
+def imprimir(res, top):
+    pared = res["pared_ms"]
+    print(f"\n{res['modulo']}: pared p50 {pared['p50']} ms (mín {pared['min']} · máx {pared['max']}, "
+          f"{res['repeticiones']} procesos) · import {res['import_ms']} ms")
+    if res["bloqueados"]: print("bloqueados: " + ", ".join(res["bloqueados"]))
+    if res["fases_ms"]: print("fases: " + " · ".join(f"{k.removesuffix('_ms')} {v} ms" for k, v in res["fases_ms"].items()))
+    total = sum(res["paquetes_ms"].values()) or 1
+    print(f"\n{'paquete':<28}{'ms':>9}{'%':>7}")
+    for nombre, ms in list(res["paquetes_ms"].items())[:top]:
+        print(f"{nombre:<28}{ms:>9}{ms / total * 100:>7.1f}")
+    if "objetivo_ms" in res:
+        print(f"\nobjetivo {res['objetivo_ms']} ms: {'OK' if res['cumple'] else 'EXCEDIDO'}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modulo", default="dash_app1", help="Módulo a importar")
+    parser.add_argument("--repeticiones", type=int, default=3, help="Procesos en frío (se informa la mediana)")
+    parser.add_argument("--bloquear", action="append", default=[], metavar="MODULO",
+                        help="Simular que no está instalado (repetible)")
+    parser.add_argument("--objetivo-ms", type=float, default=OBJETIVO_MS,
+                        help="Tiempo de pared máximo (mediana) para el arranque; 0 sólo informa")
+    parser.add_argument("--top", type=int, default=15, help="Paquetes a listar")
+    parser.add_argument("--json", help="Guardar el resultado en este archivo")
+    args = parser.parse_args(argv)
+
+    res = perfil(args.modulo, args.repeticiones, args.bloquear)
+    if args.objetivo_ms:
+        res["objetivo_ms"] = args.objetivo_ms
+        res["cumple"] = res["pared_ms"]["p50"] <= args.objetivo_ms
+    imprimir(res, args.top)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(res, fh, ensure_ascii=False, indent=2)
+    return 0 if res.get("cumple", True) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
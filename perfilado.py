@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+Perfilado de peticiones Dash en producción (cProfile)
+
+Captura un perfil por cada petición a `_dash-layout` y `_dash-update-component`
+y guarda los últimos N en memoria. Se activa sin redesplegar:
+
+- IMSS_PERFILADO_TOKEN=<t>   requerido: sin token no se instala nada. Abrir el
+                             tablero con ?perfilar=<t> marca ese navegador
+                             (cookie) y sólo sus peticiones se perfilan;
+                             ?perfilar=0 lo desactiva.
+- IMSS_PERFILADO=1           perfila todas las peticiones de Dash (sólo cambia
+                             qué se captura; la consulta sigue pidiendo el token).
+- IMSS_PERFILADO_MAX=20      número de perfiles conservados.
+
+Consulta (siempre con ?token=<t> o la cookie):
+
+- /_perfiles                 lista JSON de perfiles capturados
+- /_perfiles/<id>.folded     pilas colapsadas (flamegraph.pl, speedscope, inferno)
+- /_perfiles/<id>.prof       volcado pstats (snakeviz, gprof2dot, flameprof)
+- /_perfiles/<id>.txt        resumen pstats por tiempo acumulado
+"""
+
+import cProfile
+import hmac
+import io
+import itertools
+import logging
+import marshal
+import os
+import pstats
+import threading
+import time
+from collections import deque
+
+from flask import Response, abort, g, jsonify, request
+
+RUTAS_PERFILADAS = ("_dash-layout", "_dash-update-component")
+COOKIE = "imss_perfilar"
+PROFUNDIDAD_MAX = 80
+FRACCION_MIN = 0.0005   # arcos más cortos que esta fracción del perfil no se expanden
+NODOS_MAX = 20000
+
+log = logging.getLogger(__name__)
+
+
+class Perfiles:
+    """Últimos N perfiles capturados (seguro entre hilos)."""
+
+    def __init__(self, maximo=20):
+        self._items = deque(maxlen=maximo)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def agregar(self, ruta, duracion, stats):
+        with self._lock:
+            pid = next(self._ids)
+            self._items.append({
+                "id": pid, "ruta": ruta, "inicio": time.time() - duracion,
+                "duracion_ms": round(duracion * 1000, 1), "stats": stats,
+            })
+        return pid
+
+    def listar(self):
+        with self._lock:
+            return [{k: v for k, v in p.items() if k != "stats"} for p in reversed(self._items)]
+
+    def obtener(self, pid):
+        with self._lock:
+            return next((p for p in self._items if p["id"] == pid), None)
+
+
+def pilas_colapsadas(stats: pstats.Stats) -> str:
+    """
+    Convierte el grafo llamador→llamado de cProfile en pilas colapsadas
+    ("a;b;c <microsegundos>"). cProfile no guarda pilas completas, así que el
+    tiempo de cada función se reparte entre sus llamadores en proporción al
+    tiempo acumulado de cada arco (mismo criterio que flameprof).
+
+    Los caminos del grafo crecen exponencialmente con la profundidad, así que el
+    recorrido está acotado: no se expanden los arcos con menos de FRACCION_MIN
+    del tiempo total ni, pasados NODOS_MAX nodos, ninguno más. Su tiempo queda
+    en el llamador como "[resto]" y las pilas siguen sumando lo mismo.
+    """
+    datos = stats.stats
+    llamados = {}
+    for func, (_, _, _, _, llamadores) in datos.items():
+        for llamador, arco in llamadores.items():
+            llamados.setdefault(llamador, []).append((func, arco[3]))
+    raices = [f for f, v in datos.items() if not v[4]]
+    minimo = sum(datos[r][3] for r in raices) * FRACCION_MIN
+
+    nombres = {}
+
+    def nombre(func):
+        if func not in nombres:
+            archivo, linea, fn = func
+            nombres[func] = f"{fn} ({os.path.basename(archivo)}:{linea})" if linea else fn
+        return nombres[func]
+
+    lineas = {}
+    nodos = 0
+
+    def anotar(pila, tiempo):
+        if tiempo > 0:
+            clave = ";".join(pila)
+            lineas[clave] = lineas.get(clave, 0) + tiempo
+
+    def recorrer(func, tiempo, pila):
+        nonlocal nodos
+        _, _, tt, ct, _ = datos[func]
+        if ct <= 0 or tiempo <= 0: return
+        nodos += 1
+        ratio = min(tiempo / ct, 1.0)
+        pila = pila + (nombre(func),)
+        anotar(pila, tt * ratio)
+        resto = 0.0
+        for hijo, arco_ct in llamados.get(func, []):
+            if nombre(hijo) in pila: continue   # recursión: ya contabilizada arriba
+            t = arco_ct * ratio
+            if t < minimo or nodos >= NODOS_MAX or len(pila) >= PROFUNDIDAD_MAX:
+                resto += t
+            else:
+                recorrer(hijo, t, pila)
+        anotar(pila + ("[resto]",), resto)
+
+    for raiz in raices:
+        recorrer(raiz, datos[raiz][3], ())
+    return "".join(f"{k} {int(v * 1e6)}\n" for k, v in lineas.items() if int(v * 1e6) > 0)
+
+
+def instalar_perfilado(server, perfiles=None):
+    """Registra los hooks y rutas de perfilado en el servidor Flask de Dash."""
+    siempre = os.environ.get("IMSS_PERFILADO", "0") == "1"
+    token = os.environ.get("IMSS_PERFILADO_TOKEN", "")
+    if perfiles is None:
+        perfiles = Perfiles(int(os.environ.get("IMSS_PERFILADO_MAX", 20)))
+    if not token:
+        # Los perfiles exponen rutas y tiempos internos: sin token no hay rutas
+        if siempre: log.warning("IMSS_PERFILADO=1 sin IMSS_PERFILADO_TOKEN: perfilado desactivado")
+        return perfiles
+
+    def token_valido(valor):
+        return bool(valor) and hmac.compare_digest(valor, token)
+
+    def autorizado():
+        return token_valido(request.args.get("token")) or token_valido(request.cookies.get(COOKIE))
+
+    @server.before_request
+    def _iniciar_perfil():
+        if not request.path.endswith(RUTAS_PERFILADAS): return
+        if not (siempre or token_valido(request.cookies.get(COOKIE))): return
+        prof = cProfile.Profile()
+        try:
+            prof.enable()
+        except ValueError:   # otro perfilador activo en este proceso
+            return
+        g._perfil = (prof, time.perf_counter())
+
+    @server.after_request
+    def _cerrar_perfil(resp):
+        if "perfilar" in request.args:
+            if token_valido(request.args["perfilar"]):
+                resp.set_cookie(COOKIE, token, httponly=True, samesite="Strict", secure=request.is_secure)
+            else:
+                resp.delete_cookie(COOKIE)
+        captura = g.pop("_perfil", None)
+        if captura is not None:
+            prof, t0 = captura
+            prof.disable()
+            perfiles.agregar(request.path, time.perf_counter() - t0, pstats.Stats(prof))
+        return resp
+
+    def _perfil_o_404(pid):
+        if not autorizado(): abort(403)
+        p = perfiles.obtener(pid)
+        if p is None: abort(404)
+        return p
+
+    @server.route("/_perfiles")
+    def _listar_perfiles():
+        if not autorizado(): abort(403)
+        return jsonify(perfiles.listar())
+
+    @server.route("/_perfiles/<int:pid>.folded")
+    def _perfil_folded(pid):
+        return Response(pilas_colapsadas(_perfil_o_404(pid)["stats"]), mimetype="text/plain")
+
+    @server.route("/_perfiles/<int:pid>.prof")
+    def _perfil_prof(pid):
+        datos = marshal.dumps(_perfil_o_404(pid)["stats"].stats)
+        return Response(datos, mimetype="application/octet-stream",
+                        headers={"Content-Disposition": f"attachment; filename=perfil-{pid}.prof"})
+
+    @server.route("/_perfiles/<int:pid>.txt")
+    def _perfil_txt(pid):
+        buf = io.StringIO()
+        resumen = pstats.Stats(stream=buf)
+        resumen.add(_perfil_o_404(pid)["stats"])
+        resumen.sort_stats("cumulative").print_stats(40)
+        return Response(buf.getvalue(), mimetype="text/plain")
+
+    return perfiles
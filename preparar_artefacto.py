@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Preparación del artefacto de datos (ETL fuera de línea)
+
+Lee los CSV mensuales con la misma ingesta del tablero (limpieza, entidades
+normalizadas, rangos de edad, independientes), calcula los agregados de todos
+los meses y ámbitos, construye la base de motor_sql y publica una versión
+nueva del artefacto (formato en artefacto.py):
+
+    python preparar_artefacto.py                    # artefacto/<version>-<construcción>-e<esquema>/ y artefacto/ACTUAL
+    python preparar_artefacto.py --salida /ruta --conservar 3
+
+La versión (la que informa /readyz) combina el hash de los CSV
+(ingesta.version_datos) con el del código que los lee, limpia y agrega
+(CODIGO) y los modos de ingesta que cambian las filas: un cambio en la limpieza
+produce otra versión aunque los CSV sean los mismos.
+
+Cada construcción se escribe en un directorio temporal y se publica con un
+nombre nuevo (versión y fecha de construcción); después se reemplaza el
+puntero ACTUAL con un rename atómico. Nunca se borra ni se pisa un directorio
+publicado, así que un tablero que arranca o recarga a la vez ve la versión
+anterior completa o la nueva completa.
+
+El tablero lo usa con IMSS_ARTEFACTO=artefacto; en Render, como parte del
+Build Command:
+
+    pip install -r requirements.txt && python preparar_artefacto.py
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime
+
+import pandas as pd
+
+import artefacto
+from ingesta import INGESTA, cargar_datos, motor_csv
+from motor_sql import BaseAnalitica
+from nucleo import AMBITOS, calcular_entidad, calcular_periodo
+
+DIR = os.path.dirname(os.path.abspath(__file__))
+# Código del que depende el contenido del artefacto: lectura, limpieza y validación, agregados y formato
+CODIGO = ("ingesta.py", "validacion.py", "nucleo.py", "motor_sql.py", "artefacto.py", "preparar_artefacto.py")
+
+
+def version_codigo():
+    """Hash de CODIGO y de los modos de ingesta que cambian las filas (motor CSV, cuarentena)."""
+    import validacion
+    h = hashlib.sha256(f"motor_csv={motor_csv()};validacion={validacion.modo()}".encode())
+    for nombre in CODIGO:
+        with open(os.path.join(DIR, nombre), "rb") as fh: h.update(fh.read())
+    return h.hexdigest()[:12]
+
+
+def version(datos, codigo):
+    return hashlib.sha256(f"{datos}:{codigo}".encode()).hexdigest()[:12]
+
+
+def ambitos(df):
+    return ["nacional", *AMBITOS, *sorted(df["entidad_norm"].dropna().unique())]
+
+
+def agregados(datos):
+    return {
+        "entidad": {mes: calcular_entidad(df) for mes, (df, _) in datos.items()},
+        "periodo": {(mes, amb): calcular_periodo(df, df_sbc, amb) for mes, (df, df_sbc) in datos.items() for amb in ambitos(df)},
+    }
+
+
+def escribir(destino, datos, aggs):
+    periodos = []
+    for mes, (df, df_sbc) in datos.items():
+        p = {"mes": mes, "pd": artefacto.archivo_mes("pd", mes), "sbc": artefacto.archivo_mes("sbc", mes)}
+        artefacto.escribir_tabla(df, os.path.join(destino, p["pd"]))
+        artefacto.escribir_tabla(df_sbc, os.path.join(destino, p["sbc"]))
+        periodos.append(p)
+    for nombre, tabla in artefacto.tablas_agregados(aggs).items():
+        artefacto.escribir_tabla(tabla, os.path.join(destino, f"{nombre}.arrow"))
+    BaseAnalitica(datos, AMBITOS).guardar(os.path.join(destino, artefacto.SQLITE))
+    return periodos
+
+
+def verificar(ruta, datos, aggs):
+    """Relee la versión escrita y la compara, sin tolerancia, con lo calculado desde los CSV."""
+    leidos, leidos_aggs, _ = artefacto.cargar(ruta)
+    assert list(leidos) == list(datos)
+    for mes in datos:
+        for a, b in zip(leidos[mes], datos[mes]):
+            pd.testing.assert_frame_equal(a, b, check_exact=True)
+        pd.testing.assert_frame_equal(leidos_aggs["entidad"][mes], aggs["entidad"][mes], check_exact=True)
+    assert set(leidos_aggs["periodo"]) == set(aggs["periodo"])
+    for clave, a in aggs["periodo"].items():
+        b = leidos_aggs["periodo"][clave]
+        pd.testing.assert_series_equal(b["totales"], a["totales"], check_exact=True)
+        pd.testing.assert_frame_equal(b["edades"], a["edades"], check_exact=True)
+        pd.testing.assert_frame_equal(b["salarios"], a["salarios"], check_exact=True, check_index_type=False)
+
+
+def publicar(raiz, nombre, temporal):
+    final = os.path.join(raiz, nombre)
+    # Nombre nuevo en cada construcción: rename falla antes que pisar una versión publicada
+    os.rename(temporal, final)
+    puntero = os.path.join(raiz, f".{artefacto.ACTUAL}.tmp")
+    with open(puntero, "w", encoding="utf-8") as fh: fh.write(nombre + "\n")
+    os.replace(puntero, os.path.join(raiz, artefacto.ACTUAL))
+    return final
+
+
+def limpiar(raiz, actual, conservar):
+    """Borra las versiones más antiguas; los workers que aún las tengan mapeadas siguen leyéndolas."""
+    versiones = sorted((d for d in os.listdir(raiz) if d != actual and not d.startswith(".")
+                        and os.path.exists(os.path.join(raiz, d, artefacto.MANIFIESTO))),
+                       key=lambda d: os.path.getmtime(os.path.join(raiz, d)), reverse=True)
+    for d in versiones[conservar:]:
+        shutil.rmtree(os.path.join(raiz, d))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Genera el artefacto precalculado del tablero a partir de los CSV mensuales.")
+    ap.add_argument("--salida", default=os.path.join(DIR, "artefacto"), help="directorio raíz del artefacto")
+    ap.add_argument("--conservar", type=int, default=2, help="versiones anteriores que se conservan")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    datos = cargar_datos()
+    vacios = [mes for mes, (df, df_sbc) in datos.items() if df.empty or df_sbc.empty]
+    if vacios: raise SystemExit(f"No se pudieron leer los CSV de: {', '.join(vacios)}")
+    aggs = agregados(datos)
+
+    os.makedirs(args.salida, exist_ok=True)
+    v_datos, v_codigo = INGESTA["version"], version_codigo()
+    v = version(v_datos, v_codigo)
+    nombre = artefacto.nombre_version(v, datetime.now().strftime("%Y%m%dT%H%M%S%f"))
+    temporal = tempfile.mkdtemp(prefix=f".{nombre}-", dir=args.salida)
+    try:
+        periodos = escribir(temporal, datos, aggs)
+        for p, info in zip(periodos, INGESTA["periodos"]): p.update(info)
+        manifiesto = {
+            "version": v, "version_datos": v_datos, "version_codigo": v_codigo, "esquema": artefacto.ESQUEMA,
+            "fecha": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "periodos": periodos,
+            "agregados": {"entidad": len(aggs["entidad"]), "periodo": len(aggs["periodo"])},
+            "validacion": INGESTA.get("validacion"),
+            "archivos": {f: os.path.getsize(os.path.join(temporal, f)) for f in sorted(os.listdir(temporal))},
+        }
+        with open(os.path.join(temporal, artefacto.MANIFIESTO), "w", encoding="utf-8") as fh:
+            json.dump(manifiesto, fh, ensure_ascii=False, indent=2)
+        verificar(temporal, datos, aggs)
+        os.chmod(temporal, 0o755)
+        final = publicar(args.salida, nombre, temporal)
+    except BaseException:
+        shutil.rmtree(temporal, ignore_errors=True)
+        raise
+    limpiar(args.salida, nombre, args.conservar)
+    total = sum(manifiesto["archivos"].values())
+    print(f"{final}: {len(datos)} periodos, {len(aggs['periodo'])} agregados por ámbito, "
+          f"{total / 1024:.0f} KiB, {time.perf_counter() - t0:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+Preparación de fuentes autoalojadas (Montserrat)
+
+Genera, a partir de los TTF oficiales de Montserrat (licencia SIL OFL 1.1),
+archivos WOFF2 reducidos al subconjunto latino (español incluido) con el hash
+del contenido en el nombre, y escribe assets/fuentes.css con los @font-face.
+
+Se ejecuta una sola vez, fuera del servidor web:
+
+    pip install fonttools brotli
+    python preparar_fuentes.py ruta/Montserrat-Light.ttf ruta/Montserrat-Regular.ttf \
+        ruta/Montserrat-SemiBold.ttf ruta/Montserrat-Bold.ttf
+
+El resultado (assets/fonts/*.woff2, assets/fuentes.css) está versionado en el
+repositorio junto con la licencia (assets/fonts/OFL.txt); sólo hace falta volver
+a ejecutarlo para cambiar de versión de la fuente o de pesos. Dash incluye
+assets/fuentes.css automáticamente; no se pide nada a fonts.googleapis.com.
+"""
+
+import argparse
+import hashlib
+import io
+import os
+import sys
+
+DIR_ASSETS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+DIR_FUENTES = os.path.join(DIR_ASSETS, "fonts")
+CSS_SALIDA = os.path.join(DIR_ASSETS, "fuentes.css")
+
+# Mismo rango "latin" que publica Google Fonts (cubre acentos, ñ, ¿, ¡, €)
+RANGO_LATIN = (
+    "U+0000-00FF, U+0131, U+0152-0153, U+02BB-02BC, U+02C6, U+02DA, U+02DC, "
+    "U+0304, U+0308, U+0329, U+2000-206F, U+2074, U+20AC, U+2122, U+2191, "
+    "U+2193, U+2212, U+2215, U+FEFF, U+FFFD"
+)
+
+# Peso CSS según el estilo declarado en el nombre del TTF
+PESOS = {
+    "thin": 100, "extralight": 200, "light": 300, "regular": 400,
+    "medium": 500, "semibold": 600, "bold": 700, "extrabold": 800, "black": 900,
+}
+
+
+def peso_desde_nombre(path: str) -> int:
+    estilo = os.path.splitext(os.path.basename(path))[0].split("-")[-1].lower()
+    if estilo not in PESOS:
+        raise SystemExit(f"No se reconoce el peso de '{path}' (esperado p. ej. Montserrat-Bold.ttf)")
+    return PESOS[estilo]
+
+
+def unicodes_latin():
+    cps = []
+    for parte in RANGO_LATIN.split(","):
+        parte = parte.strip()[2:]
+        if "-" in parte:
+            ini, fin = parte.split("-")
+            cps.extend(range(int(ini, 16), int(fin, 16) + 1))
+        else:
+            cps.append(int(parte, 16))
+    return cps
+
+
+def subconjunto_woff2(path_ttf: str) -> bytes:
+    from fontTools import subset
+
+    opciones = subset.Options()
+    opciones.flavor = "woff2"
+    opciones.layout_features = ["kern", "liga", "calt", "tnum", "lnum"]
+    opciones.name_IDs = ["*"]
+    opciones.notdef_outline = True
+    fuente = subset.load_font(path_ttf, opciones)
+    sub = subset.Subsetter(opciones)
+    sub.populate(unicodes=unicodes_latin())
+    sub.subset(fuente)
+    buf = io.BytesIO()
+    subset.save_font(fuente, buf, opciones)
+    return buf.getvalue()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("ttf", nargs="+", help="Archivos Montserrat-<Peso>.ttf")
+    args = parser.parse_args(argv)
+
+    os.makedirs(DIR_FUENTES, exist_ok=True)
+    reglas = []
+    for path in sorted(args.ttf, key=peso_desde_nombre):
+        peso = peso_desde_nombre(path)
+        datos = subconjunto_woff2(path)
+        # El hash en el nombre permite servir el archivo con caché inmutable
+        nombre = f"montserrat-latin-{peso}.{hashlib.sha256(datos).hexdigest()[:12]}.woff2"
+        for viejo in os.listdir(DIR_FUENTES):
+            if viejo.startswith(f"montserrat-latin-{peso}.") and viejo != nombre:
+                os.remove(os.path.join(DIR_FUENTES, viejo))
+        with open(os.path.join(DIR_FUENTES, nombre), "wb") as fh:
+            fh.write(datos)
+        reglas.append(
+            "@font-face {\n"
+            "  font-family: 'Montserrat';\n"
+            "  font-style: normal;\n"
+            f"  font-weight: {peso};\n"
+            "  font-display: swap;\n"
+            f"  src: url('fonts/{nombre}') format('woff2');\n"
+            f"  unicode-range: {RANGO_LATIN};\n"
+            "}\n"
+        )
+        print(f"{nombre}: {len(datos) / 1024:.1f} KiB")
+
+    with open(CSS_SALIDA, "w", encoding="utf-8") as fh:
+        fh.write("/* Generado por preparar_fuentes.py – Montserrat (SIL OFL 1.1) */\n")
+        fh.write("\n".join(reglas))
+    print(f"Escrito {os.path.relpath(CSS_SALIDA)}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+Preparación de la geometría estatal para el mapa coroplético
+
+Toma un GeoJSON de entidades federativas (p. ej. el Marco Geoestadístico del
+INEGI exportado a GeoJSON en WGS84), lo simplifica (Douglas-Peucker), redondea
+coordenadas y escribe assets/geo/estados_mx.json con el `id` de cada feature
+igual a la clave normalizada de entidad que usa el tablero (`entidad_norm`).
+
+Si alguna de las 32 entidades falta, aparece repetida o no tiene clave conocida
+(ver ALIAS), termina con código 1 sin escribir nada.
+
+Se ejecuta una sola vez; el tablero sólo sirve el archivo ya reducido, que el
+navegador descarga una vez y guarda en caché (URL con hash de contenido).
+
+    python preparar_geometria.py estados.geojson --propiedad NOMGEO
+"""
+
+import argparse
+import json
+import os
+import sys
+import unicodedata
+
+DIR_ASSETS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+GEO_SALIDA = os.path.join(DIR_ASSETS, "geo", "estados_mx.json")
+
+# Nombres alternativos (INEGI, inglés, abreviados) -> clave del tablero
+ALIAS = {
+    "distrito federal": "ciudad de mexico",
+    "federal district": "ciudad de mexico",
+    "cdmx": "ciudad de mexico",
+    "mexico": "estado de mexico",
+    "state of mexico": "estado de mexico",
+    "south lower california": "baja california sur",
+    "lower california": "baja california",
+    "coahuila": "coahuila de zaragoza",
+    "michoacan": "michoacan de ocampo",
+    "veracruz de ignacio de la llave": "veracruz",
+    "veracruz-llave": "veracruz",
+    "baja california norte": "baja california",
+    "queretaro de arteaga": "queretaro",
+}
+
+# Las 32 entidades federativas con la clave de `entidad_norm`; el archivo debe
+# cubrirlas todas (sólo "extranjero/extranjera" queda fuera del mapa)
+ENTIDADES = (
+    "aguascalientes", "baja california", "baja california sur", "campeche", "chiapas",
+    "chihuahua", "ciudad de mexico", "coahuila de zaragoza", "colima", "durango",
+    "estado de mexico", "guanajuato", "guerrero", "hidalgo", "jalisco",
+    "michoacan de ocampo", "morelos", "nayarit", "nuevo leon", "oaxaca", "puebla",
+    "queretaro", "quintana roo", "san luis potosi", "sinaloa", "sonora", "tabasco",
+    "tamaulipas", "tlaxcala", "veracruz", "yucatan", "zacatecas",
+)
+
+
+def norm_txt(s):
+    if not isinstance(s, str): return s
+    s = ''.join(c for c in unicodedata.normalize('NFD', s.lower()) if unicodedata.category(c) != 'Mn')
+    return s.strip()
+
+
+def clave_entidad(nombre):
+    n = norm_txt(nombre)
+    return ALIAS.get(n, n)
+
+
+def _dist_segmento(p, a, b):
+    (x, y), (x1, y1), (x2, y2) = p, a, b
+    dx, dy = x2 - x1, y2 - y1
+    if dx == 0 and dy == 0:
+        return ((x - x1) ** 2 + (y - y1) ** 2) ** 0.5
+    t = max(0.0, min(1.0, ((x - x1) * dx + (y - y1) * dy) / (dx * dx + dy * dy)))
+    return ((x - x1 - t * dx) ** 2 + (y - y1 - t * dy) ** 2) ** 0.5
+
+
+def simplificar(puntos, tol):
+    """Douglas-Peucker iterativo (sin recursión para anillos largos)."""
+    if len(puntos) < 3: return puntos
+    conservar = [False] * len(puntos)
+    conservar[0] = conservar[-1] = True
+    pila = [(0, len(puntos) - 1)]
+    while pila:
+        ini, fin = pila.pop()
+        dmax, idx = 0.0, None
+        for i in range(ini + 1, fin):
+            d = _dist_segmento(puntos[i], puntos[ini], puntos[fin])
+            if d > dmax: dmax, idx = d, i
+        if idx is not None and dmax > tol:
+            conservar[idx] = True
+            pila.append((ini, idx)); pila.append((idx, fin))
+    return [p for p, k in zip(puntos, conservar) if k]
+
+
+def simplificar_anillo(anillo, tol, decimales):
+    pts = simplificar(anillo, tol)
+    pts = [[round(x, decimales), round(y, decimales)] for x, y in pts]
+    # quitar duplicados consecutivos producidos por el redondeo
+    limpio = [p for i, p in enumerate(pts) if i == 0 or p != pts[i - 1]]
+    if limpio[0] != limpio[-1]: limpio.append(limpio[0])
+    return limpio if len(limpio) >= 4 else None
+
+
+def orientar(anillo, horario):
+    """plotly (d3-geo) espera exteriores en sentido horario y huecos al revés;
+    los GeoJSON RFC 7946 vienen al contrario y se pintarían como el resto del globo."""
+    area = sum(x1 * y2 - x2 * y1 for (x1, y1), (x2, y2) in zip(anillo, anillo[1:]))
+    return anillo[::-1] if (area < 0) != horario else anillo
+
+
+def simplificar_geometria(geom, tol, decimales):
+    poligonos = [geom["coordinates"]] if geom["type"] == "Polygon" else geom["coordinates"]
+    salida = []
+    for poligono in poligonos:
+        exterior = simplificar_anillo(poligono[0], tol, decimales)
+        if exterior is None: continue   # islotes que desaparecen a esta escala
+        huecos = [h for h in (simplificar_anillo(r, tol, decimales) for r in poligono[1:]) if h]
+        salida.append([orientar(exterior, True)] + [orientar(h, False) for h in huecos])
+    if not salida: return None
+    if len(salida) == 1: return {"type": "Polygon", "coordinates": salida[0]}
+    return {"type": "MultiPolygon", "coordinates": salida}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("geojson", help="GeoJSON de entidades federativas (WGS84)")
+    parser.add_argument("--propiedad", default="name", help="Propiedad con el nombre de la entidad")
+    parser.add_argument("--tolerancia", type=float, default=0.02, help="Tolerancia de simplificación en grados")
+    parser.add_argument("--decimales", type=int, default=3, help="Decimales a conservar en coordenadas")
+    parser.add_argument("--salida", default=GEO_SALIDA)
+    args = parser.parse_args(argv)
+
+    with open(args.geojson, encoding="utf-8") as fh:
+        fuente = json.load(fh)
+
+    features = []
+    for ft in fuente["features"]:
+        geom = simplificar_geometria(ft["geometry"], args.tolerancia, args.decimales)
+        if geom is None: continue
+        clave = clave_entidad(ft["properties"][args.propiedad])
+        features.append({"type": "Feature", "id": clave, "properties": {}, "geometry": geom})
+    features.sort(key=lambda f: f["id"])
+
+    claves = [f["id"] for f in features]
+    faltan = sorted(set(ENTIDADES) - set(claves))
+    sobran = sorted(set(claves) - set(ENTIDADES))
+    repetidas = sorted({c for c in claves if claves.count(c) > 1})
+    if faltan or sobran or repetidas:
+        # No se escribe un mapa incompleto: se corrige la fuente o se añade un alias
+        print(f"Faltan: {faltan}\nSin clave conocida: {sobran}\nRepetidas: {repetidas}", file=sys.stderr)
+        return 1
+
+    os.makedirs(os.path.dirname(args.salida), exist_ok=True)
+    with open(args.salida, "w", encoding="utf-8") as fh:
+        json.dump({"type": "FeatureCollection", "features": features}, fh, separators=(",", ":"))
+    print(f"{len(features)} entidades, {os.path.getsize(args.salida) / 1024:.1f} KiB -> {os.path.relpath(args.salida)}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Estado por sesión del lado del servidor
+
+Los callbacks de filtros intercambian sólo una clave pequeña (filtros + huella)
+por el navegador; los agregados pesados se quedan en un almacén en memoria del
+proceso, con desalojo LRU y caducidad:
+
+- IMSS_SESIONES_MAX=500      sesiones conservadas por proceso.
+- IMSS_SESIONES_TTL=1800     segundos sin uso antes de descartar una sesión.
+
+El almacén expone get/set/delete como un cliente Redis, de modo que puede
+sustituirse por uno compartido entre workers sin tocar los callbacks. Mientras
+sea local, cada worker de gunicorn tiene el suyo: la clave del navegador lleva
+los filtros para que cualquier worker pueda recalcular lo que no tenga.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+class AlmacenLRU:
+    """Clave→valor en memoria con desalojo LRU y caducidad (seguro entre hilos)."""
+
+    def __init__(self, maximo=500, ttl=1800):
+        self.maximo = maximo
+        self.ttl = ttl
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def get(self, clave):
+        with self._lock:
+            item = self._datos.get(clave)
+            if item is None or item[1] < time.monotonic():
+                if item is not None: del self._datos[clave]
+                self.fallos += 1
+                return None
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+            return item[0]
+
+    def set(self, clave, valor, ttl=None):
+        expira = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._datos[clave] = (valor, expira)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.maximo:
+                self._datos.popitem(last=False)
+
+    def delete(self, clave):
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def clear(self):
+        with self._lock:
+            self._datos.clear()
+
+    def __len__(self):
+        return len(self._datos)
+
+    def estado(self):
+        return {"entradas": len(self), "maximo": self.maximo, "ttl_s": self.ttl,
+                "aciertos": self.aciertos, "fallos": self.fallos}
+
+
+def almacen_desde_entorno():
+    return AlmacenLRU(int(os.environ.get("IMSS_SESIONES_MAX", 500)),
+                      int(os.environ.get("IMSS_SESIONES_TTL", 1800)))
+
+
+def nueva_sesion():
+    return uuid.uuid4().hex
+
+
+def huella(*partes):
+    """Identificador corto y estable de un conjunto de filtros (y versión de datos)."""
+    texto = json.dumps(partes, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(texto.encode("utf-8")).hexdigest()[:16]
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+Todos los tableros en un solo proceso, sobre una sola copia de los datos
+
+dash_app1 se sirve en la raíz y cada versión anterior bajo su prefijo. Todas
+toman los datos de nucleo.py, así que los CSV se leen y se indexan una vez
+aunque convivan cinco tableros:
+
+    gunicorn -c gunicorn.conf.py tableros:server
+    python tableros.py
+"""
+
+import importlib.util
+import os
+import sys
+
+from werkzeug.middleware.dispatcher import DispatcherMiddleware
+
+import dash_app1
+
+DIR = os.path.dirname(os.path.abspath(__file__))
+
+VARIANTES = {
+    "/v4": "dash_app_v4.py",
+    "/v5": "dash_app_v5.py",
+    "/v6": "dash_app_v6.1.py",
+    "/oct": "oct_dash.py",
+}
+
+
+def cargar_variante(prefijo, archivo):
+    """Importa un tablero por ruta (dash_app_v6.1 no es un nombre de módulo válido) con su prefijo de URL."""
+    nombre = os.path.splitext(archivo)[0].replace(".", "_")
+    spec = importlib.util.spec_from_file_location(nombre, os.path.join(DIR, archivo))
+    modulo = importlib.util.module_from_spec(spec)
+    sys.modules[nombre] = modulo
+    # Dash lee el prefijo del entorno al construir la app; las rutas se quedan en "/"
+    # porque DispatcherMiddleware ya recorta el prefijo de PATH_INFO
+    os.environ["DASH_REQUESTS_PATHNAME_PREFIX"] = prefijo + "/"
+    try:
+        spec.loader.exec_module(modulo)
+    finally:
+        del os.environ["DASH_REQUESTS_PATHNAME_PREFIX"]
+    return modulo
+
+
+server = DispatcherMiddleware(dash_app1.server, {
+    prefijo: cargar_variante(prefijo, archivo).app.server for prefijo, archivo in VARIANTES.items()
+})
+
+
+if __name__ == "__main__":
+    from werkzeug.serving import run_simple
+    run_simple("0.0.0.0", int(os.environ.get("PORT", 10000)), server, threaded=True)
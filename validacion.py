@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Validación de calidad de los datos en la ingesta
+
+Cada archivo se valida ya limpio (después de ingesta.cargar_pd / cargar_sbc),
+dentro del mismo trabajo del pool de ingesta. Las reglas de fila son máscaras
+booleanas sobre la matriz de conteos, sin recorrer filas:
+
+- negativos      conteos menores que cero
+- sexo_aseg      PTPD_Aseg distinto de H + M + NB
+- sexo_puestos   PTPD_Puestos distinto de H + M + NB
+- puestos_aseg   Puestos mayor que Aseg, en total o por sexo (independientes negativos)
+- fecha          la fecha (AAAAMM) no corresponde al mes del archivo
+
+Un archivo que no se pudo leer (ausente, vacío, mal formado o fuera de
+ingesta.ESQUEMA_CSV) o que no trae filas se informa como error del archivo.
+
+Con PD y sbc de un mes ya cargados, alineacion() compara sus conteos sumados
+por entidad y rango de edad (sbc desglosa por sector las mismas filas que PD).
+
+- IMSS_VALIDACION=reportar   (por defecto) sólo informa; cuarentena además saca
+                             de los frames las filas que fallan alguna regla
+                             (quedan en ingesta.CUARENTENA); no la desactiva.
+- IMSS_VALIDACION_MS=100     presupuesto por archivo: las reglas que ya no caben
+                             se informan como omitidas, la ingesta no espera.
+
+El informe queda en ingesta.INGESTA["validacion"] y en /readyz (resumen()).
+Desde la línea de comandos, en JSON (código de salida 1 si hay errores):
+
+    python validacion.py
+    python validacion.py --modo cuarentena --cuarentena cuarentena/
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from ingesta import COLS_CONTEO, SEXOS
+
+MODOS = ("reportar", "cuarentena", "no")
+MESES_NUMERO = {m: i for i, m in enumerate(
+    ["Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio", "Julio", "Agosto",
+     "Septiembre", "Octubre", "Noviembre", "Diciembre"], start=1)}
+MUESTRA = 5
+COLS_MUESTRA = ["entidad_display", "Rango_edad_2", "Sector", "fecha"]
+
+
+def modo():
+    m = os.environ.get("IMSS_VALIDACION", "reportar")
+    if m not in MODOS:
+        raise RuntimeError(f"IMSS_VALIDACION desconocido: {m} (opciones: {', '.join(MODOS)})")
+    return m
+
+
+def presupuesto_s():
+    return float(os.environ.get("IMSS_VALIDACION_MS", 100)) / 1000
+
+
+# --- Reglas de fila ---
+def _suma_sexos(c, medida):
+    return c[f"{medida}_H"] + c[f"{medida}_M"] + c[f"{medida}_NB"]
+
+
+def _fecha(df, mes):
+    if "fecha" not in df.columns or mes not in MESES_NUMERO: return None
+    fecha = pd.to_numeric(df["fecha"], errors="coerce").to_numpy(dtype=float)
+    return ~(fecha % 100 == MESES_NUMERO[mes])     # NaN también falla
+
+
+# (nombre, columnas necesarias, máscara de filas que fallan)
+REGLAS = [
+    ("negativos", [], lambda c, df, mes: (c["matriz"] < 0).any(axis=1)),
+    ("sexo_aseg", ["PTPD_Aseg", "PTPD_Aseg_H", "PTPD_Aseg_M"], lambda c, df, mes: c["PTPD_Aseg"] != _suma_sexos(c, "PTPD_Aseg")),
+    ("sexo_puestos", ["PTPD_Puestos", "PTPD_Puestos_H", "PTPD_Puestos_M"], lambda c, df, mes: c["PTPD_Puestos"] != _suma_sexos(c, "PTPD_Puestos")),
+    ("puestos_aseg", ["PTPD_Aseg", "PTPD_Puestos"], lambda c, df, mes: np.logical_or.reduce(
+        [c[f"PTPD_Puestos{s}"] > c[f"PTPD_Aseg{s}"] for s in ("",) + SEXOS])),
+    ("fecha", ["fecha"], lambda c, df, mes: _fecha(df, mes)),
+]
+
+
+def _columnas(df):
+    """Conteos como una sola matriz (ausentes = 0, como en ingesta.derivar_conteos) y sus columnas."""
+    matriz = df.reindex(columns=COLS_CONTEO, fill_value=0).to_numpy(dtype=float)
+    c = {col: matriz[:, j] for j, col in enumerate(COLS_CONTEO)}
+    c["matriz"] = matriz
+    return c
+
+
+def _muestra(df, mascara):
+    cols = [c for c in COLS_MUESTRA + COLS_CONTEO if c in df.columns]
+    return json.loads(df.loc[mascara, cols].head(MUESTRA).to_json(orient="records", force_ascii=False))
+
+
+def validar(df, archivo, mes, modo_validacion=None):
+    """
+    (frame, informe, filas en cuarentena) de un archivo ya limpio. En modo
+    cuarentena el frame devuelto ya no trae las filas que fallan; el orden de
+    las demás se conserva (los frames siguen ordenados por entidad_norm).
+    """
+    modo_validacion = modo_validacion or modo()
+    if modo_validacion == "no": return df, None, None
+    if df.empty:
+        return df, {"archivo": archivo, "mes": mes, "error": df.attrs.get("error", "sin filas"), "filas": 0,
+                    "filas_con_error": 0, "cuarentena": 0, "reglas": {}, "omitidas": [], "duracion_ms": 0.0}, None
+    t0 = time.perf_counter()
+    limite = t0 + presupuesto_s()
+    c = _columnas(df)
+    falla = np.zeros(len(df), dtype=bool)
+    reglas, omitidas = {}, []
+    for nombre, necesarias, regla in REGLAS:
+        if time.perf_counter() > limite:
+            omitidas.append({"regla": nombre, "motivo": "presupuesto"})
+            continue
+        mascara = regla(c, df, mes) if all(col in df.columns for col in necesarias) else None
+        if mascara is None:
+            omitidas.append({"regla": nombre, "motivo": "faltan columnas"})
+            continue
+        falla |= mascara
+        n = int(mascara.sum())
+        reglas[nombre] = {"filas": n, "muestra": _muestra(df, mascara) if n else []}
+    cuarentena = None
+    if modo_validacion == "cuarentena" and falla.any():
+        cuarentena = df[falla].reset_index(drop=True)
+        df = df[~falla].reset_index(drop=True)
+    informe = {
+        "archivo": archivo, "mes": mes, "filas": len(falla), "filas_con_error": int(falla.sum()),
+        "cuarentena": 0 if cuarentena is None else len(cuarentena),
+        "reglas": reglas, "omitidas": omitidas, "duracion_ms": round((time.perf_counter() - t0) * 1000, 2),
+    }
+    return df, informe, cuarentena
+
+
+# --- Regla entre archivos ---
+def alineacion(df, df_sbc):
+    """Claves (entidad, rango de edad) cuyos conteos sumados difieren entre PD y sbc."""
+    if df.empty or df_sbc.empty: return {"omitida": "archivo sin datos"}
+    cols = [c for c in COLS_CONTEO if c in df.columns and c in df_sbc.columns]
+    if not cols or (df_sbc["entidad_norm"] == "").all():
+        return {"omitida": "faltan columnas"}
+
+    # Claves factorizadas sobre los dos frames a la vez (ordenadas, como un groupby con dropna=False)
+    ambos = (df, df_sbc)
+    (ent, entidades), (edad, edades) = [
+        pd.factorize(np.concatenate([d[c].to_numpy(dtype=object) for d in ambos]), sort=True, use_na_sentinel=False)
+        for c in ("entidad_norm", "Rango_edad_2")]
+    claves, grupo = np.unique(ent * len(edades) + edad, return_inverse=True)
+    sumas = np.zeros((2, len(claves), len(cols)))
+    np.add.at(sumas, (np.repeat([0, 1], [len(df), len(df_sbc)]), grupo),
+              np.concatenate([d[cols].to_numpy(dtype=float) for d in ambos]))
+    distintas = (sumas[0] != sumas[1]).any(axis=1)
+    i_ent, i_edad = np.divmod(claves[distintas][:MUESTRA], len(edades))
+    return {"claves": len(claves), "distintas": int(distintas.sum()),
+            "muestra": [[str(entidades[i]), str(edades[j])] for i, j in zip(i_ent, i_edad)]}
+
+
+def resumen(validacion):
+    """Conteos por regla, sin las muestras (para /readyz)."""
+    if not validacion: return None
+    archivos = validacion["archivos"].values()
+    reglas = {}
+    for inf in archivos:
+        for nombre, r in inf["reglas"].items(): reglas[nombre] = reglas.get(nombre, 0) + r["filas"]
+    return {
+        "modo": validacion["modo"],
+        "archivos_con_error": {inf["archivo"]: inf["error"] for inf in archivos if inf.get("error")},
+        "filas_con_error": sum(inf["filas_con_error"] for inf in archivos),
+        "cuarentena": sum(inf["cuarentena"] for inf in archivos),
+        "reglas": reglas,
+        "omitidas": sorted({o["regla"] for inf in archivos for o in inf["omitidas"]}),
+        "alineacion": {mes: a.get("distintas") for mes, a in validacion["alineacion"].items()},
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Valida los CSV mensuales e imprime el informe en JSON.")
+    ap.add_argument("--modo", choices=MODOS[:2], default=None, help="por defecto, IMSS_VALIDACION (con IMSS_VALIDACION=no, reportar)")
+    ap.add_argument("--cuarentena", help="directorio donde escribir las filas apartadas (un CSV por archivo)")
+    args = ap.parse_args()
+    if args.modo: os.environ["IMSS_VALIDACION"] = args.modo
+    elif modo() == "no": os.environ["IMSS_VALIDACION"] = "reportar"  # el CLI siempre valida
+
+    from ingesta import CUARENTENA, INGESTA, cargar_datos
+    cargar_datos()
+    validacion = INGESTA["validacion"]
+    if args.cuarentena and CUARENTENA:
+        os.makedirs(args.cuarentena, exist_ok=True)
+        for archivo, df in CUARENTENA.items(): df.to_csv(os.path.join(args.cuarentena, archivo), index=False)
+    json.dump(validacion, sys.stdout, ensure_ascii=False, indent=2)
+    print()
+    r = resumen(validacion)
+    sys.exit(1 if r["archivos_con_error"] or r["filas_con_error"] or any(r["alineacion"].values()) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+Equivalencia de los motores de agregados contra pandas
+
+Compara cada motor con un groupby de pandas sobre las filas de cada mes
+(ámbito con una máscara booleana, sin vista_ambito), para todos los meses,
+ámbitos (nacional, cdmx, cada entidad y uno inexistente) y cortes por sexo
+(total, H, M, NB):
+
+- pandas:     nucleo.calcular_periodo / calcular_entidad (vistas por ámbito)
+- sqlite:     motor_sql.BaseAnalitica en memoria (periodo, por_entidad, explorador)
+- cubos:      cubos.Reticulo.consultar (el cubo que elige el planificador)
+- artefacto:  filas, agregados y base SQL de una versión de preparar_artefacto.py
+
+El explorador se verifica además con cada sector. Los conteos deben ser
+idénticos; los salarios promedio, con tolerancia relativa de 1e-12 (SQLite y
+pandas suman en otro orden).
+
+    python verificar_motores.py                          # construye un artefacto temporal
+    python verificar_motores.py --artefacto artefacto    # verifica la versión publicada
+
+Código de salida 1 si hay diferencias (se listan las primeras).
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+import artefacto
+from cubos import Reticulo
+from ingesta import INGESTA, cargar_datos
+from motor_sql import BaseAnalitica
+from nucleo import AMBITOS, COLS_EDADES, COLS_TOTALES, calcular_entidad, calcular_periodo
+
+DIR = os.path.dirname(os.path.abspath(__file__))
+SEXOS = ("", "_H", "_M", "_NB")
+SALARIOS = ["SalarioMasc", "SalarioFem"]
+INEXISTENTE = "no-existe"
+ETIQUETAS = {"Mes", "entidad_norm", "entidad_display", "Rango_edad_2", "Sector"}
+
+
+# --- Referencia: groupby de pandas sobre las filas ---
+def filas_ambito(df, ambito):
+    if ambito == "nacional": return df
+    ent = df["entidad_norm"]
+    mascara = ent.str.contains(AMBITOS[ambito], na=False) if ambito in AMBITOS else ent == ambito
+    return df[mascara]
+
+
+def ref_periodo(df, df_sbc, ambito):
+    d, s = filas_ambito(df, ambito), filas_ambito(df_sbc, ambito)
+    return {"totales": d[COLS_TOTALES].sum(),
+            "edades": d.groupby("Rango_edad_2", observed=True)[COLS_EDADES].sum(),
+            "salarios": s.groupby("Sector")[SALARIOS].mean()}
+
+
+def ref_entidad(df):
+    agg = df.groupby(["entidad_norm", "entidad_display"], as_index=False)[["PTPD_Aseg", "PTPD_Puestos"]].sum()
+    agg["TI"] = agg["PTPD_Aseg"] - agg["PTPD_Puestos"]
+    return agg
+
+
+def ref_explorador(df, df_sbc, ambito, sector, suf):
+    base = df if sector == "todos" else df_sbc[df_sbc["Sector"] == sector]
+    cols = {f"PTPD_Aseg{suf}": "Aseg", f"PTPD_Puestos{suf}": "Puestos"}
+
+    def sumar(d, por):
+        g = d.groupby(por, as_index=False, observed=True)[list(cols)].sum().rename(columns=cols)
+        g["TI"] = g["Aseg"] - g["Puestos"]
+        return g
+
+    return sumar(filas_ambito(base, ambito), "Rango_edad_2"), sumar(base, ["entidad_norm", "entidad_display"])
+
+
+# --- Comparación ---
+def tabla(obj):
+    """Serie o frame como frame plano: etiquetas en texto, medidas en float (los motores difieren en dtype)."""
+    d = obj.to_frame().T if isinstance(obj, pd.Series) else obj
+    d = d.reset_index() if d.index.name or isinstance(d.index, pd.CategoricalIndex) else d.reset_index(drop=True)
+    return pd.DataFrame({c: d[c].astype(str) if c in ETIQUETAS else d[c].astype(float) for c in d.columns})
+
+
+class Verificacion:
+    def __init__(self):
+        self.comparaciones = 0
+        self.diferencias = []
+
+    def igual(self, motor, que, esperado, obtenido, rtol=0.0, normalizar=True):
+        self.comparaciones += 1
+        if normalizar: esperado, obtenido = tabla(esperado), tabla(obtenido)
+        try:
+            pd.testing.assert_frame_equal(obtenido, esperado, check_exact=not rtol, rtol=rtol or 1e-5)
+        except AssertionError as e:
+            self.diferencias.append(f"{motor} · {que}: {str(e).strip().splitlines()[0]}")
+
+
+def verificar_periodo(v, motores, mes, df, df_sbc, ambito):
+    ref = ref_periodo(df, df_sbc, ambito)
+    for motor, calcular in motores.items():
+        a = calcular(mes, ambito)
+        if a is None: continue
+        v.igual(motor, f"totales {mes}/{ambito}", ref["totales"], a["totales"])
+        v.igual(motor, f"edades {mes}/{ambito}", ref["edades"], a["edades"])
+        if "salarios" in a and not (ref["salarios"].empty and a["salarios"].empty):
+            v.igual(motor, f"salarios {mes}/{ambito}", ref["salarios"], a["salarios"], rtol=1e-12)
+
+
+def ejecutar(v, datos, base, ret, datos_art, aggs_art, base_art):
+    def cubos_periodo(mes, ambito):
+        return {"totales": ret.consultar(mes=mes, ambito=ambito)[COLS_TOTALES],
+                "edades": ret.consultar(por=("edad",), mes=mes, ambito=ambito)[["Rango_edad_2", *COLS_EDADES]]}
+
+    periodo = {
+        "pandas": lambda mes, amb: calcular_periodo(*datos[mes], amb),
+        "sqlite": lambda mes, amb: base.periodo(mes, amb, COLS_TOTALES),
+        "cubos": cubos_periodo,
+        "artefacto": lambda mes, amb: aggs_art["periodo"][(mes, amb)] if (mes, amb) in aggs_art["periodo"] else None,
+        "artefacto-sqlite": lambda mes, amb: base_art.periodo(mes, amb, COLS_TOTALES),
+    }
+    for mes, (df, df_sbc) in datos.items():
+        if mes not in datos_art:
+            v.diferencias.append(f"artefacto · falta el mes {mes}")
+            continue
+        for a, b, nombre in zip(datos_art[mes], (df, df_sbc), ("pd", "sbc")):
+            v.igual("artefacto", f"filas {nombre} {mes}", b, a, normalizar=False)
+
+        entidad = ref_entidad(df)
+        v.igual("pandas", f"entidad {mes}", entidad, calcular_entidad(df))
+        v.igual("sqlite", f"entidad {mes}", entidad, base.por_entidad(mes))
+        cubo = ret.consultar(por=("entidad",), mes=mes)[["entidad_norm", "entidad_display", "PTPD_Aseg", "PTPD_Puestos"]]
+        v.igual("cubos", f"entidad {mes}", entidad, cubo.assign(TI=cubo["PTPD_Aseg"] - cubo["PTPD_Puestos"]))
+        v.igual("artefacto", f"entidad {mes}", entidad, aggs_art["entidad"][mes])
+        v.igual("artefacto-sqlite", f"entidad {mes}", entidad, base_art.por_entidad(mes))
+
+        ambitos = ["nacional", *AMBITOS, *sorted(df["entidad_norm"].dropna().unique()), INEXISTENTE]
+        sectores = ["todos", *sorted(df_sbc["Sector"].dropna().unique())]
+        for ambito in ambitos:
+            verificar_periodo(v, periodo, mes, df, df_sbc, ambito)
+            for sector in sectores:
+                for suf in SEXOS:
+                    que = f"explorador {mes}/{ambito}/{sector}/sexo{suf or ' total'}"
+                    edades, entidades = ref_explorador(df, df_sbc, ambito, sector, suf)
+                    for motor, b in (("sqlite", base), ("artefacto-sqlite", base_art)):
+                        e, n = b.explorador(mes, ambito, sector, suf)
+                        v.igual(motor, que + " (edades)", edades, e)
+                        v.igual(motor, que + " (entidades)", entidades, n)
+                    filtro = None if sector == "todos" else sector
+                    cols = {f"PTPD_Aseg{suf}": "Aseg", f"PTPD_Puestos{suf}": "Puestos"}
+                    for por, esperado in ((("edad",), edades), (("entidad",), entidades)):
+                        c = ret.consultar(por=por, mes=mes, ambito=ambito if por == ("edad",) else "nacional", sector=filtro)
+                        c = c[[col for col in esperado.columns if col not in ("Aseg", "Puestos", "TI")] + list(cols)].rename(columns=cols)
+                        v.igual("cubos", f"{que} ({por[0]})", esperado, c.assign(TI=c["Aseg"] - c["Puestos"]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--artefacto", help="Raíz o versión del artefacto (por defecto se construye uno temporal)")
+    parser.add_argument("--mostrar", type=int, default=20, help="Diferencias a listar")
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    datos = cargar_datos()
+    version = INGESTA["version"]
+    base = BaseAnalitica(datos, AMBITOS)
+    ret = Reticulo(datos, AMBITOS, COLS_TOTALES)
+    with tempfile.TemporaryDirectory(prefix="verificar-") as temporal:
+        raiz = args.artefacto
+        if raiz is None:
+            subprocess.run([sys.executable, os.path.join(DIR, "preparar_artefacto.py"), "--salida", temporal],
+                           check=True, stdout=subprocess.DEVNULL)
+            raiz = temporal
+        datos_art, aggs_art, manifiesto = artefacto.cargar(raiz)
+        base_art = BaseAnalitica(datos_art, AMBITOS, ruta=manifiesto["sqlite"])
+        v = Verificacion()
+        if manifiesto.get("version_datos") != version:
+            v.diferencias.append(f"artefacto · CSV {manifiesto.get('version_datos')} != {version}")
+        ejecutar(v, datos, base, ret, datos_art, aggs_art, base_art)
+
+    print(f"{v.comparaciones} comparaciones, {len(v.diferencias)} diferencias "
+          f"({len(datos)} meses, artefacto {manifiesto['ruta']}, {time.perf_counter() - t0:.1f} s)")
+    for d in v.diferencias[:args.mostrar]:
+        print("  " + d)
+    return 1 if v.diferencias else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
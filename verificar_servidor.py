@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Verificaciones de las rutas del servidor (test_client de Flask, sin red)
+
+- perfilado:  un perfil capturado de callbacks reales de pestaña (un mes y
+              Evolución, con la caché fría) se sirve como .folded dentro de
+              LIMITE_FOLDED_S, y sus pilas suman el tiempo del perfil.
+- exportacion: /exportar/<conjunto>.parquet del histórico con todos los
+              ámbitos trae las mismas filas que el CSV en el mínimo de row
+              groups (exportacion.FILAS_GRUPO); cada formato responde con el
+              Content-Type exacto de exportacion.FORMATOS.
+
+    python verificar_servidor.py
+
+Código de salida 1 si alguna verificación falla (se listan todas).
+"""
+
+import io
+import math
+import os
+import sys
+import threading
+import time
+
+TOKEN = "verificar"
+LIMITE_FOLDED_S = 2.0
+
+os.environ.update(IMSS_PRECALENTAR="0", IMSS_PERFILADO="1", IMSS_PERFILADO_TOKEN=TOKEN)
+
+import dash_app1  # noqa: E402
+import pandas as pd  # noqa: E402
+from carga_prueba import cb_tab  # noqa: E402
+from exportacion import FILAS_GRUPO, FORMATOS, formatos_disponibles  # noqa: E402
+
+
+def con_limite(limite, funcion, *args):
+    """(resultado, segundos) de funcion(*args); resultado None si no terminó a tiempo (el hilo queda suelto)."""
+    resultado = []
+    hilo = threading.Thread(target=lambda: resultado.append(funcion(*args)), daemon=True)
+    t0 = time.perf_counter()
+    hilo.start()
+    hilo.join(limite)
+    return (resultado[0] if resultado else None), time.perf_counter() - t0
+
+
+def verificar_perfilado(cliente, fallas):
+    for tab in (next(iter(dash_app1.MESES)), dash_app1.TAB_EVOLUCION):
+        r = cliente.post("/_dash-update-component", json=cb_tab(tab))
+        if r.status_code != 200:
+            fallas.append(f"perfilado · callback de {tab}: HTTP {r.status_code}")
+            continue
+        perfil = cliente.get(f"/_perfiles?token={TOKEN}").get_json()[0]
+        r, segundos = con_limite(LIMITE_FOLDED_S, cliente.get, f"/_perfiles/{perfil['id']}.folded?token={TOKEN}")
+        if r is None:
+            fallas.append(f"perfilado · .folded de {tab} no terminó en {LIMITE_FOLDED_S} s")
+            continue
+        lineas = r.get_data(as_text=True).splitlines()
+        suma_ms = sum(int(linea.rsplit(" ", 1)[1]) for linea in lineas) / 1000
+        print(f"perfilado · {tab}: {perfil['duracion_ms']} ms perfilados, .folded en {segundos:.3f} s "
+              f"({len(lineas)} pilas, {suma_ms:.1f} ms)")
+        if r.status_code != 200 or not lineas:
+            fallas.append(f"perfilado · .folded de {tab}: HTTP {r.status_code}, {len(lineas)} pilas")
+        if not 0.5 * perfil["duracion_ms"] <= suma_ms <= 1.2 * perfil["duracion_ms"]:
+            fallas.append(f"perfilado · las pilas de {tab} suman {suma_ms:.1f} ms de {perfil['duracion_ms']} ms")
+
+
+def verificar_exportacion(cliente, fallas):
+    ambitos = ",".join(["nacional", "cdmx", *(k for k, _ in dash_app1.opciones_explorador(dash_app1.MESES)[0]
+                                              if k not in ("nacional", "cdmx"))])
+    for formato in formatos_disponibles():
+        tipo = cliente.get(f"/exportar/totales.{formato}").headers.get("Content-Type")
+        print(f"exportacion · Content-Type de .{formato}: {tipo}")
+        if tipo != FORMATOS[formato]:
+            fallas.append(f"exportacion · Content-Type de .{formato}: {tipo!r} (se espera {FORMATOS[formato]!r})")
+    for conjunto in dash_app1.CONJUNTOS_EXPORTAR:
+        ruta = f"/exportar/{conjunto}.{{}}?periodo=historico&ambito={ambitos}"
+        csv = cliente.get(ruta.format("csv"))
+        esperado = pd.read_csv(io.BytesIO(csv.data), encoding="utf-8-sig")
+        if "parquet" not in formatos_disponibles(): continue
+        r = cliente.get(ruta.format("parquet"))
+        import pyarrow.parquet as pq
+        archivo = pq.ParquetFile(io.BytesIO(r.data))
+        grupos = archivo.metadata.num_row_groups
+        print(f"exportacion · {conjunto}: csv {len(csv.data)} B, parquet {len(r.data)} B "
+              f"({archivo.metadata.num_rows} filas, {grupos} row groups)")
+        if archivo.metadata.num_rows != len(esperado):
+            fallas.append(f"exportacion · {conjunto}.parquet con {archivo.metadata.num_rows} filas, el CSV con {len(esperado)}")
+        if grupos > max(1, math.ceil(len(esperado) / FILAS_GRUPO)):
+            fallas.append(f"exportacion · {conjunto}.parquet en {grupos} row groups para {len(esperado)} filas")
+
+
+def main():
+    fallas = []
+    cliente = dash_app1.server.test_client()
+    verificar_perfilado(cliente, fallas)
+    verificar_exportacion(cliente, fallas)
+    print(f"{len(fallas)} fallas")
+    for f in fallas:
+        print("  " + f)
+    return 1 if fallas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Vuelo único (single-flight) para las cachés en memoria
+
+Con la caché fría (arranque, recarga, mes nuevo), varios hilos pueden pedir a
+la vez la misma pestaña o el mismo agregado. Sin coordinación, cada uno lo
+construye por su cuenta y el CPU se satura haciendo N veces el mismo trabajo.
+Con VueloUnico, la primera llamada de una clave lo calcula y las que llegan
+mientras tanto esperan ese mismo resultado (o su excepción). Una vez terminado
+el vuelo, la clave se olvida: guardar el resultado es cosa de la caché
+(memorizar() hace las dos cosas).
+
+El vuelo es por proceso: cada worker de gunicorn tiene el suyo, igual que sus
+cachés. Una función en vuelo no debe pedir su propia clave (se esperaría a sí
+misma).
+"""
+
+import threading
+
+
+class _Vuelo:
+    __slots__ = ("listo", "resultado", "error")
+
+    def __init__(self):
+        self.listo = threading.Event()
+        self.resultado = None
+        self.error = None
+
+
+class VueloUnico:
+    """Llamadas concurrentes con la misma clave comparten una sola ejecución."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._vuelos = {}
+        self.ejecutadas = 0
+        self.compartidas = 0
+
+    def hacer(self, clave, funcion, *args):
+        with self._lock:
+            vuelo = self._vuelos.get(clave)
+            lider = vuelo is None
+            if lider: vuelo = self._vuelos[clave] = _Vuelo()
+            else: self.compartidas += 1
+        if not lider:
+            vuelo.listo.wait()
+            if vuelo.error is not None: raise vuelo.error
+            return vuelo.resultado
+        try:
+            vuelo.resultado = funcion(*args)
+            return vuelo.resultado
+        except BaseException as e:
+            vuelo.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._vuelos[clave]
+                self.ejecutadas += 1
+            vuelo.listo.set()
+
+    def memorizar(self, cache, clave, funcion, *args):
+        """cache[clave]; si falta, se calcula una sola vez aunque lo pidan varios hilos a la vez."""
+        valor = cache.get(clave)
+        if valor is None:
+            valor = self.hacer((id(cache), clave), _guardar, cache, clave, funcion, args)
+        return valor
+
+    def estado(self):
+        with self._lock:
+            return {"en_vuelo": len(self._vuelos), "ejecutadas": self.ejecutadas, "compartidas": self.compartidas}
+
+
+def _guardar(cache, clave, funcion, args):
+    # Otro vuelo pudo terminar entre la consulta a la caché y este vuelo
+    valor = cache.get(clave)
+    if valor is None:
+        valor = cache[clave] = funcion(*args)
+    return valor